@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Archive Module - Cold storage for completed and old tasks
+
+Archived tasks are moved out of tasks.json into a compressed archive next
+to it (tasks_archive.ndjson.gz), so loading, saving, listing and searching
+only pay for the tasks still in use. The archive is one JSON object per
+line, gzip-compressed; each archive run appends a new gzip member to the
+end of the file rather than rewriting it, and gzip reads the members back
+as one stream, so archiving costs the same however large the archive is.
+
+Nothing reads the archive unless asked to: it is searched and exported by
+streaming through it once. A small index next to it (.index) lists the
+members written in full, so a member cut short by a crash is dropped by the
+next archive run instead of hiding the ones appended after it.
+"""
+import os
+import gzip
+import json
+import zlib
+from datetime import datetime
+
+from search_index import WORD_PATTERN, task_tokens
+from task_model import json_default
+
+# Archived tasks are compressed this many at a time
+WRITE_BATCH = 1000
+
+def archive_filename(filename):
+    """
+    Archive kept for a task file
+
+    Args:
+        filename (str): Task file (tasks.json)
+
+    Returns:
+        str: Archive file (tasks_archive.ndjson.gz)
+    """
+    return f"{os.path.splitext(filename)[0]}_archive.ndjson.gz"
+
+def read_index(filename):
+    """
+    Read the list of complete members of an archive
+
+    Args:
+        filename (str): Archive file
+
+    Returns:
+        list: [offset, length, task count, archived at] for each member,
+            oldest first; a single member covering the whole file if it has
+            no index
+    """
+    try:
+        with open(f"{filename}.index", 'r', encoding='utf-8') as file:
+            return json.load(file)["members"]
+    except FileNotFoundError:
+        pass
+
+    try:
+        size = os.path.getsize(filename)
+    except OSError:
+        return []
+    return [[0, size, None, None]] if size else []
+
+def _write_index(filename, members):
+    """Replace an archive's index"""
+    temp_filename = f"{filename}.index.tmp"
+    with open(temp_filename, 'w', encoding='utf-8') as file:
+        json.dump({"members": members}, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_filename, f"{filename}.index")
+
+def count_archived(filename):
+    """
+    Count the archived tasks without reading the archive
+
+    Args:
+        filename (str): Archive file
+
+    Returns:
+        int: Number of archived tasks, or None if the archive predates its
+            index
+    """
+    counts = [member[2] for member in read_index(filename)]
+    return None if None in counts else sum(counts)
+
+def is_archivable(task, before=None, include_pending=False):
+    """
+    Check whether a task should be archived
+
+    Args:
+        task (dict): Task to check
+        before (str, optional): Only tasks last changed before this ISO date
+        include_pending (bool, optional): Pending tasks too, not just
+            completed ones
+
+    Returns:
+        bool: True if the task should be archived
+    """
+    if not include_pending and not task["completed"]:
+        return False
+
+    if before is not None:
+        changed = task.get("updated_at") or task.get("created_at") or ""
+        return changed[:10] < before
+
+    return True
+
+def archive_tasks(task_manager, before=None, include_pending=False, filename=None):
+    """
+    Move tasks from the task list into the archive
+
+    The tasks are appended to the archive as one gzip member, then deleted
+    in the same transaction, so other processes see them go all at once,
+    and the task file is rewritten without them. If anything fails before
+    the deletes are written, the member is cut off again and the task list
+    is left as it was.
+
+    Args:
+        task_manager (TaskManager): Task manager to take the tasks from
+        before (str, optional): Only tasks last changed before this ISO date
+        include_pending (bool, optional): Pending tasks too, not just
+            completed ones
+        filename (str, optional): Archive file; next to the task file if
+            omitted
+
+    Returns:
+        int: Number of tasks archived
+    """
+    filename = filename or archive_filename(task_manager.storage.filename)
+    archived_at = datetime.now().isoformat()
+
+    with task_manager.transaction():
+        tasks = [
+            task for task in task_manager.query_tasks(None if include_pending else True)
+            if is_archivable(task, before, include_pending)
+        ]
+        if not tasks:
+            return 0
+
+        dir_name = os.path.dirname(filename)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+
+        members = read_index(filename)
+        start = members[-1][0] + members[-1][1] if members else 0
+
+        with open(filename, 'ab') as file:
+            # Drop whatever a crashed run left after the last complete member
+            file.truncate(start)
+            try:
+                with gzip.GzipFile(fileobj=file, mode='wb', compresslevel=6) as member:
+                    for batch_start in range(0, len(tasks), WRITE_BATCH):
+                        lines = []
+                        for task in tasks[batch_start:batch_start + WRITE_BATCH]:
+                            # A plain copy of the task, Task objects included
+                            record = json_default(task)
+                            record["archived_at"] = archived_at
+                            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+                        member.write("".join(lines).encode("utf-8"))
+                file.flush()
+                os.fsync(file.fileno())
+                _write_index(filename, members + [[start, file.tell() - start, len(tasks), archived_at]])
+
+                task_manager.delete_tasks(task["id"] for task in tasks)
+            except BaseException:
+                # Leave the archive as it was, without a partial member
+                file.truncate(start)
+                if len(read_index(filename)) > len(members):
+                    _write_index(filename, members)
+                raise
+
+    # Write the smaller task list out now rather than journal the deletes
+    task_manager.compact()
+    return len(tasks)
+
+def iter_archive(filename, completed=None):
+    """
+    Stream the archived tasks
+
+    Args:
+        filename (str): Archive file
+        completed (bool, optional): Only completed (True) or pending
+            (False) tasks
+
+    Yields:
+        dict: Each archived task, oldest archive run first, with the time
+            it was archived as "archived_at"
+    """
+    for line in _archive_lines(filename):
+        task = json.loads(line)
+        if completed is None or task["completed"] == completed:
+            yield task
+
+def _archive_lines(filename):
+    """Read the archive's lines, stopping at a damaged end"""
+    try:
+        file = gzip.open(filename, 'rt', encoding='utf-8')
+    except FileNotFoundError:
+        return
+
+    with file:
+        try:
+            for line in file:
+                if line.endswith("\n"):
+                    yield line
+        except (EOFError, OSError, zlib.error):
+            # A member cut short by a crash; everything before it is intact
+            return
+
+def search_archive(filename, keyword, substring=False):
+    """
+    Find archived tasks whose title, description or tags match a keyword
+
+    Matches the same way as TaskManager.search_tasks: every word of the
+    keyword must start a word of the task, or with substring set, the
+    keyword may appear anywhere.
+
+    Args:
+        filename (str): Archive file
+        keyword (str): Case-insensitive text to look for
+        substring (bool, optional): Match the keyword as a plain substring
+
+    Returns:
+        list: Matching archived tasks
+    """
+    keyword = keyword.lower()
+    words = WORD_PATTERN.findall(keyword)
+    if not substring and not words:
+        return []
+
+    # Quotes, backslashes and control characters are escaped in the lines
+    escaped = json.dumps(keyword, ensure_ascii=False)[1:-1]
+
+    matches = []
+    for line in _archive_lines(filename):
+        # Lines are written unescaped, so a line without the words cannot
+        # match and need not be decoded
+        text = line.lower()
+        if substring:
+            if escaped not in text:
+                continue
+        elif not all(word in text for word in words):
+            continue
+
+        task = json.loads(line)
+        if substring:
+            found = (keyword in task["title"].lower() or
+                     keyword in task["description"].lower() or
+                     any(keyword in tag.lower() for tag in task.get("tags", [])))
+        else:
+            tokens = task_tokens(task)
+            found = all(any(token.startswith(word) for token in tokens) for word in words)
+
+        if found:
+            matches.append(task)
+
+    return matches
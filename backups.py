@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Backups Module - Incremental, deduplicated backups of the task file
+
+A backup is a manifest listing chunks of tasks; the chunks are stored once
+each, compressed and named by the hash of their content, so a backup only
+adds the chunks that changed since any earlier one. Tasks are grouped into
+chunks by ID range (CHUNK_IDS IDs to a chunk) rather than by byte offset,
+so editing a task only changes the chunk holding it, deleting one does not
+shift every chunk after it, and new tasks only add chunks at the end.
+
+Everything is streamed: the tasks are read one at a time with the journal
+applied, one chunk is held in memory at a time, and a restore writes the
+chunks straight back out as the task file without parsing them.
+
+Layout, next to tasks.json:
+
+    tasks_backups/
+        snapshots/20240501_093000_123456.json   one manifest per backup
+        chunks/3f/3fa9...c1.gz                   chunks shared by them
+"""
+import os
+import gzip
+import json
+import hashlib
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+from storage import fold_records
+from task_model import json_default
+
+# Advisory lock on the backup directory, so a backup never shares a chunk
+# that a concurrent prune is removing
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Tasks with IDs in the same block of CHUNK_IDS share a chunk
+CHUNK_IDS = 1000
+
+# Backups are named after when they were taken, so names sort by age
+ID_FORMAT = "%Y%m%d_%H%M%S_%f"
+
+# Retention: the latest KEEP_LAST backups, and the latest of each of the
+# last KEEP_DAILY days and KEEP_WEEKLY weeks that have one
+KEEP_LAST = 10
+KEEP_DAILY = 7
+KEEP_WEEKLY = 4
+
+def backup_directory(filename):
+    """
+    Directory holding the backups of a task file
+
+    Args:
+        filename (str): Task file (tasks.json)
+
+    Returns:
+        str: Backup directory (tasks_backups)
+    """
+    return f"{os.path.splitext(filename)[0]}_backups"
+
+@contextmanager
+def _locked(directory):
+    """Hold the backup directory's lock"""
+    os.makedirs(directory, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+
+    with open(os.path.join(directory, "lock"), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _chunk_path(directory, digest):
+    """File a chunk is stored in"""
+    return os.path.join(directory, "chunks", digest[:2], f"{digest}.gz")
+
+def _manifest_path(directory, backup_id):
+    """File a backup's manifest is stored in"""
+    return os.path.join(directory, "snapshots", f"{backup_id}.json")
+
+def _write_atomic(filename, data):
+    """Write bytes to a file by way of a temporary file"""
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_filename, filename)
+
+def _block(task_id):
+    """Block of IDs a task's chunk is for"""
+    return task_id // CHUNK_IDS if isinstance(task_id, int) else None
+
+def _chunks(tasks):
+    """
+    Group tasks into chunks by ID range
+
+    Args:
+        tasks (iterable): Tasks in file order
+
+    Yields:
+        tuple: (None, chunk text, task count, ID block, None); the text has
+            one compact JSON object per line
+    """
+    lines = []
+    block = None
+    for task in tasks:
+        task_block = _block(task["id"])
+
+        # A new chunk wherever the block changes, so tasks keep their order
+        # even when the IDs are not ascending
+        if lines and task_block != block:
+            yield None, "".join(lines), len(lines), block, None
+            lines = []
+        block = task_block
+        lines.append(json.dumps(task, separators=(",", ":"), default=json_default) + "\n")
+
+    if lines:
+        yield None, "".join(lines), len(lines), block, None
+
+def _updated_chunks(directory, manifest, changes):
+    """
+    Apply journaled changes to an earlier backup's chunks
+
+    Only the chunks holding changed IDs are read back; the rest are reused
+    as they are. Tasks added since go at the end, as they do when the
+    journal is applied to the snapshot.
+
+    Args:
+        directory (str): Backup directory
+        manifest (dict): The earlier backup's manifest
+        changes (dict): Task ID -> change, as from storage.fold_records()
+
+    Yields:
+        tuple: (hash, None, task count, ID block, size) for a chunk reused
+            as it is, or a new chunk as from _chunks()
+    """
+    blocks = {_block(task_id) for task_id in changes}
+    added = any(kind == "replace" for kind, _ in changes.values())
+    last = len(manifest["chunks"]) - 1
+
+    seen = set()
+    changed = []
+    for position, (digest, count, block, length) in enumerate(manifest["chunks"]):
+        # New tasks may belong in the same block as the last chunk
+        if block not in blocks and not (added and position == last):
+            yield from _chunks(changed)
+            changed = []
+            yield digest, None, count, block, length
+            continue
+
+        for line in _read_chunk(directory, digest).splitlines():
+            task = json.loads(line)
+            change = changes.get(task["id"])
+            if change is not None:
+                seen.add(task["id"])
+                kind, fields = change
+                if kind == "delete":
+                    continue
+                if kind == "replace":
+                    task = fields
+                else:
+                    task.update(fields)
+            changed.append(task)
+
+    changed.extend(fields for task_id, (kind, fields) in changes.items()
+                   if kind == "replace" and task_id not in seen)
+    yield from _chunks(changed)
+
+def create_backup(storage, directory=None):
+    """
+    Back up the current tasks, storing only chunks not stored before
+
+    While the snapshot is the one the latest backup was read from, only
+    the journal records written since are read, and only the chunks they
+    touch are rebuilt; otherwise every task is read and chunked again.
+
+    Args:
+        storage (Storage): Storage to back up
+        directory (str, optional): Backup directory; next to the task file
+            if omitted
+
+    Returns:
+        dict: The new backup's manifest: "id", "created", "tasks",
+            "next_id", "size" (bytes of task data), "chunks" ([hash, task
+            count, ID block, size] lists) and "added" (chunks and compressed
+            bytes stored for it)
+    """
+    directory = directory or backup_directory(storage.filename)
+    now = datetime.now()
+
+    # Changes still buffered by write-behind go in too
+    storage.flush()
+
+    with _locked(directory):
+        backups = list_backups(directory)
+        latest = backups[-1] if backups else None
+        since = storage.changes_since(tuple(latest["stamp"]), own=True) if latest else None
+
+        if since is None:
+            chunks = _chunks(storage.iter_tasks())
+        else:
+            records, stamp = since
+            chunks = _updated_chunks(directory, latest, fold_records(records))
+
+        manifest = {
+            "id": now.strftime(ID_FORMAT),
+            "created": now.isoformat(),
+            "added": {"chunks": 0, "bytes": 0},
+            "chunks": []
+        }
+        tasks = size = 0
+        for digest, text, count, block, length in chunks:
+            if digest is None:
+                data = text.encode("utf-8")
+                digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+                length = len(data)
+
+                path = _chunk_path(directory, digest)
+                if not os.path.exists(path):
+                    compressed = gzip.compress(data, compresslevel=6, mtime=0)
+                    _write_atomic(path, compressed)
+                    manifest["added"]["chunks"] += 1
+                    manifest["added"]["bytes"] += len(compressed)
+
+            manifest["chunks"].append([digest, count, block, length])
+            tasks += count
+            size += length
+
+        if since is None:
+            # What the tasks were actually read from
+            stamp, next_id = storage.read_stamp, storage.next_id
+        else:
+            next_ids = [record["id"] + 1 for record in records if record.get("op") == "add"]
+            if latest["next_id"] is not None:
+                next_ids.append(latest["next_id"])
+            next_id = max(next_ids) if next_ids else None
+
+        manifest.update(stamp=list(stamp), next_id=next_id, tasks=tasks, size=size)
+        _write_atomic(_manifest_path(directory, manifest["id"]), json.dumps(manifest).encode("utf-8"))
+
+    return manifest
+
+def list_backups(directory):
+    """
+    Read every backup's manifest
+
+    Args:
+        directory (str): Backup directory
+
+    Returns:
+        list: Manifests, oldest first
+    """
+    try:
+        names = sorted(name for name in os.listdir(os.path.join(directory, "snapshots")) if name.endswith(".json"))
+    except FileNotFoundError:
+        return []
+
+    backups = []
+    for name in names:
+        with open(os.path.join(directory, "snapshots", name), 'r', encoding='utf-8') as file:
+            backups.append(json.load(file))
+    return backups
+
+def find_backup(directory, backup_id="latest"):
+    """
+    Read one backup's manifest
+
+    Args:
+        directory (str): Backup directory
+        backup_id (str, optional): Backup ID, a unique prefix of one (such
+            as its date), or "latest"
+
+    Returns:
+        dict: The manifest
+
+    Raises:
+        ValueError: If there is no such backup, or the prefix is ambiguous
+    """
+    backups = list_backups(directory)
+    if backup_id == "latest":
+        if not backups:
+            raise ValueError("There are no backups")
+        return backups[-1]
+
+    matches = [backup for backup in backups if backup["id"].startswith(backup_id)]
+    if not matches:
+        raise ValueError(f"No backup found with ID {backup_id}")
+    if len(matches) > 1:
+        raise ValueError(f"{len(matches)} backups match {backup_id}; give more of the ID")
+    return matches[0]
+
+def retained(backups, keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, keep_weekly=KEEP_WEEKLY):
+    """
+    Pick the backups a retention policy keeps
+
+    Args:
+        backups (list): Manifests, oldest first
+        keep_last (int, optional): Number of latest backups to keep
+        keep_daily (int, optional): Number of days to keep the latest backup of
+        keep_weekly (int, optional): Number of weeks to keep the latest backup of
+
+    Returns:
+        set: IDs of the backups to keep
+    """
+    newest_first = [backup["id"] for backup in reversed(backups)]
+    keep = set(newest_first[:keep_last])
+
+    days, weeks = set(), set()
+    for backup_id in newest_first:
+        created = datetime.strptime(backup_id, ID_FORMAT)
+        day, week = created.date(), created.isocalendar()[:2]
+
+        if day not in days and len(days) < keep_daily:
+            days.add(day)
+            keep.add(backup_id)
+        if week not in weeks and len(weeks) < keep_weekly:
+            weeks.add(week)
+            keep.add(backup_id)
+
+    return keep
+
+def prune(directory, keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, keep_weekly=KEEP_WEEKLY):
+    """
+    Delete the backups the retention policy does not keep, and every chunk
+    no remaining backup uses
+
+    Args:
+        directory (str): Backup directory
+        keep_last, keep_daily, keep_weekly (int, optional): Retention
+            policy, as for retained()
+
+    Returns:
+        tuple: (number of backups deleted, number of chunks deleted)
+    """
+    with _locked(directory):
+        backups = list_backups(directory)
+        keep = retained(backups, keep_last, keep_daily, keep_weekly)
+
+        used = set()
+        removed_backups = 0
+        for backup in backups:
+            if backup["id"] in keep:
+                used.update(chunk[0] for chunk in backup["chunks"])
+            else:
+                os.remove(_manifest_path(directory, backup["id"]))
+                removed_backups += 1
+
+        # Sweep the chunks (and any temporary file left by a crash)
+        removed_chunks = 0
+        for root, _, names in os.walk(os.path.join(directory, "chunks")):
+            for name in names:
+                is_chunk = name.endswith(".gz")
+                if is_chunk and name[:-3] in used:
+                    continue
+                os.remove(os.path.join(root, name))
+                if is_chunk:
+                    removed_chunks += 1
+
+    return removed_backups, removed_chunks
+
+def iter_backup(directory, manifest):
+    """
+    Read a backup's chunks back, checking each against its hash
+
+    Args:
+        directory (str): Backup directory
+        manifest (dict): The backup's manifest
+
+    Yields:
+        str: Each chunk's text, one compact JSON task per line
+
+    Raises:
+        ValueError: If a chunk is missing or damaged
+    """
+    for chunk in manifest["chunks"]:
+        yield _read_chunk(directory, chunk[0])
+
+def _read_chunk(directory, digest):
+    """Read a chunk's text back, checking it against its hash"""
+    try:
+        with open(_chunk_path(directory, digest), 'rb') as file:
+            data = gzip.decompress(file.read())
+    except (OSError, EOFError, zlib.error) as e:
+        raise ValueError(f"Backup chunk {digest} cannot be read: {e}") from None
+
+    if hashlib.blake2b(data, digest_size=16).hexdigest() != digest:
+        raise ValueError(f"Backup chunk {digest} is damaged")
+    return data.decode("utf-8")
+
+def _snapshot_text(directory, manifest):
+    """Lay out a backup's chunks as a JSON array, one task per line"""
+    yield "["
+    separator = "\n  "
+    for text in iter_backup(directory, manifest):
+        yield separator + text.rstrip("\n").replace("\n", ",\n  ")
+        separator = ",\n  "
+    yield "\n]\n"
+
+def restore_backup(storage, backup_id="latest", directory=None):
+    """
+    Replace the tasks with those of a backup
+
+    The current tasks are backed up first (which costs little, as most of
+    their chunks are already stored), so a restore can itself be undone.
+    Task IDs handed out since the backup are not handed out again.
+
+    Args:
+        storage (Storage): Storage to restore into
+        backup_id (str, optional): Backup to restore, as for find_backup()
+        directory (str, optional): Backup directory; next to the task file
+            if omitted
+
+    Returns:
+        tuple: (manifest of the backup restored, manifest of the backup of
+            the tasks it replaced), or None if the backup could not be read
+            back, in which case the tasks are left as they were
+
+    Raises:
+        ValueError: If there is no such backup
+    """
+    directory = directory or backup_directory(storage.filename)
+    manifest = find_backup(directory, backup_id)
+    previous = create_backup(storage, directory)
+
+    next_ids = [value for value in (manifest["next_id"], previous["next_id"]) if value is not None]
+    storage.next_id = max(next_ids) if next_ids else None
+
+    # The new file only replaces the old one once every chunk has been checked
+    if not storage.write_snapshot(_snapshot_text(directory, manifest)):
+        return None
+    return manifest, previous
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Batch Module - Applies a stream of task operations read as NDJSON
+
+Each input line is one JSON object naming an operation:
+
+    {"op": "add", "title": "Pay rent", "due_date": "2024-05-01", "priority": "high", "tags": ["home"]}
+    {"op": "update", "id": 12, "title": "Pay rent and bills", "due_date": null}
+    {"op": "complete", "id": 12}
+    {"op": "complete", "id": 12, "completed": false}
+    {"op": "delete", "id": 7}
+
+Every operation gets a result line in the same order, e.g.
+{"line": 1, "op": "add", "ok": true, "id": 42} or {"line": 3, "op":
+"complete", "ok": false, "error": "No task found with ID 12"}. A "ref"
+given with an operation is copied to its result, to match them up.
+
+Operations are applied in memory and written out together in a single
+transaction (or one per commit_every operations), so a batch of tens of
+thousands of changes costs one process start and one journal write.
+"""
+import json
+from datetime import datetime
+from itertools import islice
+
+# Fields an update may change
+EDITABLE_FIELDS = ("title", "description", "due_date", "priority", "tags", "completed")
+
+PRIORITIES = ("low", "medium", "high")
+
+class BatchError(ValueError):
+    """An operation that cannot be applied"""
+
+def read_operations(source):
+    """
+    Read operations one line at a time
+
+    Args:
+        source (file): Text file or standard input with one JSON object per line
+
+    Yields:
+        tuple: (line number, operation dict, or the error text if the line
+            is not a JSON object); blank lines are skipped
+    """
+    for number, line in enumerate(source, 1):
+        if not line.strip():
+            continue
+
+        try:
+            operation = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, f"Invalid JSON: {e}"
+            continue
+
+        if not isinstance(operation, dict):
+            yield number, "Expected a JSON object"
+            continue
+
+        yield number, operation
+
+def apply_operation(task_manager, operation):
+    """
+    Apply one operation
+
+    Args:
+        task_manager (TaskManager): Task manager to change
+        operation (dict): Operation, as described in the module docstring
+
+    Returns:
+        int: ID of the task added or changed
+
+    Raises:
+        BatchError: If the operation is malformed or its task does not exist
+    """
+    op = operation.get("op")
+
+    if op == "add":
+        fields = _fields(operation)
+        if "title" not in fields:
+            raise BatchError("An added task needs a title")
+
+        task_id = task_manager.add_task(
+            title=fields["title"],
+            description=fields.get("description") or "",
+            due_date=fields.get("due_date"),
+            priority=fields.get("priority") or "medium",
+            tags=fields.get("tags")
+        )
+        if fields.get("completed") and not task_manager.toggle_task_status(task_id):
+            raise BatchError(f"Task {task_id} was added but could not be completed")
+        return task_id
+
+    if op not in ("update", "complete", "delete"):
+        raise BatchError(f"Unknown operation: {op!r}")
+
+    task_id = operation.get("id")
+    if type(task_id) is not int:
+        raise BatchError("A task ID (integer) is needed")
+
+    if op == "update":
+        fields = _fields(operation)
+        if not fields:
+            raise BatchError(f"An update needs at least one of {', '.join(EDITABLE_FIELDS)}")
+        task = task_manager.get_task_by_id(task_id)
+        if task is None:
+            raise BatchError(f"No task found with ID {task_id}")
+
+        updated_task = dict(task)
+        for key, value in fields.items():
+            if value is None:
+                updated_task.pop(key, None)
+            else:
+                updated_task[key] = value
+        if not task_manager.update_task(task_id, updated_task):
+            raise BatchError(f"No task found with ID {task_id}")
+    elif op == "complete":
+        completed = operation.get("completed", True)
+        if type(completed) is not bool:
+            raise BatchError("completed must be true or false")
+        if not task_manager.toggle_task_status(task_id, completed):
+            raise BatchError(f"No task found with ID {task_id}")
+    elif not task_manager.delete_task(task_id):
+        raise BatchError(f"No task found with ID {task_id}")
+
+    return task_id
+
+def _fields(operation):
+    """Check the task fields given with an add or update"""
+    fields = {key: operation[key] for key in EDITABLE_FIELDS if key in operation}
+
+    for key in ("title", "description"):
+        if key in fields and not isinstance(fields[key], str):
+            raise BatchError(f"{key} must be a string")
+
+    if "title" in fields and not fields["title"].strip():
+        raise BatchError("A task needs a title")
+
+    due_date = fields.get("due_date")
+    if due_date is not None:
+        try:
+            fields["due_date"] = datetime.strptime(due_date, "%Y-%m-%d").date().isoformat()
+        except (TypeError, ValueError):
+            raise BatchError("due_date must be a YYYY-MM-DD date") from None
+
+    if fields.get("priority") is not None and fields["priority"] not in PRIORITIES:
+        raise BatchError(f"priority must be one of {', '.join(PRIORITIES)}")
+
+    tags = fields.get("tags")
+    if isinstance(tags, str):
+        # Same as typing them in: comma-separated
+        fields["tags"] = [tag.strip() for tag in tags.split(",")] if tags else []
+    elif tags is not None and not (isinstance(tags, list) and all(isinstance(tag, str) for tag in tags)):
+        raise BatchError("tags must be a list of strings")
+
+    if "completed" in fields and type(fields["completed"]) is not bool:
+        raise BatchError("completed must be true or false")
+
+    return fields
+
+def run_batch(task_manager, source, out, commit_every=None):
+    """
+    Apply every operation from a stream and report each result
+
+    Args:
+        task_manager (TaskManager): Task manager to change
+        source (file): Operations, one JSON object per line
+        out (file): Where to write the result lines
+        commit_every (int, optional): Write the changes out after this many
+            operations; all at once at the end if omitted
+
+    Returns:
+        dict: Number of operations that succeeded ("ok") and "failed"
+    """
+    counts = {"ok": 0, "failed": 0}
+    operations = read_operations(source)
+
+    while True:
+        chunk = list(islice(operations, commit_every)) if commit_every else list(operations)
+        if not chunk:
+            break
+
+        # Results are only reported once their changes have been written
+        results = []
+        with task_manager.transaction():
+            for number, operation in chunk:
+                results.append(_result(task_manager, number, operation))
+
+        for result in results:
+            counts["ok" if result["ok"] else "failed"] += 1
+            out.write(json.dumps(result) + "\n")
+
+        if not commit_every:
+            break
+
+    task_manager.save()
+    return counts
+
+def _result(task_manager, number, operation):
+    """Apply one operation read from a line and describe the outcome"""
+    if not isinstance(operation, dict):
+        return {"line": number, "ok": False, "error": operation}
+
+    result = {"line": number, "op": operation.get("op")}
+    if "ref" in operation:
+        result["ref"] = operation["ref"]
+
+    try:
+        task_id = apply_operation(task_manager, operation)
+    except BatchError as e:
+        result.update(ok=False, error=str(e))
+    else:
+        result.update(ok=True, id=task_id)
+
+    return result
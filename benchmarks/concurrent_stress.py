@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Concurrent Access Stress Test - Several processes changing one tasks.json at once
+
+Seeds a task file, then starts worker processes that each add tasks and
+mark them completed, the way cron jobs and shells running main.py --add /
+--complete side by side would. Half of the workers keep one TaskManager
+open for the whole run; the other half start a fresh one for every
+operation, like separate CLI invocations. A reader process keeps parsing
+the file meanwhile. The journal is compacted often, so snapshot rewrites
+race with appends and reads.
+
+At the end every task a worker added must be there exactly once, with its
+own ID, and completed. Anything else is counted as a lost update.
+
+Usage:
+    python benchmarks/concurrent_stress.py [--processes 4] [--ops 200] [--no-lock]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from storage import Storage
+from task_manager import TaskManager
+
+def configure(journal_min_bytes, lock):
+    """Apply the run's settings inside a worker process"""
+    storage.JOURNAL_MIN_BYTES = journal_min_bytes
+    if not lock:
+        storage.fcntl = None
+
+def writer(filename, worker, ops, journal_min_bytes, lock, fresh):
+    """
+    Add tasks and complete each one straight after
+
+    Args:
+        filename (str): Task file shared by every process
+        worker (int): Worker number, used in the task titles
+        ops (int): Number of tasks to add
+        journal_min_bytes (int): Journal size at which to compact
+        lock (bool): Whether to use file locking
+        fresh (bool): Use a new TaskManager for every operation
+
+    Returns:
+        int: Number of operations done
+    """
+    configure(journal_min_bytes, lock)
+    task_manager = TaskManager(storage=Storage(filename, journal=True))
+
+    for number in range(ops):
+        if fresh:
+            task_manager = TaskManager(storage=Storage(filename, journal=True))
+        task_id = task_manager.add_task(f"worker {worker} task {number}", priority="high")
+
+        if fresh:
+            task_manager = TaskManager(storage=Storage(filename, journal=True))
+        task_manager.toggle_task_status(task_id)
+
+        if fresh:
+            task_manager.save()
+
+    task_manager.save()
+    return ops * 2
+
+def reader(filename, stop, lock):
+    """
+    Parse the task file over and over until told to stop
+
+    Returns:
+        tuple: (reads, reads that failed or came back empty)
+    """
+    configure(storage.JOURNAL_MIN_BYTES, lock)
+    reads = errors = 0
+
+    while not stop.is_set():
+        try:
+            if not list(Storage(filename, journal=True).iter_tasks()):
+                errors += 1
+        except (OSError, ValueError):
+            errors += 1
+        reads += 1
+
+    return reads, errors
+
+def seed(filename, count):
+    """Write a task file with count tasks"""
+    tasks = [{
+        "id": task_id,
+        "title": f"seed task {task_id}",
+        "description": "",
+        "completed": False,
+        "created_at": "2024-01-01T00:00:00",
+        "updated_at": "2024-01-01T00:00:00",
+        "priority": "medium",
+        "tags": []
+    } for task_id in range(1, count + 1)]
+
+    seeded = Storage(filename, journal=True)
+    seeded.next_id = count + 1
+    seeded.save_tasks(tasks)
+
+def check(filename, processes, ops):
+    """
+    Count what went missing
+
+    Returns:
+        dict: Lost adds, lost completions and duplicated IDs
+    """
+    tasks = Storage(filename, journal=True).load_tasks()
+    ids = Counter(task["id"] for task in tasks)
+    by_title = Counter(task["title"] for task in tasks)
+    completed = {task["title"] for task in tasks if task["completed"]}
+
+    expected = [f"worker {worker} task {number}" for worker in range(processes) for number in range(ops)]
+    return {
+        "Lost adds": sum(1 for title in expected if by_title[title] == 0),
+        "Lost completions": sum(1 for title in expected if by_title[title] and title not in completed),
+        "Duplicate tasks": sum(count - 1 for title, count in by_title.items() if count > 1),
+        "Duplicate IDs": sum(count - 1 for count in ids.values() if count > 1)
+    }
+
+def main():
+    """Run the stress test and print throughput and lost updates"""
+    parser = argparse.ArgumentParser(description="Stress concurrent access to tasks.json from several processes")
+    parser.add_argument("--processes", type=int, default=4, help="Number of writer processes (default: 4)")
+    parser.add_argument("--ops", type=int, default=200, help="Tasks each writer adds and completes (default: 200)")
+    parser.add_argument("--tasks", type=int, default=1000, help="Tasks in the file to begin with (default: 1,000)")
+    parser.add_argument("--journal-min-bytes", type=int, default=16 * 1024, help="Compact the journal above this size (default: 16 KiB)")
+    parser.add_argument("--no-lock", action="store_true", help="Run without file locking, for comparison")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="taskmaster-stress-")
+    filename = os.path.join(directory, "tasks.json")
+    lock = not args.no_lock
+
+    try:
+        seed(filename, args.tasks)
+
+        with multiprocessing.Manager() as manager, multiprocessing.Pool(args.processes + 1) as pool:
+            stop = manager.Event()
+            reads = pool.apply_async(reader, (filename, stop, lock))
+
+            start = time.perf_counter()
+            writes = [
+                pool.apply_async(writer, (filename, worker, args.ops, args.journal_min_bytes, lock, worker % 2 == 1))
+                for worker in range(args.processes)
+            ]
+            ops = sum(result.get() for result in writes)
+            elapsed = time.perf_counter() - start
+
+            stop.set()
+            read_count, read_errors = reads.get()
+
+        lost = check(filename, args.processes, args.ops)
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"Locking:          {'on' if lock else 'off'}")
+    print(f"Writers:          {args.processes} ({args.processes // 2} starting fresh for every operation)")
+    print(f"Operations:       {ops:,} in {elapsed:.2f} s ({ops / elapsed:,.0f} ops/s)")
+    print(f"Reads:            {read_count:,} ({read_errors} failed or empty)")
+    for name, count in lost.items():
+        print(f"{name + ':':<17} {count}")
+
+if __name__ == "__main__":
+    main()
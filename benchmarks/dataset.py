@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Synthetic Dataset Generator - Deterministic task files for benchmarking
+
+Tasks are drawn from fixed distributions loosely modelled on real task
+lists: a few tags are far more common than the rest, most tasks are of
+medium priority, many have no description while some have long ones, and
+due dates cluster in the weeks after a task is created, so there is a mix
+of overdue, upcoming and undated work. Older tasks are more likely to be
+done.
+
+The same seed always gives the same tasks, and a smaller dataset is the
+start of a larger one. Dates are laid out relative to a reference day
+(today by default), so date-based views find the same share of tasks
+whenever the benchmark is run.
+
+Usage:
+    python benchmarks/dataset.py --count 100000 --out tasks.json [--seed 42]
+"""
+import os
+import sys
+import math
+import random
+import argparse
+from datetime import date, datetime, time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import Storage
+
+SIZES = {"1k": 1000, "10k": 10000, "100k": 100000, "1m": 1000000}
+
+PRIORITIES = ["low", "medium", "high"]
+PRIORITY_WEIGHTS = [30, 50, 20]
+
+# Tags in order of popularity; the weights fall off like 1 / rank
+TAGS = ["work", "home", "urgent", "errand", "finance", "health", "reading",
+        "travel", "family", "project", "garden", "car", "study", "shopping"]
+TAG_WEIGHTS = [1 / rank for rank in range(1, len(TAGS) + 1)]
+
+# Chance of a task having 0, 1, 2, ... tags
+TAG_COUNT_WEIGHTS = [35, 35, 18, 9, 3]
+
+VERBS = ["Call", "Email", "Review", "Fix", "Plan", "Buy", "Write", "Update",
+         "Book", "Pay", "Clean", "Prepare", "Check", "Schedule", "Read", "Send"]
+NOUNS = ["report", "invoice", "dentist", "car insurance", "presentation",
+         "groceries", "budget", "garden shed", "tax return", "project plan",
+         "birthday present", "team meeting", "blog post", "bike", "passport",
+         "contract", "newsletter", "server", "kitchen tap", "flights"]
+WORDS = ["the", "and", "before", "after", "with", "about", "for", "next",
+         "week", "client", "notes", "draft", "numbers", "follow", "up", "on",
+         "details", "meeting", "quote", "list", "agenda", "changes", "final",
+         "version", "deadline", "remember", "ask", "for", "feedback", "options"]
+
+# Days over which creation times are spread, back from the reference day
+HISTORY_DAYS = 365
+
+def generate_tasks(count, seed=42, today=None):
+    """
+    Generate synthetic tasks
+
+    Args:
+        count (int): Number of tasks
+        seed (int, optional): Random seed
+        today (date, optional): Reference day the dates are laid out
+            around; today if omitted
+
+    Yields:
+        dict: Each task, as stored in tasks.json, with IDs from 1
+    """
+    rng = random.Random(seed)
+    end = datetime.combine(today or date.today(), time(9))
+
+    for task_id in range(1, count + 1):
+        age = rng.random()
+        created = end - timedelta(seconds=int(age * HISTORY_DAYS * 86400), microseconds=rng.randrange(1, 1000000))
+        completed = rng.random() < 0.1 + 0.6 * age
+        updated = created + timedelta(hours=rng.expovariate(1 / 24)) if completed else created
+
+        title = f"{rng.choice(VERBS)} {rng.choice(NOUNS)}"
+        if rng.random() < 0.3:
+            title += f" #{rng.randrange(1, 1000)}"
+
+        # Log-normal word count: many short descriptions, a few long ones
+        if rng.random() < 0.4:
+            description = ""
+        else:
+            length = min(200, max(1, int(math.exp(rng.gauss(2.3, 0.9)))))
+            description = " ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + "."
+
+        task = {
+            "id": task_id,
+            "title": title,
+            "description": description,
+            "completed": completed,
+            "created_at": created.isoformat(),
+            "updated_at": updated.isoformat()
+        }
+
+        if rng.random() < 0.65:
+            due = created.date() + timedelta(days=int(rng.expovariate(1 / 21)))
+            task["due_date"] = due.isoformat()
+
+        task["priority"] = rng.choices(PRIORITIES, PRIORITY_WEIGHTS)[0]
+
+        tag_count = rng.choices(range(len(TAG_COUNT_WEIGHTS)), TAG_COUNT_WEIGHTS)[0]
+        tags = []
+        while len(tags) < tag_count:
+            tag = rng.choices(TAGS, TAG_WEIGHTS)[0]
+            if tag not in tags:
+                tags.append(tag)
+        task["tags"] = tags
+
+        yield task
+
+def write_dataset(filename, count, seed=42, today=None):
+    """
+    Write a synthetic task file
+
+    Args:
+        filename (str): Task file to create (tasks.json); its journal and
+            metadata files are written next to it
+        count (int): Number of tasks
+        seed (int, optional): Random seed
+        today (date, optional): Reference day, as for generate_tasks()
+
+    Returns:
+        bool: True if the file was written, False otherwise
+    """
+    storage = Storage(filename, journal=True)
+    storage.next_id = count + 1
+    return storage.save_tasks(list(generate_tasks(count, seed, today)))
+
+def parse_count(value):
+    """Read a dataset size given as a number or as 1k, 10k, 100k or 1m"""
+    value = value.strip().lower()
+    if value in SIZES:
+        return SIZES[value]
+    return int(value.replace(",", "").replace("_", ""))
+
+def main():
+    """Write a dataset file"""
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic tasks.json")
+    parser.add_argument("--count", type=parse_count, default=10000, help="Number of tasks: a number or 1k, 10k, 100k, 1m (default: 10k)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument("--out", default="tasks.json", help="File to write (default: tasks.json)")
+    args = parser.parse_args()
+
+    if write_dataset(args.out, args.count, args.seed):
+        print(f"Wrote {args.count:,} tasks to {args.out}")
+
+if __name__ == "__main__":
+    main()
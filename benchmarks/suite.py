@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite - Times the hot paths of Storage and TaskManager
+
+For each dataset size a synthetic tasks.json is generated (see dataset.py)
+and every scenario is run on a fresh copy of it, the way the CLI would
+run: loading, saving, single adds, toggles and deletes, search, the first
+page of each list view, each bulk action and each export format. Nothing
+prompts; progress goes to stderr and the results are written as JSON, so
+two runs (say, before and after a change) can be compared with --compare.
+
+Usage:
+    python benchmarks/suite.py [--sizes 1k,10k,100k] [--repeat 3] [--out results.json]
+    python benchmarks/suite.py --out after.json --compare before.json
+"""
+import os
+import sys
+import json
+import shutil
+import random
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import time as timer
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import exporters
+from storage import Storage
+from task_manager import TaskManager
+from task_commands import LIST_VIEWS, view_query
+from dataset import parse_count, write_dataset
+
+# Single operations (add, toggle, delete) are timed this many at a time
+OPS = 100
+
+# Searched for by the search scenarios: a common title word and part of one
+SEARCH_WORD = "invoice"
+SEARCH_SUBSTRING = "voic"
+
+# Regressions larger than this are flagged by --compare (as a fraction)
+THRESHOLD = 0.2
+
+def manager(filename):
+    """A task manager over a task file, as the CLI creates it"""
+    return TaskManager(storage=Storage(filename, journal=True))
+
+def timed(function, *args, **kwargs):
+    """Run a function and return the seconds it took"""
+    start = timer.perf_counter()
+    function(*args, **kwargs)
+    return timer.perf_counter() - start
+
+def sample_ids(filename, count, seed=1):
+    """IDs of count random tasks of the file, the same ones every run"""
+    ids = [task["id"] for task in Storage(filename, journal=True).iter_tasks()]
+    return random.Random(seed).sample(ids, min(count, len(ids)))
+
+def bench_load_cold(filename):
+    """Load every task with no binary cache, as after the file was edited"""
+    if os.path.exists(f"{filename}.cache"):
+        os.remove(f"{filename}.cache")
+    return timed(manager(filename).get_tasks)
+
+def bench_load_cached(filename):
+    """Load every task from an up-to-date binary cache"""
+    return timed(manager(filename).get_tasks)
+
+def bench_save(filename):
+    """Write a full snapshot of the loaded tasks"""
+    task_manager = manager(filename)
+    tasks = task_manager.get_tasks()
+    return timed(task_manager.storage.save_tasks, tasks)
+
+def bench_add(filename):
+    """Add tasks one at a time, each written as it is made"""
+    task_manager = manager(filename)
+    task_manager.get_tasks()
+
+    start = timer.perf_counter()
+    for number in range(OPS):
+        task_manager.add_task(f"Benchmark task {number}", "Added by the benchmark", "2030-01-01", "high", ["work"])
+    return timer.perf_counter() - start
+
+def bench_toggle(filename):
+    """Complete tasks one at a time"""
+    ids = sample_ids(filename, OPS)
+    task_manager = manager(filename)
+    task_manager.get_tasks()
+
+    start = timer.perf_counter()
+    for task_id in ids:
+        task_manager.toggle_task_status(task_id)
+    return timer.perf_counter() - start
+
+def bench_delete(filename):
+    """Delete tasks one at a time"""
+    ids = sample_ids(filename, OPS)
+    task_manager = manager(filename)
+    task_manager.get_tasks()
+
+    start = timer.perf_counter()
+    for task_id in ids:
+        task_manager.delete_task(task_id)
+    return timer.perf_counter() - start
+
+def bench_search_cold(filename):
+    """Search in a fresh process, building the search index"""
+    return timed(manager(filename).search_tasks, SEARCH_WORD)
+
+def bench_search_saved(filename):
+    """Search in a fresh process, with the search index saved by an earlier run"""
+    task_manager = manager(filename)
+    task_manager.search_tasks(SEARCH_WORD)
+    task_manager.save()
+    return timed(manager(filename).search_tasks, SEARCH_WORD)
+
+def bench_search_substring(filename):
+    """Substring search in a fresh process"""
+    return timed(manager(filename).search_tasks, SEARCH_SUBSTRING, substring=True)
+
+def list_view(view):
+    """Scenario fetching the first page of a list view in a fresh process"""
+    def bench(filename):
+        return timed(manager(filename).page_tasks, **view_query(view))
+    bench.__doc__ = f"First page of the {view} view"
+    return bench
+
+def bulk_action(action):
+    """Scenario running one of the bulk actions as bulk_actions() does, in a fresh process"""
+    def bench(filename):
+        task_manager = manager(filename)
+        start = timer.perf_counter()
+
+        if action == "complete all":
+            ids = [task["id"] for task in task_manager.query_tasks(completed=False)]
+            with task_manager.transaction():
+                task_manager.set_status(ids, True)
+        elif action == "reopen all":
+            ids = [task["id"] for task in task_manager.query_tasks(completed=True)]
+            with task_manager.transaction():
+                task_manager.set_status(ids, False)
+        else:
+            if action == "delete completed":
+                tasks = task_manager.query_tasks(completed=True)
+            elif action == "delete all":
+                tasks = task_manager.query_tasks()
+            else:
+                cutoff = date.today() - timedelta(days=30)
+                tasks = task_manager.query_tasks(created_before=cutoff.isoformat())
+            with task_manager.transaction():
+                task_manager.delete_tasks(task["id"] for task in tasks)
+
+        return timer.perf_counter() - start
+    bench.__doc__ = f"Bulk action: {action}"
+    return bench
+
+def export(fmt):
+    """Scenario exporting every task in a format, in a fresh process"""
+    def bench(filename):
+        out = os.path.join(os.path.dirname(filename), f"export.{exporters.EXTENSIONS[fmt]}")
+        return timed(exporters.export_tasks, manager(filename).iter_tasks(), fmt, out)
+    bench.__doc__ = f"Export to {fmt}"
+    return bench
+
+# (name, function, operations timed per run)
+SCENARIOS = [
+    ("load.cold", bench_load_cold, 1),
+    ("load.cached", bench_load_cached, 1),
+    ("save", bench_save, 1),
+    ("add", bench_add, OPS),
+    ("toggle", bench_toggle, OPS),
+    ("delete", bench_delete, OPS),
+    ("search.cold", bench_search_cold, 1),
+    ("search.saved", bench_search_saved, 1),
+    ("search.substring", bench_search_substring, 1)
+] + [
+    (f"list.{view.replace(' ', '_')}", list_view(view), 1) for view in LIST_VIEWS
+] + [
+    (f"bulk.{action.replace(' ', '_')}", bulk_action(action), 1)
+    for action in ("complete all", "reopen all", "delete completed", "delete all", "delete older")
+] + [
+    (f"export.{fmt}", export(fmt), 1) for fmt in exporters.FORMATS
+]
+
+def run_scenario(function, dataset, repeat):
+    """
+    Time a scenario on fresh copies of a dataset
+
+    Args:
+        function (callable): Scenario, given the task file and returning
+            the seconds its timed part took
+        dataset (str): Directory holding the dataset's files
+        repeat (int): Number of runs
+
+    Returns:
+        list: Seconds taken by each run
+    """
+    runs = []
+    for _ in range(repeat):
+        workdir = tempfile.mkdtemp(prefix="taskmaster-bench-")
+        try:
+            for name in os.listdir(dataset):
+                shutil.copy(os.path.join(dataset, name), workdir)
+            runs.append(function(os.path.join(workdir, "tasks.json")))
+        finally:
+            shutil.rmtree(workdir)
+    return runs
+
+def prepare_dataset(directory, count, seed):
+    """Write a dataset and its binary cache, as a user's files would be after one run"""
+    filename = os.path.join(directory, "tasks.json")
+    write_dataset(filename, count, seed)
+    Storage(filename, journal=True).load_tasks()
+
+def environment():
+    """Details of the machine and code the results were measured on"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+
+    return {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy_version
+    }
+
+def run_suite(sizes, names, repeat, seed):
+    """
+    Run the selected scenarios for each dataset size
+
+    Args:
+        sizes (list): Dataset sizes
+        names (list): Scenario name prefixes to run; all if empty
+        repeat (int): Runs per scenario
+        seed (int): Dataset seed
+
+    Returns:
+        list: One result dict per size and scenario
+    """
+    scenarios = [entry for entry in SCENARIOS if not names or any(entry[0].startswith(name) for name in names)]
+    results = []
+
+    for size in sizes:
+        dataset = tempfile.mkdtemp(prefix="taskmaster-dataset-")
+        try:
+            print(f"Generating {size:,} tasks", file=sys.stderr)
+            prepare_dataset(dataset, size, seed)
+
+            for name, function, ops in scenarios:
+                runs = run_scenario(function, dataset, repeat)
+                best = min(runs)
+                results.append({
+                    "size": size,
+                    "scenario": name,
+                    "ops": ops,
+                    "best": best,
+                    "median": statistics.median(runs),
+                    "per_op": best / ops,
+                    "runs": runs
+                })
+                print(f"  {name:<24} {best * 1000:>10.1f} ms", file=sys.stderr)
+        finally:
+            shutil.rmtree(dataset)
+
+    return results
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    Print (to stderr) how each result changed against an earlier run
+
+    Args:
+        results (list): Results of this run
+        baseline (list): Results of the earlier run
+        threshold (float, optional): Slowdown (as a fraction) to flag
+
+    Returns:
+        int: Number of scenarios that got slower than the threshold
+    """
+    before = {(result["size"], result["scenario"]): result["best"] for result in baseline}
+    regressions = 0
+
+    print(f"{'Scenario':<24} {'Size':>9} {'Before ms':>11} {'After ms':>11} {'Change':>8}", file=sys.stderr)
+    for result in results:
+        old = before.get((result["size"], result["scenario"]))
+        if old is None:
+            continue
+
+        change = result["best"] / old - 1 if old else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  slower"
+            regressions += 1
+        elif change < -threshold:
+            flag = "  faster"
+
+        print(f"{result['scenario']:<24} {result['size']:>9,} {old * 1000:>11.1f} "
+              f"{result['best'] * 1000:>11.1f} {change:>+8.0%}{flag}", file=sys.stderr)
+
+    return regressions
+
+def main():
+    """Run the suite and write the results"""
+    parser = argparse.ArgumentParser(description="Time the Storage and TaskManager hot paths")
+    parser.add_argument("--sizes", default="1k,10k,100k", help="Comma-separated dataset sizes: numbers or 1k, 10k, 100k, 1m (default: 1k,10k,100k)")
+    parser.add_argument("--scenarios", default="", help="Comma-separated scenario names or prefixes, e.g. load,export.csv (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario; the best is reported (default: 3)")
+    parser.add_argument("--seed", type=int, default=42, help="Dataset seed (default: 42)")
+    parser.add_argument("--out", default="-", help="Where to write the JSON results (default: - for stdout)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD * 100, help="Percent slowdown --compare flags as a regression (default: 20)")
+    parser.add_argument("--list", action="store_true", help="List the scenarios and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, function, _ in SCENARIOS:
+            print(f"{name:<24} {function.__doc__}")
+        return
+
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    try:
+        sizes = [parse_count(size) for size in args.sizes.split(",") if size.strip()]
+    except ValueError:
+        parser.error(f"invalid --sizes: {args.sizes}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    report = environment()
+    report.update(seed=args.seed, repeat=args.repeat, results=run_suite(sizes, names, args.repeat, args.seed))
+
+    text = json.dumps(report, indent=2)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+
+    if baseline is not None:
+        print(file=sys.stderr)
+        if compare(report["results"], baseline, args.threshold / 100):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Task Memory Benchmark - Bytes per task as plain dicts versus Task objects
+
+Builds synthetic tasks the way they arrive from tasks.json (every value a
+fresh object, as json.load creates them), measures them with tracemalloc,
+then converts them to Task objects and measures again.
+
+Usage:
+    python benchmarks/task_memory.py [--count 1000000]
+"""
+import os
+import sys
+import gc
+import json
+import random
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_model import Task
+
+PRIORITIES = ["low", "medium", "high"]
+TAGS = ["work", "home", "urgent", "errand", "finance", "health", "reading", "travel", "family", "project"]
+
+# Tasks are round-tripped through JSON in chunks of this many
+CHUNK = 10000
+
+def synthetic_tasks(count, seed=42):
+    """
+    Generate tasks as tasks.json would hold them
+
+    Args:
+        count (int): Number of tasks
+        seed (int, optional): Random seed, so runs are comparable
+
+    Yields:
+        dict: Each task, freshly decoded from JSON
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+
+    for first in range(1, count + 1, CHUNK):
+        chunk = []
+        for task_id in range(first, min(first + CHUNK, count + 1)):
+            created = start + timedelta(seconds=rng.randrange(365 * 86400), microseconds=rng.randrange(1, 1000000))
+            task = {
+                "id": task_id,
+                "title": f"Task {task_id}: follow up on item {rng.randrange(100000)}",
+                "description": "Synthetic task used for the memory benchmark" if rng.random() < 0.5 else "",
+                "completed": rng.random() < 0.3,
+                "created_at": created.isoformat(),
+                "updated_at": (created + timedelta(hours=rng.randrange(48))).isoformat()
+            }
+            if rng.random() < 0.6:
+                task["due_date"] = (created + timedelta(days=rng.randrange(60))).date().isoformat()
+            task["priority"] = rng.choice(PRIORITIES)
+            task["tags"] = rng.sample(TAGS, rng.randrange(4))
+            chunk.append(task)
+
+        yield from json.loads(json.dumps(chunk))
+
+def traced_bytes():
+    """Bytes currently allocated, after a full collection"""
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+def main():
+    """Run the benchmark and print bytes per task"""
+    parser = argparse.ArgumentParser(description="Compare memory use of dict tasks and Task objects")
+    parser.add_argument("--count", type=int, default=1000000, help="Number of synthetic tasks (default: 1,000,000)")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    baseline = traced_bytes()
+
+    tasks = list(synthetic_tasks(args.count))
+    dict_bytes = traced_bytes() - baseline
+
+    tasks = [Task(task) for task in tasks]
+    task_bytes = traced_bytes() - baseline
+
+    tracemalloc.stop()
+
+    print(f"Tasks:           {args.count:,}")
+    print(f"dict per task:   {dict_bytes / args.count:,.0f} bytes ({dict_bytes / 2 ** 20:,.1f} MiB total)")
+    print(f"Task per task:   {task_bytes / args.count:,.0f} bytes ({task_bytes / 2 ** 20:,.1f} MiB total)")
+    print(f"Saving:          {1 - task_bytes / dict_bytes:.0%}")
+
+if __name__ == "__main__":
+    main()
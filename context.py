@@ -1,6 +1,38 @@
 
-from rich.console import Console
-from task_manager import TaskManager
+import os
 
-console = Console()
-task_manager = TaskManager()
+
+class _Lazy:
+    """Stand-in for a shared object that is only created when first used"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+
+    def _get(self):
+        if self._instance is None:
+            self._instance = self._factory()
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+
+def _create_console():
+    # Importing rich is a large part of start-up time, so only pay for it
+    # when something is actually printed
+    from rich.console import Console
+    return Console()
+
+
+def _create_task_manager():
+    from task_manager import TaskManager
+
+    # TASKMASTER_BACKEND=sqlite stores tasks in tasks.db instead of tasks.json,
+    # TASKMASTER_BACKEND=sharded in one file per month under tasks.shards/ and
+    # TASKMASTER_BACKEND=records in the memory-mapped tasks.records
+    return TaskManager(backend=os.environ.get("TASKMASTER_BACKEND", "json"))
+
+
+console = _Lazy(_create_console)
+task_manager = _Lazy(_create_task_manager)
\ No newline at end of file
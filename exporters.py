@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Exporters Module - Streams tasks out as CSV, Markdown or JSON
+
+Each export is a pipeline of generators: the tasks are filtered by the
+task manager, transformed into text chunks one task at a time, and
+written in batches, so memory use stays flat however many tasks there are.
+"""
+import io
+import sys
+import csv
+import gzip
+import json
+from datetime import datetime
+
+from task_model import json_default
+
+CSV_FIELDS = ['id', 'title', 'description', 'completed', 'due_date', 'priority', 'tags', 'created_at', 'updated_at']
+
+# File extension for each export format
+EXTENSIONS = {"csv": "csv", "markdown": "md", "json": "json"}
+
+# Value of the completed flag to filter on for each status choice
+STATUSES = {"all": None, "pending": False, "completed": True}
+
+# Text is handed to the output in batches of roughly this many characters
+CHUNK_SIZE = 64 * 1024
+
+def csv_chunks(tasks):
+    """
+    Turn tasks into CSV text
+
+    Args:
+        tasks (iterable): Tasks to export
+
+    Yields:
+        str: The header line, then one line per task
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(CSV_FIELDS)
+    for task in tasks:
+        writer.writerow([
+            ', '.join(task.get('tags', [])) if field == 'tags' else task.get(field, '')
+            for field in CSV_FIELDS
+        ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Header only, if there were no tasks
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def markdown_chunks(tasks):
+    """
+    Turn tasks into a Markdown document
+
+    Args:
+        tasks (iterable): Tasks to export
+
+    Yields:
+        str: The document heading, then one section per task
+    """
+    yield (
+        "# Task List Export\n\n"
+        f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    )
+
+    for task in tasks:
+        status = "✅ COMPLETED" if task["completed"] else "⏳ PENDING"
+        parts = [
+            f"## [{task['id']}] {task['title']}\n\n",
+            f"**Status:** {status}\n\n"
+        ]
+
+        if task["description"]:
+            parts.append(f"**Description:** {task['description']}\n\n")
+
+        if task.get("due_date"):
+            parts.append(f"**Due Date:** {task['due_date']}\n\n")
+
+        if task.get("priority"):
+            parts.append(f"**Priority:** {task['priority'].upper()}\n\n")
+
+        if task.get("tags"):
+            parts.append(f"**Tags:** {', '.join(task['tags'])}\n\n")
+
+        parts.append(f"**Created:** {task.get('created_at', '')}\n\n")
+        parts.append(f"**Updated:** {task.get('updated_at', '')}\n\n")
+        parts.append("---\n\n")
+
+        yield "".join(parts)
+
+def json_chunks(tasks):
+    """
+    Turn tasks into a JSON array laid out like json.dump(..., indent=2)
+
+    Args:
+        tasks (iterable): Tasks to export
+
+    Yields:
+        str: The opening bracket, one element per task, then the closing
+            bracket
+    """
+    separator = "[\n"
+    for task in tasks:
+        element = json.dumps(task, indent=2, default=json_default).replace("\n", "\n  ")
+        yield f"{separator}  {element}"
+        separator = ",\n"
+
+    yield "[]" if separator == "[\n" else "\n]"
+
+FORMATS = {"csv": csv_chunks, "markdown": markdown_chunks, "json": json_chunks}
+
+def open_output(out):
+    """
+    Open the export destination for writing text
+
+    Args:
+        out (str): File name, "-" for standard output; names ending in
+            ".gz" are gzip-compressed
+
+    Returns:
+        file: Text file object to write to
+    """
+    if out == "-":
+        return sys.stdout
+
+    if out.endswith(".gz"):
+        return gzip.open(out, 'wt', encoding='utf-8', newline='')
+
+    return open(out, 'w', encoding='utf-8', newline='')
+
+def write_chunks(chunks, out, progress=None):
+    """
+    Write text chunks to the destination in batches
+
+    Args:
+        chunks (iterable): Text to write
+        out (str): Destination, as for open_output()
+        progress (callable, optional): Called with the number of characters
+            in each batch written
+
+    Returns:
+        int: Number of characters written
+    """
+    file = open_output(out)
+    written = 0
+
+    try:
+        batch = []
+        batch_size = 0
+        for chunk in chunks:
+            batch.append(chunk)
+            batch_size += len(chunk)
+            if batch_size >= CHUNK_SIZE:
+                file.write("".join(batch))
+                written += batch_size
+                if progress:
+                    progress(batch_size)
+                batch = []
+                batch_size = 0
+
+        if batch:
+            file.write("".join(batch))
+            written += batch_size
+            if progress:
+                progress(batch_size)
+    finally:
+        if file is sys.stdout:
+            file.flush()
+        else:
+            file.close()
+
+    return written
+
+def default_filename(fmt):
+    """
+    Get a timestamped file name for an export
+
+    Args:
+        fmt (str): Export format
+
+    Returns:
+        str: File name such as tasks_export_20240101_120000.csv
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"tasks_export_{timestamp}.{EXTENSIONS[fmt]}"
+
+def export_tasks(tasks, fmt, out, progress=None):
+    """
+    Stream tasks to a file or standard output
+
+    Args:
+        tasks (iterable): Tasks to export, already filtered
+        fmt (str): "csv", "markdown" or "json"
+        out (str): Destination, as for open_output()
+        progress (callable, optional): Called with the number of characters
+            in each batch written
+
+    Returns:
+        int: Number of characters written
+    """
+    return write_chunks(FORMATS[fmt](tasks), out, progress)
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Importers Module - Streams tasks in from CSV, JSON or NDJSON
+
+The counterpart of the exporters: rows are read one at a time (CSV with the
+export's columns, a JSON array as written by the JSON export, or one JSON
+object per line), validated and normalized in batches, and handed to the
+task manager, which adds each batch with a block of new IDs. The whole
+import is one transaction, so it is written out once and either every
+valid row is imported or, if the file turns out to be unreadable, none.
+"""
+import sys
+import csv
+import gzip
+import json
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+
+from storage import iter_json_array
+
+PRIORITIES = ("low", "medium", "high")
+
+# Spellings of the completed flag accepted in CSV files (compared in lower case)
+TRUE_VALUES = frozenset(("true", "yes", "y", "1", "x", "done", "completed"))
+FALSE_VALUES = frozenset(("false", "no", "n", "0", "", "pending"))
+
+# Rows are validated and added this many at a time
+BATCH_SIZE = 5000
+
+# Import format for each file extension
+EXTENSIONS = {"csv": "csv", "json": "json", "ndjson": "ndjson", "jsonl": "ndjson"}
+
+class InvalidRow(ValueError):
+    """A row that cannot be turned into a task"""
+
+def open_input(source):
+    """
+    Open an import file for reading text
+
+    Args:
+        source (str): File name, "-" for standard input; names ending in
+            ".gz" are decompressed
+
+    Returns:
+        file: Text file object to read from
+    """
+    if source == "-":
+        return sys.stdin
+
+    if source.endswith(".gz"):
+        return gzip.open(source, 'rt', encoding='utf-8', newline='')
+
+    return open(source, 'r', encoding='utf-8', newline='')
+
+def guess_format(source):
+    """
+    Tell the import format from a file name
+
+    Args:
+        source (str): File name, optionally ending in ".gz"
+
+    Returns:
+        str: "csv", "json" or "ndjson", or None if the extension is unknown
+    """
+    if source.endswith(".gz"):
+        source = source[:-3]
+    return EXTENSIONS.get(source.rsplit(".", 1)[-1].lower())
+
+def csv_rows(file):
+    """
+    Read tasks from CSV with a header line, such as a CSV export
+
+    Args:
+        file (file): Open CSV file
+
+    Yields:
+        tuple: (line number, row dict)
+
+    Raises:
+        ValueError: If there is no title column
+    """
+    reader = csv.DictReader(file)
+    if reader.fieldnames is None:
+        return
+    if "title" not in reader.fieldnames:
+        raise ValueError("The CSV header has no title column")
+
+    for row in reader:
+        yield reader.line_num, row
+
+def json_rows(file):
+    """
+    Read tasks from a JSON array, such as a JSON export
+
+    Args:
+        file (file): Open JSON file
+
+    Yields:
+        tuple: (position in the array, counting from 1, element)
+
+    Raises:
+        json.JSONDecodeError: If the file is not a JSON array
+    """
+    yield from enumerate(iter_json_array(file), 1)
+
+def ndjson_rows(file):
+    """
+    Read tasks given as one JSON object per line
+
+    Args:
+        file (file): Open NDJSON file
+
+    Yields:
+        tuple: (line number, decoded line, or the error text if it is not
+            valid JSON); blank lines are skipped
+    """
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+
+        try:
+            yield number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, f"Invalid JSON: {e}"
+
+READERS = {"csv": csv_rows, "json": json_rows, "ndjson": ndjson_rows}
+
+def normalize_row(row):
+    """
+    Validate a row and turn it into task fields
+
+    Strings are accepted for every field, as CSV has nothing else: tags
+    separated by commas, the completed flag as true/false, yes/no or 1/0,
+    due dates as YYYY-MM-DD (the date part of a timestamp is also taken).
+    Any id in the row is ignored; imported tasks get new IDs.
+
+    Args:
+        row (dict): Row as read from the file
+
+    Returns:
+        dict: Task fields for TaskManager.add_tasks()
+
+    Raises:
+        InvalidRow: If the row is not a valid task
+    """
+    if isinstance(row, str):
+        raise InvalidRow(row)
+    if not isinstance(row, dict):
+        raise InvalidRow("Expected a JSON object")
+
+    title = row.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise InvalidRow("A task needs a title")
+
+    description = row.get("description") or ""
+    if not isinstance(description, str):
+        raise InvalidRow("description must be a string")
+
+    fields = {
+        "title": title.strip(),
+        "description": description,
+        "completed": _completed(row.get("completed")),
+        "priority": _priority(row.get("priority")),
+        "tags": _tags(row.get("tags"))
+    }
+
+    due_date = _due_date(row.get("due_date"))
+    if due_date:
+        fields["due_date"] = due_date
+
+    for key in ("created_at", "updated_at"):
+        value = row.get(key)
+        if value:
+            try:
+                datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise InvalidRow(f"{key} must be an ISO timestamp") from None
+            fields[key] = value
+
+    return fields
+
+def _completed(value):
+    """Read the completed flag"""
+    if value is None or isinstance(value, bool):
+        return bool(value)
+
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise InvalidRow(f"completed must be true or false, not {value!r}")
+
+def _priority(value):
+    """Read the priority, medium if there is none"""
+    if not value:
+        return "medium"
+
+    priority = value.strip().lower() if isinstance(value, str) else value
+    if priority not in PRIORITIES:
+        raise InvalidRow(f"priority must be one of {', '.join(PRIORITIES)}")
+    return priority
+
+def _tags(value):
+    """Read the tags, a list or a comma-separated string"""
+    if not value:
+        return []
+
+    if isinstance(value, str):
+        value = value.split(",")
+    elif not isinstance(value, list):
+        raise InvalidRow("tags must be a list or a comma-separated string")
+
+    tags = []
+    for tag in value:
+        if not isinstance(tag, str):
+            raise InvalidRow("tags must be strings")
+        if tag.strip():
+            tags.append(tag.strip())
+    return tags
+
+def _due_date(value):
+    """Read the due date as YYYY-MM-DD, None if there is none"""
+    if not value:
+        return None
+
+    try:
+        return _parse_date(value.strip()[:10])
+    except (AttributeError, ValueError):
+        raise InvalidRow(f"due_date must be a YYYY-MM-DD date, not {value!r}") from None
+
+@lru_cache(maxsize=4096)
+def _parse_date(text):
+    """Check a YYYY-MM-DD date (a large import repeats the same few a lot)"""
+    return datetime.strptime(text, "%Y-%m-%d").date().isoformat()
+
+def dedupe_key(task):
+    """
+    Key under which two tasks count as the same for deduplication
+
+    Args:
+        task (dict): Task or normalized row
+
+    Returns:
+        tuple: Title (ignoring case and surrounding spaces) and due date
+    """
+    return (task["title"].strip().casefold(), task.get("due_date") or "")
+
+def import_tasks(task_manager, rows, dedupe=False, batch_size=BATCH_SIZE, on_error=None):
+    """
+    Validate rows and add them as new tasks
+
+    Args:
+        task_manager (TaskManager): Task manager to add the tasks to
+        rows (iterable): (row number, row) pairs from one of the READERS
+        dedupe (bool, optional): Skip rows with the same title and due date
+            as an existing task or an earlier row
+        batch_size (int, optional): Rows validated and added at a time
+        on_error (callable, optional): Called with the row number and the
+            reason for each invalid row, which is skipped
+
+    Returns:
+        dict: Number of rows "imported", skipped as "duplicates" and
+            skipped as "invalid"
+
+    Raises:
+        ValueError: If the file cannot be read; nothing is imported then
+    """
+    counts = {"imported": 0, "duplicates": 0, "invalid": 0}
+    rows = iter(rows)
+
+    with task_manager.transaction():
+        seen = {dedupe_key(task) for task in task_manager.iter_tasks()} if dedupe else None
+
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+
+            tasks = []
+            for number, row in batch:
+                try:
+                    fields = normalize_row(row)
+                except InvalidRow as e:
+                    counts["invalid"] += 1
+                    if on_error:
+                        on_error(number, str(e))
+                    continue
+
+                if seen is not None:
+                    key = dedupe_key(fields)
+                    if key in seen:
+                        counts["duplicates"] += 1
+                        continue
+                    seen.add(key)
+
+                tasks.append(fields)
+
+            counts["imported"] += len(task_manager.add_tasks(tasks))
+
+    return counts
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Instrumentation Module - Per-operation timers, counters and latency histograms
+
+Off by default. enable() wraps the methods of Storage, SQLiteStorage,
+ShardedStorage, RecordStorage and TaskManager and the functions of
+task_commands, exporters and archive in timers, so every call is counted
+and timed; until then nothing is wrapped and the code runs exactly as
+written. A few long operations also time their own phases
+with timer() (serializing vs fsync in save_tasks, fetching vs rendering in
+list_tasks), which costs one function call per operation while disabled.
+
+Times are inclusive: a TaskManager method includes the Storage calls it
+makes. Each timer keeps a histogram with buckets √2 apart, from which the
+percentiles are estimated.
+"""
+import sys
+import json
+import math
+import atexit
+import threading
+from functools import wraps
+from contextlib import contextmanager
+from time import perf_counter
+
+# Histogram buckets per doubling of the duration, and the fastest bucket (1 µs)
+BUCKETS_PER_DOUBLING = 2
+MIN_SECONDS = 1e-6
+
+# Percentiles shown in reports
+PERCENTILES = (50, 95, 99)
+
+# Private methods worth timing on their own, by class name
+PRIVATE_METHODS = {
+    "Storage": ("_open_snapshot", "_load_snapshot", "_read_cache", "_write_cache", "_hash",
+                "_backfill", "_apply_journal", "_append"),
+    "ShardedStorage": ("_read_manifest", "_load_shard", "_locate", "_write_shards"),
+    "RecordStorage": ("_sync", "_select", "_decode", "_write", "_compact", "_rewrite"),
+    "TaskManager": ("_load", "_refresh", "_replay", "_commit", "_persist", "_saved_index")
+}
+
+# Timer name -> Timer, or None while disabled
+_timers = None
+_counters = {}
+_lock = threading.Lock()
+
+class Timer:
+    """Call count, total, extremes and latency histogram of one operation"""
+
+    __slots__ = ("calls", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = {}
+
+    def add(self, seconds):
+        """Record one call"""
+        self.calls += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+        bucket = bucket_of(seconds)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, percent):
+        """
+        Estimate a percentile from the histogram
+
+        Args:
+            percent (float): Percentile, 0 to 100
+
+        Returns:
+            float: Upper edge of the bucket holding it, in seconds (never
+                more than the slowest call)
+        """
+        rank = math.ceil(self.calls * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(bucket_limit(bucket), self.max)
+        return self.max
+
+    def to_dict(self):
+        """Plain data for JSON reports"""
+        result = {
+            "calls": self.calls,
+            "total": self.total,
+            "mean": self.total / self.calls if self.calls else 0.0,
+            "min": self.min if self.calls else 0.0,
+            "max": self.max
+        }
+        for percent in PERCENTILES:
+            result[f"p{percent}"] = self.percentile(percent)
+
+        # [upper edge in seconds, calls] for each bucket that has any
+        result["histogram"] = [[bucket_limit(bucket), self.buckets[bucket]] for bucket in sorted(self.buckets)]
+        return result
+
+def bucket_of(seconds):
+    """Histogram bucket of a duration"""
+    if seconds <= MIN_SECONDS:
+        return 0
+    return math.ceil(math.log2(seconds / MIN_SECONDS) * BUCKETS_PER_DOUBLING)
+
+def bucket_limit(bucket):
+    """Upper edge of a histogram bucket, in seconds"""
+    return MIN_SECONDS * 2 ** (bucket / BUCKETS_PER_DOUBLING)
+
+def is_enabled():
+    """Whether calls are being timed"""
+    return _timers is not None
+
+def record(name, seconds):
+    """
+    Add a timed call to a timer
+
+    Args:
+        name (str): Operation name
+        seconds (float): How long it took
+    """
+    if _timers is None:
+        return
+
+    with _lock:
+        stats = _timers.get(name)
+        if stats is None:
+            stats = _timers[name] = Timer()
+        stats.add(seconds)
+
+def count(name, amount=1):
+    """
+    Add to a counter (bytes written, cache hits, ...)
+
+    Args:
+        name (str): Counter name
+        amount (int, optional): Amount to add
+    """
+    if _timers is None:
+        return
+
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+class _NullTimer:
+    """Stand-in returned by timer() while disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+def timer(name):
+    """
+    Time a block of code
+
+    Usage:
+        with instrumentation.timer("Storage.save_tasks: fsync"):
+            os.fsync(file.fileno())
+
+    Args:
+        name (str): Operation name
+
+    Returns:
+        context manager: Records the time the block took when it exits
+    """
+    if _timers is None:
+        return _NULL_TIMER
+    return _timed_block(name)
+
+@contextmanager
+def _timed_block(name):
+    """Context manager behind timer() while enabled"""
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        record(name, perf_counter() - start)
+
+def timed(name, function):
+    """
+    Wrap a function so every call is timed
+
+    Generators are timed while they run, not while their consumer does;
+    context managers from the whole with block.
+
+    Args:
+        name (str): Operation name
+        function (callable): Function or method to wrap
+
+    Returns:
+        callable: The wrapper
+    """
+    import inspect
+
+    if inspect.isgeneratorfunction(function):
+        @wraps(function)
+        def generator_wrapper(*args, **kwargs):
+            generator = function(*args, **kwargs)
+            elapsed = 0.0
+            try:
+                while True:
+                    start = perf_counter()
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += perf_counter() - start
+                    yield item
+            finally:
+                generator.close()
+                record(name, elapsed)
+        return generator_wrapper
+
+    wrapped = getattr(function, "__wrapped__", None)
+    if wrapped is not None and inspect.isgeneratorfunction(wrapped):
+        # A @contextmanager function
+        @wraps(function)
+        @contextmanager
+        def context_wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                with function(*args, **kwargs) as value:
+                    yield value
+            finally:
+                record(name, perf_counter() - start)
+        return context_wrapper
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record(name, perf_counter() - start)
+    return wrapper
+
+def instrument_class(cls, private=()):
+    """
+    Time every public method of a class, and the listed private ones
+
+    Args:
+        cls (type): Class to instrument
+        private (iterable, optional): Names of private methods to time too
+    """
+    import inspect
+
+    for name, value in list(vars(cls).items()):
+        if inspect.isfunction(value) and (not name.startswith("_") or name in private):
+            setattr(cls, name, timed(f"{cls.__name__}.{name}", value))
+
+def instrument_module(module):
+    """
+    Time every public function defined in a module
+
+    Code that imported a function by name before this keeps the original.
+
+    Args:
+        module (module): Module to instrument
+    """
+    import inspect
+
+    short_name = module.__name__.rsplit(".", 1)[-1]
+    for name, value in list(vars(module).items()):
+        if inspect.isfunction(value) and value.__module__ == module.__name__ and not name.startswith("_"):
+            setattr(module, name, timed(f"{short_name}.{name}", value))
+
+def enable():
+    """
+    Start timing: instrument the storages, the task manager, the commands,
+    the exporters and the archive. Does nothing if already enabled.
+    """
+    global _timers
+    if _timers is not None:
+        return
+
+    _timers = {}
+
+    import storage
+    import sqlite_storage
+    import sharded_storage
+    import record_storage
+    import task_manager
+    import task_commands
+    import exporters
+    import archive
+
+    for cls in (storage.Storage, sqlite_storage.SQLiteStorage, sharded_storage.ShardedStorage,
+                record_storage.RecordStorage, task_manager.TaskManager):
+        instrument_class(cls, PRIVATE_METHODS.get(cls.__name__, ()))
+
+    # The JSON snapshot parser, apart from backfilling and packing the tasks
+    storage.iter_json_array = timed("storage.iter_json_array", storage.iter_json_array)
+
+    for module in (task_commands, exporters, archive):
+        instrument_module(module)
+
+def report():
+    """
+    Get everything measured so far
+
+    Returns:
+        dict: "operations" (name -> timings, slowest total first) and
+            "counters" (name -> value)
+    """
+    with _lock:
+        timers = sorted((_timers or {}).items(), key=lambda item: item[1].total, reverse=True)
+        return {
+            "operations": {name: stats.to_dict() for name, stats in timers},
+            "counters": dict(sorted(_counters.items()))
+        }
+
+def format_report(data=None):
+    """
+    Lay out a report as a text table
+
+    Args:
+        data (dict, optional): Result of report(); the current one if omitted
+
+    Returns:
+        str: Table of operations (times in ms) followed by the counters
+    """
+    data = data or report()
+    width = max([len(name) for name in data["operations"]] + [len("Operation")])
+
+    headers = ["Calls", "Total", "Mean"] + [f"p{percent}" for percent in PERCENTILES] + ["Max"]
+    lines = [f"{'Operation':<{width}} " + " ".join(f"{header:>9}" for header in headers) + "   (ms)"]
+    for name, stats in data["operations"].items():
+        values = [stats["total"], stats["mean"]] + [stats[f"p{percent}"] for percent in PERCENTILES] + [stats["max"]]
+        lines.append(f"{name:<{width}} {stats['calls']:>9,} " + " ".join(f"{value * 1000:>9.2f}" for value in values))
+
+    if data["counters"]:
+        lines.append("")
+        for name, value in data["counters"].items():
+            lines.append(f"{name:<{width}} {value:>9,}")
+
+    return "\n".join(lines)
+
+def profile(out=None):
+    """
+    Time the rest of the run and report when the program exits
+
+    The breakdown is printed to stderr. With out, it is also saved: as JSON
+    if the name ends in .json, otherwise as cProfile statistics (for
+    python -m pstats, snakeviz and the like), the whole run being profiled.
+
+    Args:
+        out (str, optional): File to save the measurements to
+    """
+    enable()
+
+    profiler = None
+    if out and not out.endswith(".json"):
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    atexit.register(_finish, out, profiler)
+
+def _finish(out, profiler):
+    """Print the report and save it, at exit"""
+    if profiler is not None:
+        profiler.disable()
+
+    data = report()
+    print("\n" + format_report(data), file=sys.stderr)
+
+    if not out:
+        return
+
+    try:
+        if profiler is not None:
+            profiler.dump_stats(out)
+        else:
+            with open(out, 'w', encoding='utf-8') as file:
+                json.dump(data, file, indent=2)
+        print(f"Profile saved to {out}", file=sys.stderr)
+    except OSError as e:
+        print(f"Error saving profile: {e}", file=sys.stderr)
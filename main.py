@@ -4,10 +4,11 @@ TaskMaster CLI - A beautiful and feature-rich task tracking application
 import os
 import sys
 import argparse
-from rich.prompt import Prompt
-from task_ui import display_banner,show_help
-from task_commands import add_task,list_tasks,edit_task,mark_complete,delete_task,view_task_details,export_tasks,bulk_actions,search_tasks
 from context import task_manager,console
+from storage import StorageError
+
+# The UI modules pull in most of rich, so they are imported where needed:
+# one-shot commands like --complete only pay for what they use.
 
 
 def main():
@@ -18,21 +19,69 @@ def main():
     parser.add_argument("--list", action="store_true", help="List all tasks directly")
     parser.add_argument("--complete", type=int, help="Mark a task as completed by ID")
     parser.add_argument("--delete", type=int, help="Delete a task by ID")
+    parser.add_argument("--export", choices=["csv", "markdown", "json"], help="Export tasks in the given format")
+    parser.add_argument("--status", choices=["all", "pending", "completed"], default="all", help="Which tasks to export (default: all)")
+    parser.add_argument("--out", help="Export (or --batch result) destination: a file name (.gz to compress) or - for stdout")
+    parser.add_argument("--stats", action="store_true", help="Show task statistics")
+    parser.add_argument("--page", type=int, help="With --list, show only this page of tasks")
+    parser.add_argument("--page-size", type=int, default=20, help="Tasks per page when listing (default: 20)")
+    parser.add_argument("--batch", help="Apply operations from an NDJSON file (- for stdin), printing one result line each")
+    parser.add_argument("--commit-every", type=int, help="With --batch, write the changes out every N operations")
+    parser.add_argument("--import", dest="import_file", help="Add tasks from a CSV, JSON or NDJSON file (.gz to decompress, - for stdin)")
+    parser.add_argument("--import-format", choices=["csv", "json", "ndjson"], help="Format of the --import file (default: from its extension)")
+    parser.add_argument("--dedupe", action="store_true", help="With --import, skip tasks with the same title and due date as an existing one")
+    parser.add_argument("--archive", action="store_true", help="Move completed tasks to the compressed archive (tasks_archive.ndjson.gz)")
+    parser.add_argument("--older-than", type=int, metavar="DAYS", help="With --archive, only tasks not changed in this many days")
+    parser.add_argument("--include-pending", action="store_true", help="With --archive and --older-than, archive old pending tasks too")
+    parser.add_argument("--search-archive", metavar="KEYWORD", help="Search the archived tasks")
+    parser.add_argument("--archived", action="store_true", help="With --export, export the archived tasks instead")
+    parser.add_argument("--backup", action="store_true", help="Back up the tasks (only what changed since the last backup is stored)")
+    parser.add_argument("--backups", action="store_true", help="List the backups")
+    parser.add_argument("--restore", metavar="ID", help="Restore a backup by ID (or the start of one, or 'latest'), backing up the current tasks first")
+    parser.add_argument("--profile", action="store_true", help="Time every operation and print a breakdown on exit (to stderr)")
+    parser.add_argument("--profile-out", help="With --profile, also save the breakdown as JSON (.json) or a whole-run cProfile file (any other name)")
     
     args = parser.parse_args()
+    if args.page_size < 1:
+        parser.error("--page-size must be at least 1")
+    if args.commit_every is not None and args.commit_every < 1:
+        parser.error("--commit-every must be at least 1")
+    if args.older_than is not None and args.older_than < 0:
+        parser.error("--older-than must not be negative")
+    if args.include_pending and args.older_than is None:
+        parser.error("--include-pending needs --older-than, or every task would be archived")
+    if args.profile or args.profile_out:
+        import instrumentation
+        instrumentation.profile(args.profile_out)
+    
+    import_format = None
+    if args.import_file:
+        import importers
+        import_format = args.import_format or importers.guess_format(args.import_file)
+        if import_format is None:
+            parser.error("cannot tell the format of the --import file; give --import-format")
     
     # Process direct commands if provided
     if args.add:
+        from task_commands import add_task
         add_task()
+        task_manager.save()
         return
     elif args.list:
-        list_tasks()
+        from task_commands import list_tasks
+        list_tasks(page=args.page, page_size=args.page_size)
+        
+        # Keep the statistics built for the list for the next run
+        task_manager.save()
         return
     elif args.complete is not None:
         task_id = args.complete
         task = task_manager.get_task_by_id(task_id)
         if task:
             task_manager.toggle_task_status(task_id)
+            
+            # Keep the statistics the change adjusted for the next run
+            task_manager.save()
             console.print(f"[bold green]✅ Task #{task_id} marked as completed[/bold green]")
         else:
             console.print(f"[bold red]❌ Error: No task found with ID {task_id}[/bold red]")
@@ -42,12 +91,150 @@ def main():
         task = task_manager.get_task_by_id(task_id)
         if task:
             task_manager.delete_task(task_id)
+            
+            # Keep the statistics the change adjusted for the next run
+            task_manager.save()
             console.print(f"[bold green]🗑️ Task #{task_id} deleted[/bold green]")
         else:
             console.print(f"[bold red]❌ Error: No task found with ID {task_id}[/bold red]")
         return
+    elif args.stats:
+        stats = task_manager.stats()
+        console.print("[bold cyan]📊 Task Statistics[/bold cyan]")
+        console.print(f"Total tasks:     {stats['total']}")
+        console.print(f"Completed:       {stats['completed']} ({stats['completion_rate']:.1f}%)")
+        console.print(f"Pending:         {stats['pending']}")
+        console.print(f"  Overdue:       {stats['overdue']}")
+        console.print(f"  Due today:     {stats['due_today']}")
+        console.print(f"  Due later:     {stats['due_later']}")
+        console.print(f"  No due date:   {stats['no_due_date']}")
+        for label, key in (("By priority", "by_priority"), ("By tag", "by_tag")):
+            counts = ", ".join(f"{name} {count}" for name, count in stats[key].items())
+            console.print(f"{label + ':':<17}{counts or '-'}", markup=False, highlight=False)
+        
+        # Keep the counts for the next run
+        task_manager.save()
+        return
+    elif args.batch:
+        import batch
+        import exporters
+        try:
+            source = sys.stdin if args.batch == "-" else open(args.batch, encoding='utf-8')
+        except OSError as e:
+            print(f"Error: Cannot read {args.batch}: {e.strerror}", file=sys.stderr)
+            sys.exit(1)
+        out = exporters.open_output(args.out or "-")
+        try:
+            counts = batch.run_batch(task_manager, source, out, args.commit_every)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if out is not sys.stdout:
+                out.close()
+        
+        # Results go to stdout, so the summary goes to stderr
+        print(f"{counts['ok']} operations applied, {counts['failed']} failed", file=sys.stderr)
+        if counts["failed"]:
+            sys.exit(1)
+        return
+    elif args.import_file:
+        try:
+            source = importers.open_input(args.import_file)
+        except OSError as e:
+            console.print(f"[bold red]❌ Error: Cannot read {args.import_file}: {e.strerror}[/bold red]")
+            sys.exit(1)
+        
+        def report(number, reason):
+            print(f"Skipped row {number}: {reason}", file=sys.stderr)
+        
+        try:
+            counts = importers.import_tasks(task_manager, importers.READERS[import_format](source),
+                                            dedupe=args.dedupe, on_error=report)
+        except (ValueError, OSError, StorageError) as e:
+            console.print(f"[bold red]❌ Error: Cannot import {args.import_file}: {e}[/bold red]")
+            sys.exit(1)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        
+        task_manager.save()
+        console.print(f"[bold green]✅ Imported {counts['imported']} tasks[/bold green]"
+                      f" ({counts['duplicates']} duplicates and {counts['invalid']} invalid rows skipped)")
+        return
+    elif args.archive:
+        import archive
+        from datetime import date, timedelta
+        before = None
+        if args.older_than is not None:
+            before = (date.today() - timedelta(days=args.older_than)).isoformat()
+        
+        count = archive.archive_tasks(task_manager, before, args.include_pending)
+        task_manager.save()
+        console.print(f"[bold green]📦 {count} tasks archived[/bold green]")
+        return
+    elif args.search_archive:
+        from task_commands import search_tasks
+        search_tasks(args.search_archive, archived=True)
+        return
+    elif args.backup:
+        backup_id = task_manager.storage.backup_tasks()
+        if not backup_id:
+            console.print("[bold red]❌ Error: No backup was made[/bold red]")
+            sys.exit(1)
+        console.print(f"[bold green]✅ Backup {backup_id} created[/bold green]")
+        return
+    elif args.backups or args.restore:
+        import backups
+        storage = task_manager.storage
+        if not hasattr(storage, "write_snapshot"):
+            console.print("[bold red]❌ Error: Incremental backups are only kept for the JSON backend[/bold red]")
+            sys.exit(1)
+        directory = backups.backup_directory(storage.filename)
+        
+        if args.backups:
+            found = backups.list_backups(directory)
+            if not found:
+                console.print("[yellow]No backups yet; make one with --backup[/yellow]")
+            for backup in found:
+                added = backup["added"]
+                print(f"{backup['id']}  {backup['tasks']:>9,} tasks  {backup['size'] / 2**20:>8,.1f} MiB"
+                      f"  +{added['chunks']} chunks ({added['bytes'] / 1024:,.0f} KiB)")
+            return
+        
+        try:
+            result = backups.restore_backup(storage, args.restore, directory)
+        except ValueError as e:
+            console.print(f"[bold red]❌ Error: {e}[/bold red]")
+            sys.exit(1)
+        if result is None:
+            sys.exit(1)
+        restored, previous = result
+        console.print(f"[bold green]✅ Restored {restored['tasks']} tasks from backup {restored['id']}[/bold green]"
+                      f" (the tasks it replaced are in backup {previous['id']})")
+        return
+    elif args.export:
+        import exporters
+        out = args.out or exporters.default_filename(args.export)
+        if args.archived:
+            import archive
+            filename = archive.archive_filename(task_manager.storage.filename)
+            tasks = archive.iter_archive(filename, exporters.STATUSES[args.status])
+        else:
+            tasks = task_manager.iter_tasks(exporters.STATUSES[args.status])
+        exporters.export_tasks(tasks, args.export, out)
+        if out != "-":
+            console.print(f"[bold green]✅ Tasks exported successfully to {out}[/bold green]")
+        return
     
     # Interactive mode
+    from rich.prompt import Prompt
+    from task_ui import display_banner,show_help
+    from task_commands import add_task,list_tasks,edit_task,mark_complete,delete_task,view_task_details,export_tasks,bulk_actions,search_tasks
+    
+    # Changes made from the menus are written from a background thread, so
+    # they never wait on the disk; everything is flushed on exit
+    task_manager.start_write_behind()
+    
     try:
         os.system('cls' if os.name == 'nt' else 'clear')  # Clear the screen
         display_banner()
@@ -75,7 +262,7 @@ def main():
             if choice == "1":
                 add_task()
             elif choice == "2":
-                list_tasks()
+                list_tasks(page_size=args.page_size)
             elif choice == "3":
                 mark_complete()
             elif choice == "4":
@@ -101,12 +288,20 @@ def main():
                 break
     finally:
 
-        task_manager.storage.save_tasks(task_manager.get_tasks())
+        task_manager.save()
         console.print("[bold green]💾 Tasks saved successfully before exit.[/bold green]")
+        
+        metrics = task_manager.write_metrics()
+        if metrics and metrics["saved"]:
+            console.print(f"[dim]{metrics['changes']} changes written in {metrics['writes']} writes "
+                          f"({metrics['saved']} saved, longest wait {metrics['max_wait']:.1f}s)[/dim]")
 
 if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
         console.print("\n[bold green]👋 Thank you for using TaskMaster CLI! Have a productive day![/bold green]")
-        sys.exit(0)
\ No newline at end of file
+        sys.exit(0)
+    except StorageError as e:
+        console.print(f"[bold red]❌ Error: {e}[/bold red]")
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,971 @@
+#!/usr/bin/env python3
+"""
+Record Storage Module - Stores tasks as fixed-width records in a memory-mapped file
+
+Every task has a 64-byte record at offset ID * 64 of tasks.records, holding
+its ID, status flags, priority, due date and timestamps, and where the rest
+of it (title, description, tags and any other fields) sits in a heap file
+next to it. The file is accessed through mmap, so finding a task by ID is a
+single offset calculation, and changing its status or timestamps rewrites
+its record in place without reading any other task. Filters and sorts on
+status, priority, due date and creation time run on the records alone;
+only the tasks returned are read from the heap.
+
+The heap is append-only: a changed title or description is written to its
+end and the old copy left behind. Once more than half of it is dead, it is
+compacted by copying the live entries to a new heap and switching both files
+over with one rename.
+
+Slot 0 of the records file is a header holding the next task ID and a write
+counter, which other processes watch to notice changes.
+"""
+import os
+import sys
+import json
+import mmap
+import heapq
+import shutil
+import struct
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from task_model import (SORT_KEYS, NO_DUE_DATE, NO_TIMESTAMP, due_key, timestamp_key,
+                        pack_timestamp, unpack_timestamp, json_default)
+from task_stats import TaskStats
+
+# Advisory file locks keep several processes from clobbering each other's
+# writes. Without fcntl (Windows) one process at a time is assumed.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MAGIC = b"TMRECS\0\0"
+RECORD_VERSION = 1
+
+# Header (slot 0): magic, version, record size, next ID, write counter, dead
+# heap bytes, heap file number
+HEADER = struct.Struct("<8sIIqQQQ16x")
+
+# Task record: ID, flags, priority, due date (day number), created and
+# updated (microseconds since the epoch), heap offset and length
+RECORD = struct.Struct("<QBBxxiqqQI20x")
+RECORD_SIZE = RECORD.size
+
+# Record flags
+EXISTS = 1
+COMPLETED = 2
+DUE_IN_HEAP = 4
+CREATED_IN_HEAP = 8
+UPDATED_IN_HEAP = 16
+
+PRIORITY_CODES = {"high": 0, "medium": 1, "low": 2}
+PRIORITY_NAMES = {code: name for name, code in PRIORITY_CODES.items()}
+
+# Priority code for a task without one of the usual priorities
+NO_PRIORITY = 3
+
+# Timestamp field of a record whose task keeps that time in the heap (or has none)
+NO_TIME = -2 ** 63
+
+# Fields held in the record rather than the heap
+RECORD_FIELDS = frozenset(("id", "completed", "priority", "due_date", "created_at", "updated_at"))
+
+# Fields "set" can change by rewriting the record alone
+IN_PLACE_FIELDS = frozenset(("completed", "updated_at"))
+
+# The heap is compacted once it holds more than HEAP_MIN_GARBAGE dead bytes
+# and more dead than live ones
+HEAP_MIN_GARBAGE = 256 * 1024
+HEAP_GARBAGE_RATIO = 0.5
+
+# Grow the records file by at least this many slots at a time
+GROW_SLOTS = 1024
+
+# Maps each flags byte to 0 (no task), 1 (pending) or 2 (completed), for counting
+STATUS_TABLE = bytes(0 if not flags & EXISTS else 2 if flags & COMPLETED else 1 for flags in range(256))
+
+def pack_due(value):
+    """
+    Turn an ISO due date into its day number
+
+    Args:
+        value (str): Due date
+
+    Returns:
+        int: Day number, or None if the date would not be written back
+            exactly the same
+    """
+    if type(value) is not str or len(value) != 10:
+        return None
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        return None
+    return day.toordinal() if day.isoformat() == value else None
+
+class RecordStorage:
+    """Class to manage task storage in a memory-mapped record file"""
+
+    # Each mutation rewrites only the records it touches, so like the JSON
+    # journal there is no need to rewrite all tasks on each change
+    journal = True
+
+    def __init__(self, filename):
+        """
+        Initialize the storage with a records filename
+
+        Args:
+            filename (str): Records file; the heap and lock file are kept
+                next to it
+        """
+        self.filename = filename
+        self.lock_filename = f"{filename}.lock"
+        self.stats_filename = f"{filename}.stats"
+
+        dir_name = os.path.dirname(self.filename)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+
+        self.next_id = None
+
+        # Records file and its mapping, and the heap and its mapping (None
+        # while the heap is empty)
+        self._file = None
+        self._map = None
+        self._inode = None
+        self._heap_file = None
+        self._heap_map = None
+        self._heap_number = None
+
+        # Write counter as of the last time the header was read
+        self._generation = None
+
+        self._lock_file = None
+        self._lock_depth = 0
+        self._thread_lock = threading.RLock()
+
+        if not os.path.exists(self.filename):
+            self._create()
+        self._sync()
+
+    def load_tasks(self):
+        """
+        Load all tasks
+
+        Returns:
+            list: List of tasks
+        """
+        return list(self.iter_tasks())
+
+    def get_task(self, task_id):
+        """
+        Load a single task by its ID, reading only its record and heap entry
+
+        Args:
+            task_id (int): ID of the task
+
+        Returns:
+            dict: The task, or None if it does not exist
+        """
+        self._sync()
+
+        record = self._record(task_id)
+        return self._decode(record) if record is not None else None
+
+    def query_tasks(self, completed=None, order_by=None, created_before=None, due_from=None, due_before=None):
+        """
+        Load the tasks matching a filter, filtered and sorted on the records
+
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+            order_by (str, optional): "priority", "due_date" or "created_at";
+                insertion order if omitted
+            created_before (str, optional): Only tasks created before this
+                ISO date
+            due_from (str, optional): Only tasks due on or after this ISO date
+            due_before (str, optional): Only tasks due before this ISO date
+
+        Returns:
+            list: List of matching tasks
+        """
+        self._sync()
+
+        records = self._select(completed, created_before, due_from, due_before)
+        if order_by not in (None, "id"):
+            sort_key = self._sort_key(order_by)
+            records.sort(key=lambda record: (sort_key(record), record[0]))
+
+        return [self._decode(record) for record in records]
+
+    def page_tasks(self, completed=None, order_by=None, due_from=None, due_before=None, cursor=None, limit=20):
+        """
+        Load the tasks next to a keyset cursor, in the order of a view
+
+        Only the tasks on the page are read from the heap.
+
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+            order_by (str, optional): Sort order, as for query_tasks()
+            due_from (str, optional): Only tasks due on or after this ISO date
+            due_before (str, optional): Only tasks due before this ISO date
+            cursor (tuple, optional): ("after", key) or ("before", key), with
+                a key returned by an earlier call; the start if omitted
+            limit (int, optional): Maximum number of tasks
+
+        Returns:
+            list: (key, task) pairs walking away from the cursor, so in
+                reverse order for a "before" cursor
+        """
+        self._sync()
+
+        reverse = cursor is not None and cursor[0] == "before"
+
+        if order_by in (None, "id") and not reverse:
+            # Records are in ID order, so the page starts right after the
+            # cursor's task and ends once it is full
+            entries = []
+            for record in self._records(completed, cursor[1][1] if cursor is not None else 0):
+                if self._matches(record, None, due_from, due_before):
+                    entries.append(((0, record[0]), self._decode(record)))
+                    if len(entries) == limit:
+                        break
+            return entries
+
+        sort_key = self._sort_key(order_by)
+        entries = [((sort_key(record), record[0]), record) for record in self._select(completed, None, due_from, due_before)]
+
+        if cursor is not None:
+            edge = tuple(cursor[1])
+            entries = [entry for entry in entries if (entry[0] < edge if reverse else entry[0] > edge)]
+
+        pick = heapq.nlargest if reverse else heapq.nsmallest
+        return [(key, self._decode(record)) for key, record in pick(limit, entries, key=lambda entry: entry[0])]
+
+    def iter_tasks(self, completed=None):
+        """
+        Stream tasks one at a time
+
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+
+        Yields:
+            dict: Each matching task, in insertion order
+        """
+        self._sync()
+
+        for record in self._records(completed):
+            yield self._decode(record)
+
+    def count_tasks(self, completed=None):
+        """
+        Count tasks from the record flags, without reading the heap
+
+        Args:
+            completed (bool, optional): Only count completed or pending tasks
+
+        Returns:
+            int: Number of matching tasks
+        """
+        self._sync()
+
+        # The flags byte of every slot, each turned into its status
+        statuses = self._map[RECORD_SIZE + 8::RECORD_SIZE].translate(STATUS_TABLE)
+        if completed is None:
+            return len(statuses) - statuses.count(0)
+        return statuses.count(2 if completed else 1)
+
+    def task_stats(self):
+        """
+        Get the task statistics, kept next to the records by every write
+
+        They are only counted from the tasks when missing or out of date.
+
+        Returns:
+            TaskStats: Counts of every task
+        """
+        with self.lock():
+            stamp = self.stamp()
+            stats = TaskStats.load(self.stats_filename, stamp)
+            if stats is None:
+                stats = TaskStats.build(self.iter_tasks())
+                stats.save(self.stats_filename, stamp)
+            return stats
+
+    def search_tasks(self, keyword):
+        """
+        Find tasks whose title, description or tags contain a keyword
+
+        Args:
+            keyword (str): Case-insensitive substring to look for
+
+        Returns:
+            list: List of matching tasks
+        """
+        self._sync()
+
+        keyword = keyword.lower()
+
+        # Heap entries are written unescaped, so an entry without the keyword
+        # cannot match and need not be decoded
+        escaped = json.dumps(keyword, ensure_ascii=False)[1:-1]
+
+        matches = []
+        for record in self._records(None):
+            if escaped not in self._blob(record).decode("utf-8").lower():
+                continue
+            task = self._decode(record)
+            if (keyword in task["title"].lower() or
+                    keyword in task.get("description", "").lower() or
+                    any(keyword in tag.lower() for tag in task.get("tags", []))):
+                matches.append(task)
+        return matches
+
+    def record(self, op, task_id, fields=None):
+        """
+        Apply a single mutation, rewriting the task's record in place
+
+        Args:
+            op (str): One of "add", "update", "set" or "delete"
+            task_id (int): ID of the task the mutation applies to
+            fields (dict, optional): Whole task for add/update, changed
+                fields for set
+
+        Returns:
+            bool: True if the mutation was written, False otherwise
+        """
+        return self.record_many([(op, task_id, fields)])
+
+    def record_many(self, records):
+        """
+        Apply several mutations
+
+        New heap entries are appended and synced first, then the records
+        pointing at them are written in place, so a record never refers to
+        heap data that is not on disk.
+
+        Args:
+            records (list): (op, task_id, fields) tuples, as for record()
+
+        Returns:
+            bool: True if the mutations were written, False otherwise
+        """
+        try:
+            with self.lock():
+                header = list(HEADER.unpack_from(self._map, 0))
+
+                # Saved statistics are kept up to date if they are current
+                stats = TaskStats.load(self.stats_filename, self.stamp())
+
+                # Task ID -> (record, new heap entry or None) for every
+                # task changed in this batch, and the tasks as they were
+                changed = {}
+                originals = {}
+
+                for op, task_id, fields in records:
+                    if task_id in changed:
+                        record, blob = changed[task_id]
+                    else:
+                        record, blob = self._record(task_id), None
+                        if stats is not None:
+                            originals[task_id] = self._decode(record) if record is not None else None
+                    if record is not None and record[1] & EXISTS == 0:
+                        record = None
+
+                    if op == "set" and record is not None and set(fields) <= IN_PLACE_FIELDS:
+                        new_record = self._set_in_place(record, fields)
+                        if new_record is not None:
+                            changed[task_id] = (new_record, blob)
+                            continue
+
+                    if op in ("add", "update"):
+                        task = fields
+                    elif op == "set" and record is not None:
+                        task = self._decode(record, blob)
+                        task.update(fields)
+                    elif op == "delete":
+                        if record is not None:
+                            changed[task_id] = (self._empty_record(task_id), None)
+                            if blob is None:
+                                header[5] += record[7]
+                        continue
+                    else:
+                        continue
+
+                    new_record, new_blob = self._encode(task)
+                    if record is not None and blob is None:
+                        if self._blob(record) == new_blob:
+                            # Only record fields changed; keep the heap entry
+                            new_record = new_record[:6] + record[6:]
+                            new_blob = None
+                        else:
+                            header[5] += record[7]
+                    changed[task_id] = (new_record, new_blob)
+
+                self._write(changed, header)
+
+                if header[5] > HEAP_MIN_GARBAGE and header[5] > self._heap_size() * HEAP_GARBAGE_RATIO:
+                    self._compact()
+
+                if stats is not None and changed:
+                    for task_id, original in originals.items():
+                        if original is not None:
+                            stats.remove(original)
+                        task = self.get_task(task_id)
+                        if task is not None:
+                            stats.add(task)
+                    stats.save(self.stats_filename, self.stamp())
+
+            return True
+        except OSError as e:
+            print(f"Error saving tasks: {e}")
+            return False
+
+    def needs_compaction(self):
+        """The heap is compacted by the storage itself as it fills with dead entries"""
+        return False
+
+    def prefers_snapshot(self, changes, task_count):
+        """Changes are always applied record by record"""
+        return False
+
+    def save_tasks(self, tasks):
+        """
+        Replace every task, writing fresh records and a fresh heap
+
+        Args:
+            tasks (list): List of tasks to save
+
+        Returns:
+            bool: True if the tasks were saved, False otherwise
+        """
+        try:
+            with self.lock():
+                self._rewrite(self._encode(task) for task in tasks)
+            return True
+        except OSError as e:
+            print(f"Error saving tasks: {e}")
+            return False
+
+    def backup_tasks(self):
+        """
+        Create a backup copy of the records and heap
+
+        Returns:
+            str: Backup filename or None if backup failed
+        """
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_filename = f"{os.path.splitext(self.filename)[0]}_backup_{timestamp}.records"
+
+            with self.lock():
+                shutil.copyfile(self.filename, backup_filename)
+                if self._heap_map is not None:
+                    shutil.copyfile(self._heap_filename(self._heap_number), f"{backup_filename}.heap.{self._heap_number}")
+
+            return backup_filename
+        except OSError as e:
+            print(f"Error creating backup: {e}")
+            return None
+
+    def stamp(self):
+        """
+        Identify the current state of the records
+
+        Returns:
+            tuple: (inode, write counter) of the records file
+        """
+        self._sync()
+        return (self._inode, self._generation)
+
+    def changes_since(self, stamp):
+        """
+        Changes are not logged, so tasks read before another process wrote
+        must be read again
+
+        Returns:
+            None: Always
+        """
+        return None
+
+    @contextmanager
+    def lock(self):
+        """
+        Hold the advisory lock shared by every process using these files
+
+        The header is read again once the lock is taken, so changes are made
+        on top of whatever other processes wrote. Nested calls join the lock
+        already held.
+
+        Usage:
+            with storage.lock():
+                ... read the latest tasks, then change them ...
+        """
+        with self._thread_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                if self._lock_file is None:
+                    self._lock_file = open(self.lock_filename, 'a')
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+
+            self._lock_depth += 1
+            try:
+                self._sync()
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _create(self):
+        """Write an empty records file (creating it is idempotent across processes)"""
+        header = HEADER.pack(MAGIC, RECORD_VERSION, RECORD_SIZE, 0, 0, 0, 0)
+        temp_filename = f"{self.filename}.{os.getpid()}.tmp"
+        with open(temp_filename, 'wb') as file:
+            file.write(header)
+            file.flush()
+            os.fsync(file.fileno())
+
+        # Another process may have created it in the meantime
+        if os.path.exists(self.filename):
+            os.remove(temp_filename)
+        else:
+            os.replace(temp_filename, self.filename)
+
+    def _heap_filename(self, number):
+        """File heap number N is kept in"""
+        return f"{self.filename}.heap.{number}"
+
+    def _sync(self):
+        """
+        Catch up with the files as other processes left them
+
+        Reopens the files if they were replaced by a compaction, and maps
+        them again if they grew.
+        """
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            self._create()
+            stat = os.stat(self.filename)
+
+        if stat.st_ino != self._inode:
+            self._close()
+            self._file = open(self.filename, 'r+b')
+            self._inode = os.fstat(self._file.fileno()).st_ino
+            self._map = mmap.mmap(self._file.fileno(), 0)
+
+            magic, version, record_size = HEADER.unpack_from(self._map, 0)[:3]
+            if magic != MAGIC or version != RECORD_VERSION or record_size != RECORD_SIZE:
+                raise ValueError(f"{self.filename} is not a version {RECORD_VERSION} task records file")
+        elif stat.st_size != len(self._map):
+            self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0)
+
+        next_id, self._generation, _, heap_number = HEADER.unpack_from(self._map, 0)[3:]
+        if next_id and (self.next_id is None or next_id > self.next_id):
+            self.next_id = next_id
+
+        if heap_number != self._heap_number:
+            self._close_heap()
+            self._heap_number = heap_number
+            try:
+                self._heap_file = open(self._heap_filename(heap_number), 'rb')
+            except FileNotFoundError:
+                self._heap_file = None
+
+        self._map_heap()
+
+    def _map_heap(self):
+        """Map the heap again if it grew"""
+        if self._heap_file is None:
+            return
+
+        size = os.fstat(self._heap_file.fileno()).st_size
+        if self._heap_map is not None and len(self._heap_map) == size:
+            return
+
+        if self._heap_map is not None:
+            self._heap_map.close()
+        self._heap_map = mmap.mmap(self._heap_file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def _heap_size(self):
+        """Size of the current heap in bytes"""
+        return len(self._heap_map) if self._heap_map is not None else 0
+
+    def _close(self):
+        """Unmap and close the records file"""
+        if self._map is not None:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+        self._map = self._file = self._inode = None
+
+    def _close_heap(self):
+        """Unmap and close the heap"""
+        if self._heap_map is not None:
+            self._heap_map.close()
+        if self._heap_file is not None:
+            self._heap_file.close()
+        self._heap_map = self._heap_file = None
+
+    def _record(self, task_id):
+        """Unpack the record of a task ID, or None if there is no task with it"""
+        offset = task_id * RECORD_SIZE
+        if task_id < 1 or offset + RECORD_SIZE > len(self._map):
+            return None
+
+        record = RECORD.unpack_from(self._map, offset)
+        return record if record[1] & EXISTS else None
+
+    def _records(self, completed, after=0):
+        """
+        Walk the records of the tasks with a completion status, in ID order
+
+        Args:
+            completed (bool): Only completed (True) or pending (False) tasks;
+                every task if None
+            after (int, optional): Start after this ID
+
+        Yields:
+            tuple: Each matching record
+        """
+        start = min((after + 1) * RECORD_SIZE, len(self._map))
+        for record in RECORD.iter_unpack(self._map[start:]):
+            flags = record[1]
+            if not flags & EXISTS:
+                continue
+            if completed is not None and bool(flags & COMPLETED) != completed:
+                continue
+            yield record
+
+    def _select(self, completed, created_before, due_from, due_before):
+        """Collect the records matching a filter, in ID order"""
+        if created_before is None and due_from is None and due_before is None:
+            return list(self._records(completed))
+
+        return [
+            record for record in self._records(completed)
+            if self._matches(record, created_before, due_from, due_before)
+        ]
+
+    def _matches(self, record, created_before, due_from, due_before):
+        """Check a record against the date filters of a query"""
+        if created_before is not None:
+            created = self._field(record, "created_at")
+            if not (created and created < created_before):
+                return False
+
+        if due_from is not None or due_before is not None:
+            due = self._field(record, "due_date")
+            if due_from is not None and not (due and due >= due_from):
+                return False
+            if due_before is not None and not (due and due < due_before):
+                return False
+
+        return True
+
+    def _field(self, record, name):
+        """Read the due date or creation time of a record, from the heap only if kept there"""
+        if name == "due_date":
+            if record[3]:
+                return date.fromordinal(record[3]).isoformat()
+            if record[1] & DUE_IN_HEAP:
+                return json.loads(self._blob(record)).get("due_date")
+            return None
+
+        if record[4] != NO_TIME:
+            return unpack_timestamp(record[4])
+        if record[1] & CREATED_IN_HEAP:
+            return json.loads(self._blob(record)).get("created_at")
+        return None
+
+    def _sort_key(self, order_by):
+        """
+        Sort key function on records matching SORT_KEYS on the tasks
+
+        Args:
+            order_by (str): Sort order, as for query_tasks()
+
+        Returns:
+            callable: Record -> integer sort key
+        """
+        if order_by == "priority":
+            return lambda record: record[2] if record[2] != NO_PRIORITY else 1
+
+        if order_by == "due_date":
+            def due_date_key(record):
+                if record[3]:
+                    return record[3]
+                if record[1] & DUE_IN_HEAP:
+                    return due_key(self._field(record, "due_date"))
+                return NO_DUE_DATE
+            return due_date_key
+
+        if order_by == "created_at":
+            def created_at_key(record):
+                if record[4] != NO_TIME:
+                    return record[4]
+                if record[1] & CREATED_IN_HEAP:
+                    return timestamp_key(self._field(record, "created_at"))
+                return NO_TIMESTAMP
+            return created_at_key
+
+        return SORT_KEYS["id"]
+
+    def _blob(self, record):
+        """Raw heap entry of a record"""
+        offset, length = record[6], record[7]
+        if self._heap_map is None or offset + length > len(self._heap_map):
+            self._map_heap()
+        return self._heap_map[offset:offset + length] if length else b"{}"
+
+    def _encode(self, task):
+        """
+        Split a task into its record and heap entry
+
+        Args:
+            task (dict): Task to store
+
+        Returns:
+            tuple: (record, heap entry bytes); the record's heap offset and
+                length are left 0 until the entry is written
+        """
+        task = json_default(task)
+        flags = EXISTS | (COMPLETED if task.get("completed") else 0)
+        rest = {}
+
+        priority = task.get("priority")
+        priority_code = PRIORITY_CODES.get(priority, NO_PRIORITY) if type(priority) is str else NO_PRIORITY
+        if priority_code == NO_PRIORITY and "priority" in task:
+            rest["priority"] = priority
+
+        due = pack_due(task.get("due_date"))
+        if due is None:
+            due = 0
+            if "due_date" in task:
+                rest["due_date"] = task["due_date"]
+                flags |= DUE_IN_HEAP
+
+        times = []
+        for name, in_heap in (("created_at", CREATED_IN_HEAP), ("updated_at", UPDATED_IN_HEAP)):
+            packed = pack_timestamp(task.get(name))
+            if type(packed) is not int:
+                packed = NO_TIME
+                if name in task:
+                    rest[name] = task[name]
+                    flags |= in_heap
+            times.append(packed)
+
+        for key, value in task.items():
+            if key not in RECORD_FIELDS:
+                rest[key] = value
+
+        blob = json.dumps(rest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return (task["id"], flags, priority_code, due, times[0], times[1], 0, 0), blob
+
+    def _decode(self, record, blob=None):
+        """
+        Rebuild a task from its record and heap entry
+
+        Args:
+            record (tuple): The task's record
+            blob (bytes, optional): Its heap entry, if not yet written
+
+        Returns:
+            dict: The task, with its fields in the usual order
+        """
+        task_id, flags, priority_code, due, created, updated = record[:6]
+        rest = json.loads(blob if blob is not None else self._blob(record))
+
+        task = {"id": task_id}
+        for name in ("title", "description"):
+            if name in rest:
+                task[name] = rest.pop(name)
+        task["completed"] = bool(flags & COMPLETED)
+
+        for name, packed in (("created_at", created), ("updated_at", updated)):
+            value = rest.pop(name, None)
+            if packed != NO_TIME:
+                task[name] = unpack_timestamp(packed)
+            elif flags & (CREATED_IN_HEAP if name == "created_at" else UPDATED_IN_HEAP):
+                task[name] = value
+
+        value = rest.pop("due_date", None)
+        if due:
+            task["due_date"] = date.fromordinal(due).isoformat()
+        elif flags & DUE_IN_HEAP:
+            task["due_date"] = value
+
+        if priority_code != NO_PRIORITY:
+            task["priority"] = PRIORITY_NAMES[priority_code]
+        elif "priority" in rest:
+            task["priority"] = rest.pop("priority")
+
+        if "tags" in rest:
+            task["tags"] = rest.pop("tags")
+        task.update(rest)
+        return task
+
+    def _set_in_place(self, record, fields):
+        """
+        Apply a status or timestamp change to a record alone
+
+        Args:
+            record (tuple): Current record
+            fields (dict): Changed fields, all in IN_PLACE_FIELDS
+
+        Returns:
+            tuple: The new record, or None if the change needs the heap
+                (a timestamp that cannot be packed)
+        """
+        flags, updated = record[1], record[5]
+
+        if "completed" in fields:
+            flags = flags | COMPLETED if fields["completed"] else flags & ~COMPLETED
+
+        if "updated_at" in fields:
+            updated = pack_timestamp(fields["updated_at"])
+            if type(updated) is not int:
+                return None
+            flags &= ~UPDATED_IN_HEAP
+
+        return record[:1] + (flags,) + record[2:5] + (updated,) + record[6:]
+
+    def _empty_record(self, task_id):
+        """Record of a deleted task"""
+        return (task_id, 0, 0, 0, 0, 0, 0, 0)
+
+    def _write(self, changed, header):
+        """
+        Write a batch of changed records and their heap entries (lock held)
+
+        Args:
+            changed (dict): Task ID -> (record, new heap entry or None)
+            header (list): Header fields, with the dead heap bytes already
+                counted; the next ID and write counter are filled in here
+        """
+        if not changed:
+            return
+        if min(changed) < 1:
+            raise ValueError("Task IDs must be positive to be stored as records")
+
+        blobs = [(task_id, blob) for task_id, (_, blob) in changed.items() if blob is not None]
+        if blobs:
+            with open(self._heap_filename(header[6]), 'ab') as file:
+                offset = file.seek(0, os.SEEK_END)
+                for task_id, blob in blobs:
+                    record = changed[task_id][0]
+                    changed[task_id] = (record[:6] + (offset, len(blob)), None)
+                    offset += len(blob)
+                file.write(b"".join(blob for _, blob in blobs))
+                file.flush()
+                os.fsync(file.fileno())
+
+            if self._heap_file is None:
+                self._heap_file = open(self._heap_filename(header[6]), 'rb')
+            self._map_heap()
+
+        # Room for the highest ID, in steps of GROW_SLOTS slots
+        slots = len(self._map) // RECORD_SIZE
+        highest = max(changed)
+        if highest >= slots:
+            slots = max(highest + 1, slots + GROW_SLOTS)
+            self._map.close()
+            self._file.truncate(slots * RECORD_SIZE)
+            self._map = mmap.mmap(self._file.fileno(), 0)
+
+        pages = {0}
+        for task_id, (record, _) in changed.items():
+            offset = task_id * RECORD_SIZE
+            RECORD.pack_into(self._map, offset, *record)
+            pages.add(offset // mmap.PAGESIZE)
+
+        header[3] = self.next_id or 0
+        header[4] += 1
+        HEADER.pack_into(self._map, 0, *header)
+        self._generation = header[4]
+
+        for page in sorted(pages):
+            start = page * mmap.PAGESIZE
+            self._map.flush(start, min(mmap.PAGESIZE, len(self._map) - start))
+
+    def _compact(self):
+        """Copy the live heap entries to a fresh heap, dropping the dead ones (lock held)"""
+        self._rewrite((record, bytes(self._blob(record))) for record in self._records(None))
+
+    def _rewrite(self, entries):
+        """
+        Write a new records file and heap and switch over to them (lock held)
+
+        The new heap gets the next heap number, and the records file naming it
+        is renamed into place last, so a crash leaves the old pair intact.
+
+        Args:
+            entries (iterable): (record, heap entry bytes) for every task
+        """
+        old_number = HEADER.unpack_from(self._map, 0)[6]
+        number = old_number + 1
+
+        records = []
+        offset = 0
+        with open(self._heap_filename(number), 'wb') as heap:
+            for record, blob in entries:
+                records.append(record[:6] + (offset, len(blob)))
+                heap.write(blob)
+                offset += len(blob)
+            heap.flush()
+            os.fsync(heap.fileno())
+
+        slots = max((record[0] for record in records), default=0) + 1
+        data = bytearray(max(slots, GROW_SLOTS) * RECORD_SIZE)
+        generation = HEADER.unpack_from(self._map, 0)[4] + 1
+        HEADER.pack_into(data, 0, MAGIC, RECORD_VERSION, RECORD_SIZE, self.next_id or 0, generation, 0, number)
+        for record in records:
+            RECORD.pack_into(data, record[0] * RECORD_SIZE, *record)
+
+        temp_filename = f"{self.filename}.tmp"
+        with open(temp_filename, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filename, self.filename)
+
+        old_heap = self._heap_filename(old_number)
+        if os.path.exists(old_heap):
+            os.remove(old_heap)
+
+        self._sync()
+
+
+def migrate_json_to_records(json_filename="tasks.json", records_filename="tasks.records"):
+    """
+    Copy every task from a JSON task file into a records file
+
+    Args:
+        json_filename (str, optional): Source JSON file (its journal is
+            applied if present)
+        records_filename (str, optional): Target records file
+
+    Returns:
+        int: Number of tasks migrated
+    """
+    from storage import Storage
+
+    source = Storage(json_filename, journal=True)
+    tasks = source.load_tasks()
+
+    target = RecordStorage(records_filename)
+    target.next_id = source.next_id or max((task["id"] for task in tasks), default=0) + 1
+    target.save_tasks(tasks)
+
+    return len(tasks)
+
+
+if __name__ == "__main__":
+    # Usage: python record_storage.py [tasks.json] [tasks.records]
+    count = migrate_json_to_records(*sys.argv[1:3])
+    print(f"Migrated {count} tasks")
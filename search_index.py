@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Search Index Module - Inverted index from words to task IDs for fast search
+"""
+import os
+import re
+import pickle
+from array import array
+from bisect import bisect_left, insort
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Bump when the on-disk layout changes so old index files are rebuilt
+INDEX_VERSION = 1
+
+def task_tokens(task):
+    """
+    Get every searchable word of a task
+
+    Args:
+        task (dict): Task to index
+
+    Returns:
+        set: Lowercase words from the title, description and tags
+    """
+    text = " ".join([task["title"], task["description"], *task.get("tags", [])])
+    return set(WORD_PATTERN.findall(text.lower()))
+
+class SearchIndex:
+    """
+    Inverted index mapping words (and word prefixes) to task IDs
+
+    The bulk of the index is kept in a compact, sorted form (every word,
+    and the task IDs of each word packed into one array) that loads
+    quickly from disk. Words touched by later mutations are moved into a
+    dict of sets so they can be changed in constant time.
+    """
+
+    def __init__(self, words=None, offsets=None, ids=None):
+        """
+        Initialize the index from its compact form
+
+        Args:
+            words (list, optional): Sorted list of indexed words
+            offsets (array, optional): Start of each word's IDs in ids, plus
+                a final end offset
+            ids (array, optional): Task IDs of every word, one run per word
+        """
+        self._words = words or []
+        self._offsets = offsets or array('q', [0])
+        self._ids = ids or array('q')
+
+        # word -> set of task IDs, for words changed since the compact form
+        # was built; an empty set means the word is no longer indexed
+        self._changed = {}
+
+        # Sorted words that are in _changed but not in _words
+        self._new_words = []
+
+        # Whether the index changed since it was loaded or saved
+        self.dirty = False
+
+    @classmethod
+    def build(cls, tasks):
+        """
+        Build an index over a list of tasks
+
+        Args:
+            tasks (iterable): Tasks to index
+
+        Returns:
+            SearchIndex: The new index
+        """
+        postings = {}
+        for task in tasks:
+            task_id = task["id"]
+            for token in task_tokens(task):
+                posting = postings.get(token)
+                if posting is None:
+                    postings[token] = [task_id]
+                else:
+                    posting.append(task_id)
+
+        index = cls(*cls._pack(postings))
+        index.dirty = True
+        return index
+
+    @classmethod
+    def load(cls, filename, stamp):
+        """
+        Load a saved index if it was saved for the same version of the tasks
+
+        Args:
+            filename (str): Index file
+            stamp (tuple): Current version stamp of the task storage
+
+        Returns:
+            SearchIndex: The saved index, or None if missing or stale
+        """
+        try:
+            with open(filename, 'rb') as file:
+                data = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return None
+
+        if data.get("version") != INDEX_VERSION or data.get("stamp") != stamp:
+            return None
+
+        return cls(data["words"], data["offsets"], data["ids"])
+
+    def save(self, filename, stamp):
+        """
+        Save the index next to the task storage
+
+        Args:
+            filename (str): Index file
+            stamp (tuple): Version stamp of the tasks the index was built from
+
+        Returns:
+            bool: True if the index was saved, False otherwise
+        """
+        # Fold changed words back into the compact form first
+        if self._changed:
+            postings = {
+                word: self._ids[self._offsets[position]:self._offsets[position + 1]]
+                for position, word in enumerate(self._words)
+            }
+            postings.update(self._changed)
+            self._words, self._offsets, self._ids = self._pack(postings)
+            self._changed = {}
+            self._new_words = []
+
+        try:
+            temp_filename = f"{filename}.tmp"
+            with open(temp_filename, 'wb') as file:
+                pickle.dump(
+                    {
+                        "version": INDEX_VERSION,
+                        "stamp": stamp,
+                        "words": self._words,
+                        "offsets": self._offsets,
+                        "ids": self._ids
+                    },
+                    file,
+                    protocol=pickle.HIGHEST_PROTOCOL
+                )
+            os.replace(temp_filename, filename)
+
+            self.dirty = False
+            return True
+        except OSError as e:
+            print(f"Error saving search index: {e}")
+            return False
+
+    def search(self, keyword):
+        """
+        Find the tasks with a word starting with each word of the keyword
+
+        Args:
+            keyword (str): Search text
+
+        Returns:
+            list: Matching task IDs in ascending order, or None if the
+                keyword contains no searchable words
+        """
+        tokens = set(WORD_PATTERN.findall(keyword.lower()))
+        if not tokens:
+            return None
+
+        result = None
+        for token in tokens:
+            matches = self._prefix_matches(token)
+            result = matches if result is None else result & matches
+            if not result:
+                return []
+
+        return sorted(result)
+
+    def add(self, task):
+        """Index a new task"""
+        self._add_tokens(task["id"], task_tokens(task))
+
+    def remove(self, task):
+        """Remove a task from the index"""
+        self._remove_tokens(task["id"], task_tokens(task))
+
+    def update(self, old_task, new_task):
+        """Re-index a task whose fields changed"""
+        old_tokens = task_tokens(old_task)
+        new_tokens = task_tokens(new_task)
+        if old_tokens == new_tokens:
+            return
+
+        self._remove_tokens(old_task["id"], old_tokens - new_tokens)
+        self._add_tokens(new_task["id"], new_tokens - old_tokens)
+
+    @staticmethod
+    def _pack(postings):
+        """Turn a word -> task IDs mapping into the compact sorted form"""
+        words = sorted(word for word, posting in postings.items() if posting)
+        offsets = array('q', [0])
+        ids = array('q')
+        for word in words:
+            ids.extend(postings[word])
+            offsets.append(len(ids))
+        return words, offsets, ids
+
+    def _posting(self, word):
+        """Task IDs of one word"""
+        posting = self._changed.get(word)
+        if posting is not None:
+            return posting
+
+        position = bisect_left(self._words, word)
+        if position < len(self._words) and self._words[position] == word:
+            return set(self._ids[self._offsets[position]:self._offsets[position + 1]])
+
+        return set()
+
+    def _prefix_matches(self, prefix):
+        """Union of the task IDs of every word starting with prefix"""
+        matches = set()
+
+        position = bisect_left(self._words, prefix)
+        while position < len(self._words) and self._words[position].startswith(prefix):
+            word = self._words[position]
+            if word in self._changed:
+                matches |= self._changed[word]
+            else:
+                matches.update(self._ids[self._offsets[position]:self._offsets[position + 1]])
+            position += 1
+
+        position = bisect_left(self._new_words, prefix)
+        while position < len(self._new_words) and self._new_words[position].startswith(prefix):
+            matches |= self._changed[self._new_words[position]]
+            position += 1
+
+        return matches
+
+    def _changed_posting(self, word):
+        """Get a word's task IDs as a set that can be changed in place"""
+        posting = self._changed.get(word)
+        if posting is None:
+            posting = self._changed[word] = self._posting(word)
+            if not posting:
+                insort(self._new_words, word)
+        return posting
+
+    def _add_tokens(self, task_id, tokens):
+        """Add a task ID to the postings of some words"""
+        for token in tokens:
+            self._changed_posting(token).add(task_id)
+
+        if tokens:
+            self.dirty = True
+
+    def _remove_tokens(self, task_id, tokens):
+        """Remove a task ID from the postings of some words"""
+        for token in tokens:
+            self._changed_posting(token).discard(task_id)
+
+        if tokens:
+            self.dirty = True
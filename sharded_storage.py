@@ -0,0 +1,752 @@
+#!/usr/bin/env python3
+"""
+Sharded Storage Module - Stores tasks in one JSON file per month or per tag
+
+Tasks are split into shards by the month they were created in (or by their
+first tag), each shard its own JSON file in a directory (tasks.shards/). A
+small manifest lists every shard with its task count, how many of those are
+completed, and the lowest and highest ID in it, so commands only read the
+shards they need: looking up one task reads the one shard holding it, the
+pending view skips shards where everything is done, and counts and
+statistics (kept per shard in the manifest) are answered without reading
+any shard. A change rewrites only the shards it touches.
+
+Shards written since the manifest was last read are noticed by their file
+stamps, so several processes can share the directory; writers hold a lock
+file in it.
+"""
+import os
+import sys
+import json
+import heapq
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from operator import itemgetter
+
+from task_model import SORT_KEYS, json_default
+from task_stats import TaskStats
+
+# Advisory file locks keep several processes from clobbering each other's
+# writes. Without fcntl (Windows) one process at a time is assumed.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MANIFEST_VERSION = 1
+
+# Bytes per entry of the ID locator: the shard number of task ID n is stored
+# at offset n * LOCATOR_WIDTH, 0 meaning no task
+LOCATOR_WIDTH = 4
+
+def month_key(task):
+    """Shard of a task when splitting by month: its creation month (YYYY-MM)"""
+    created = task.get("created_at") or ""
+    return created[:7] if len(created) >= 7 else "undated"
+
+def tag_key(task):
+    """Shard of a task when splitting by tag: its first tag"""
+    tags = task.get("tags") or []
+    return tags[0] if tags else ""
+
+# Shard key function for each way of splitting the tasks
+PARTITIONS = {
+    "month": month_key,
+    "tag": tag_key
+}
+
+class ShardedStorage:
+    """Class to manage task storage split over several JSON files"""
+
+    # Each mutation rewrites only the shards it touches, so like the JSON
+    # journal there is no need to rewrite all tasks on each change
+    journal = True
+
+    def __init__(self, filename, partition="month"):
+        """
+        Initialize the storage with a shard directory
+
+        Args:
+            filename (str): Directory holding the shards and their manifest
+            partition (str, optional): "month" (default) to split tasks by
+                creation month, or "tag" to split them by first tag; a
+                directory that already has tasks keeps the split it was
+                created with
+        """
+        if partition not in PARTITIONS:
+            raise ValueError(f"Unknown partition: {partition}")
+
+        self.filename = filename
+        self.manifest_filename = os.path.join(filename, "manifest.json")
+        self.locator_filename = os.path.join(filename, "ids")
+        self.lock_filename = os.path.join(filename, "lock")
+
+        os.makedirs(self.filename, exist_ok=True)
+
+        self.partition = partition
+        self.next_id = None
+
+        # Shard key -> manifest entry ({"number", "count", "completed",
+        # "min_id", "max_id", "stats"}), and the stamp of the manifest it
+        # came from
+        self._shards = {}
+        self._manifest_stamp = None
+
+        # Shard key -> (file stamp, {id: task}) for shards read so far
+        self._loaded = {}
+
+        self._lock_file = None
+        self._lock_depth = 0
+        self._thread_lock = threading.RLock()
+
+        self._read_manifest()
+
+    def load_tasks(self):
+        """
+        Load all tasks from every shard
+
+        Returns:
+            list: List of tasks
+        """
+        return list(self.iter_tasks())
+
+    def get_task(self, task_id):
+        """
+        Load a single task by its ID, reading only the shard holding it
+
+        Args:
+            task_id (int): ID of the task
+
+        Returns:
+            dict: The task, or None if it does not exist
+        """
+        self._read_manifest()
+
+        key = self._locate(task_id)
+        if key is None:
+            return None
+
+        task = self._load_shard(key).get(task_id)
+        return dict(task) if task is not None else None
+
+    def query_tasks(self, completed=None, order_by=None, created_before=None, due_from=None, due_before=None):
+        """
+        Load the tasks matching a filter, reading only the shards that can
+        hold any
+
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+            order_by (str, optional): "priority", "due_date" or "created_at";
+                insertion order if omitted
+            created_before (str, optional): Only tasks created before this
+                ISO date
+            due_from (str, optional): Only tasks due on or after this ISO date
+            due_before (str, optional): Only tasks due before this ISO date
+
+        Returns:
+            list: List of matching tasks
+        """
+        tasks = self._select(completed, created_before, due_from, due_before)
+
+        if order_by in (None, "id"):
+            tasks.sort(key=itemgetter("id"))
+        else:
+            sort_key = SORT_KEYS[order_by]
+            tasks.sort(key=lambda task: (sort_key(task), task["id"]))
+
+        return [dict(task) for task in tasks]
+
+    def page_tasks(self, completed=None, order_by=None, due_from=None, due_before=None, cursor=None, limit=20):
+        """
+        Load the tasks next to a keyset cursor, in the order of a view
+
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+            order_by (str, optional): Sort order, as for query_tasks()
+            due_from (str, optional): Only tasks due on or after this ISO date
+            due_before (str, optional): Only tasks due before this ISO date
+            cursor (tuple, optional): ("after", key) or ("before", key), with
+                a key returned by an earlier call; the start if omitted
+            limit (int, optional): Maximum number of tasks
+
+        Returns:
+            list: (key, task) pairs walking away from the cursor, so in
+                reverse order for a "before" cursor
+        """
+        reverse = cursor is not None and cursor[0] == "before"
+
+        if order_by in (None, "id") and not reverse:
+            # Shards are read in ID order, so only up to the end of the page
+            after = cursor[1][1] if cursor is not None else None
+            entries = []
+            for task in self._iter_sorted(completed, after):
+                due = task.get("due_date")
+                if due_from is not None and not (due and due >= due_from):
+                    continue
+                if due_before is not None and not (due and due < due_before):
+                    continue
+                entries.append(((0, task["id"]), dict(task)))
+                if len(entries) == limit:
+                    break
+            return entries
+
+        sort_key = SORT_KEYS[order_by or "id"]
+        entries = [((sort_key(task), task["id"]), task) for task in self._select(completed, None, due_from, due_before)]
+
+        if cursor is not None:
+            edge = tuple(cursor[1])
+            entries = [entry for entry in entries if (entry[0] < edge if reverse else entry[0] > edge)]
+
+        pick = heapq.nlargest if reverse else heapq.nsmallest
+        return [(key, dict(task)) for key, task in pick(limit, entries, key=itemgetter(0))]
+
+    def iter_tasks(self, completed=None):
+        """
+        Stream tasks shard by shard, skipping shards with no matching task
+
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+
+        Yields:
+            dict: Each matching task, in insertion order
+        """
+        for task in self._iter_sorted(completed):
+            yield dict(task)
+
+    def count_tasks(self, completed=None):
+        """
+        Count tasks from the manifest, without reading any shard
+
+        Args:
+            completed (bool, optional): Only count completed or pending tasks
+
+        Returns:
+            int: Number of matching tasks
+        """
+        self._read_manifest()
+
+        total = 0
+        for shard in self._shards.values():
+            if completed is None:
+                total += shard["count"]
+            elif completed:
+                total += shard["completed"]
+            else:
+                total += shard["count"] - shard["completed"]
+        return total
+
+    def task_stats(self):
+        """
+        Add up the statistics kept for each shard, without reading any
+
+        Returns:
+            TaskStats: Counts of every task
+        """
+        self._read_manifest()
+
+        stats = TaskStats()
+        for shard in self._shards.values():
+            stats.merge(shard["stats"])
+        return stats
+
+    def search_tasks(self, keyword):
+        """
+        Find tasks whose title, description or tags contain a keyword
+
+        Args:
+            keyword (str): Case-insensitive substring to look for
+
+        Returns:
+            list: List of matching tasks
+        """
+        keyword = keyword.lower()
+        return [
+            task for task in self.iter_tasks()
+            if keyword in task["title"].lower() or
+            keyword in task.get("description", "").lower() or
+            any(keyword in tag.lower() for tag in task.get("tags", []))
+        ]
+
+    def record(self, op, task_id, fields=None):
+        """
+        Apply a single mutation, rewriting the shard it touches
+
+        Args:
+            op (str): One of "add", "update", "set" or "delete"
+            task_id (int): ID of the task the mutation applies to
+            fields (dict, optional): Whole task for add/update, changed
+                fields for set
+
+        Returns:
+            bool: True if the mutation was written, False otherwise
+        """
+        return self.record_many([(op, task_id, fields)])
+
+    def record_many(self, records):
+        """
+        Apply several mutations, rewriting each shard they touch once
+
+        Args:
+            records (list): (op, task_id, fields) tuples, as for record()
+
+        Returns:
+            bool: True if the mutations were written, False otherwise
+        """
+        with self.lock():
+            shard_key = PARTITIONS[self.partition]
+
+            # Shards changed, and where tasks moved to within this batch
+            dirty = set()
+            moved = {}
+
+            try:
+                for op, task_id, fields in records:
+                    key = moved[task_id] if task_id in moved else self._locate(task_id)
+
+                    if op in ("add", "update"):
+                        task = json_default(fields)
+                    elif op == "set" and key is not None:
+                        task = self._load_shard(key).get(task_id)
+                        if task is None:
+                            continue
+                        task = dict(task)
+                        task.update(fields)
+                    elif op == "delete":
+                        task = None
+                    else:
+                        continue
+
+                    new_key = shard_key(task) if task is not None else None
+                    if key is not None and key != new_key:
+                        self._load_shard(key).pop(task_id, None)
+                        dirty.add(key)
+                    if new_key is not None:
+                        self._load_shard(new_key)[task_id] = task
+                        dirty.add(new_key)
+                    if key != new_key:
+                        moved[task_id] = new_key
+
+                self._write_shards(dirty, moved)
+                return True
+            except OSError as e:
+                print(f"Error saving tasks: {e}")
+
+                # Shards changed in memory but maybe not on disk are read again
+                for key in dirty:
+                    self._loaded.pop(key, None)
+                self._manifest_stamp = None
+                self._read_manifest()
+                return False
+
+    def needs_compaction(self):
+        """Shards are rewritten as they change, so never need compacting"""
+        return False
+
+    def prefers_snapshot(self, changes, task_count):
+        """Changes are always applied shard by shard"""
+        return False
+
+    def save_tasks(self, tasks):
+        """
+        Replace every task, splitting them into shards afresh
+
+        Args:
+            tasks (list): List of tasks to save
+
+        Returns:
+            bool: True if the tasks were saved, False otherwise
+        """
+        try:
+            with self.lock():
+                shard_key = PARTITIONS[self.partition]
+                shards = {}
+                for task in tasks:
+                    task = json_default(task)
+                    shards.setdefault(shard_key(task), {})[task["id"]] = task
+
+                # Shards no longer needed are emptied, so they are removed
+                for key in self._shards:
+                    shards.setdefault(key, {})
+
+                self._loaded.update((key, (None, shard)) for key, shard in shards.items())
+
+                # The locator is rebuilt from scratch along with the shards
+                if os.path.exists(self.locator_filename):
+                    os.remove(self.locator_filename)
+                self._write_shards(shards, {task_id: key for key, shard in shards.items() for task_id in shard})
+
+            return True
+        except OSError as e:
+            print(f"Error saving tasks: {e}")
+            return False
+
+    def backup_tasks(self):
+        """
+        Create a backup copy of the shard directory
+
+        Returns:
+            str: Backup directory or None if backup failed
+        """
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_filename = f"{os.path.splitext(self.filename)[0]}_backup_{timestamp}.shards"
+
+            with self.lock():
+                shutil.copytree(self.filename, backup_filename, ignore=shutil.ignore_patterns("lock", "*.tmp"))
+
+            return backup_filename
+        except OSError as e:
+            print(f"Error creating backup: {e}")
+            return None
+
+    def stamp(self):
+        """
+        Identify the current state of the shards
+
+        Every write replaces the manifest, so its inode, size and
+        modification time change whenever any task does.
+
+        Returns:
+            tuple: (inode, size, mtime) of the manifest
+        """
+        try:
+            stat = os.stat(self.manifest_filename)
+            return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            return (None, None, None)
+
+    def changes_since(self, stamp):
+        """
+        Changes are not logged, so tasks read before another process wrote
+        must be read again
+
+        Returns:
+            None: Always
+        """
+        return None
+
+    @contextmanager
+    def lock(self):
+        """
+        Hold the advisory lock shared by every process using these shards
+
+        The manifest is read again once the lock is taken, so changes are
+        made on top of whatever other processes wrote. Nested calls join the
+        lock already held.
+
+        Usage:
+            with storage.lock():
+                ... read the latest tasks, then change them ...
+        """
+        with self._thread_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                if self._lock_file is None:
+                    self._lock_file = open(self.lock_filename, 'a')
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+
+            self._lock_depth += 1
+            try:
+                self._read_manifest()
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self):
+        """Read the manifest again if another process replaced it"""
+        stamp = self.stamp()
+        if stamp == self._manifest_stamp:
+            return
+
+        try:
+            with open(self.manifest_filename, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            manifest = {"partition": self.partition, "next_id": None, "shards": {}}
+
+        self.partition = manifest["partition"]
+        if self.next_id is None or (manifest["next_id"] or 0) > self.next_id:
+            self.next_id = manifest["next_id"]
+        self._shards = manifest["shards"]
+        self._manifest_stamp = stamp
+
+    def _shard_filename(self, key):
+        """File a shard is kept in, by its number (keys may be any tag)"""
+        return os.path.join(self.filename, f"shard_{self._shards[key]['number']}.json")
+
+    def _load_shard(self, key):
+        """
+        Get the tasks of one shard, reading its file unless already read
+
+        Args:
+            key (str): Shard key
+
+        Returns:
+            dict: Task ID -> task; an empty dict for a new shard
+        """
+        if key not in self._shards:
+            loaded = self._loaded.get(key)
+            if loaded is None:
+                loaded = self._loaded[key] = (None, {})
+            return loaded[1]
+
+        filename = self._shard_filename(key)
+        try:
+            stat = os.stat(filename)
+            stamp = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            stamp = None
+
+        loaded = self._loaded.get(key)
+        if loaded is not None and (loaded[0] == stamp or loaded[0] is None):
+            return loaded[1]
+
+        tasks = {}
+        if stamp is not None:
+            with open(filename, 'r', encoding='utf-8') as file:
+                tasks = {task["id"]: task for task in json.load(file)}
+
+        self._loaded[key] = (stamp, tasks)
+        return tasks
+
+    def _matching_shards(self, completed):
+        """Keys of the shards holding any task with a completion status"""
+        keys = []
+        for key, shard in self._shards.items():
+            if completed is True and shard["completed"] == 0:
+                continue
+            if completed is False and shard["completed"] == shard["count"]:
+                continue
+            keys.append(key)
+        return keys
+
+    def _id_groups(self, keys):
+        """
+        Group shards whose ID ranges overlap, in ID order
+
+        Tasks usually get higher IDs as time goes on, so monthly shards
+        rarely overlap and can be read one at a time; overlapping ones have
+        to be merged.
+
+        Args:
+            keys (list): Shard keys
+
+        Returns:
+            list: Lists of shard keys, the groups in ascending ID order
+        """
+        groups = []
+        group_max = None
+        for key in sorted(keys, key=lambda key: self._shards[key]["min_id"]):
+            shard = self._shards[key]
+            if groups and shard["min_id"] <= group_max:
+                groups[-1].append(key)
+                group_max = max(group_max, shard["max_id"])
+            else:
+                groups.append([key])
+                group_max = shard["max_id"]
+        return groups
+
+    def _iter_sorted(self, completed, after=None):
+        """
+        Walk the tasks with a completion status in ID order, reading one
+        group of overlapping shards at a time
+
+        Args:
+            completed (bool): Only completed (True) or pending (False) tasks;
+                every task if None
+            after (int, optional): Only tasks with a higher ID than this
+
+        Yields:
+            dict: Each matching task as held in memory (not a copy)
+        """
+        self._read_manifest()
+
+        keys = self._matching_shards(completed)
+        if after is not None:
+            keys = [key for key in keys if self._shards[key]["max_id"] > after]
+
+        for group in self._id_groups(keys):
+            shards = [sorted(self._load_shard(key).values(), key=itemgetter("id")) for key in group]
+            for task in heapq.merge(*shards, key=itemgetter("id")):
+                if completed is not None and task["completed"] != completed:
+                    continue
+                if after is not None and task["id"] <= after:
+                    continue
+                yield task
+
+    def _select(self, completed, created_before, due_from, due_before):
+        """Collect the tasks matching a filter from the shards that can hold any"""
+        self._read_manifest()
+
+        keys = self._matching_shards(completed)
+        if created_before is not None and self.partition == "month":
+            # A shard only holds tasks created in its own month
+            keys = [key for key in keys if key <= created_before[:7]]
+
+        tasks = []
+        for key in keys:
+            for task in self._load_shard(key).values():
+                if completed is not None and task["completed"] != completed:
+                    continue
+                if created_before is not None and not (task.get("created_at") and task["created_at"] < created_before):
+                    continue
+                due = task.get("due_date")
+                if due_from is not None and not (due and due >= due_from):
+                    continue
+                if due_before is not None and not (due and due < due_before):
+                    continue
+                tasks.append(task)
+        return tasks
+
+    def _locate(self, task_id):
+        """
+        Find the shard holding a task
+
+        The ID ranges in the manifest usually single out one shard; when
+        several overlap, the locator file says which one it is.
+
+        Args:
+            task_id (int): ID of the task
+
+        Returns:
+            str: Shard key, or None if no shard holds the task
+        """
+        candidates = [
+            key for key, shard in self._shards.items()
+            if shard["min_id"] <= task_id <= shard["max_id"]
+        ]
+        if len(candidates) > 1:
+            number = self._read_locator(task_id)
+            located = [key for key in candidates if self._shards[key]["number"] == number]
+            if located and task_id in self._load_shard(located[0]):
+                return located[0]
+
+        # Without a locator entry, check each shard in the range
+        for key in candidates:
+            if task_id in self._load_shard(key):
+                return key
+        return None
+
+    def _read_locator(self, task_id):
+        """Shard number the locator holds for a task ID, 0 if none"""
+        try:
+            with open(self.locator_filename, 'rb') as file:
+                file.seek(task_id * LOCATOR_WIDTH)
+                entry = file.read(LOCATOR_WIDTH)
+        except FileNotFoundError:
+            return 0
+        return int.from_bytes(entry, "little") if len(entry) == LOCATOR_WIDTH else 0
+
+    def _write_shards(self, keys, locations):
+        """
+        Write changed shards, then the locator and the manifest (lock held)
+
+        Each shard is written to a temporary file and renamed into place, and
+        the manifest last, so readers never see a shard half written.
+
+        Args:
+            keys (iterable): Keys of the shards to write
+            locations (dict): Task ID -> shard key (None if deleted) for
+                every task that was added, moved or deleted
+        """
+        next_number = max((shard["number"] for shard in self._shards.values()), default=0) + 1
+
+        for key in sorted(keys):
+            tasks = sorted(self._loaded[key][1].values(), key=itemgetter("id"))
+            if key in self._shards:
+                filename = self._shard_filename(key)
+            elif tasks:
+                self._shards[key] = {"number": next_number}
+                next_number += 1
+                filename = self._shard_filename(key)
+            else:
+                continue
+
+            if not tasks:
+                # An emptied shard is dropped altogether
+                if os.path.exists(filename):
+                    os.remove(filename)
+                del self._shards[key]
+                self._loaded.pop(key, None)
+                continue
+
+            temp_filename = f"{filename}.tmp"
+            with open(temp_filename, 'w', encoding='utf-8') as file:
+                file.write("[\n")
+                file.write(",\n".join(json.dumps(task, ensure_ascii=False, default=json_default) for task in tasks))
+                file.write("\n]\n")
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_filename, filename)
+
+            stat = os.stat(filename)
+            self._loaded[key] = ((stat.st_ino, stat.st_size, stat.st_mtime_ns), {task["id"]: task for task in tasks})
+            self._shards[key].update({
+                "count": len(tasks),
+                "completed": sum(1 for task in tasks if task["completed"]),
+                "min_id": tasks[0]["id"],
+                "max_id": tasks[-1]["id"],
+                "stats": TaskStats.build(tasks).counts()
+            })
+
+        if locations:
+            mode = 'r+b' if os.path.exists(self.locator_filename) else 'w+b'
+            with open(self.locator_filename, mode) as file:
+                for task_id, key in sorted(locations.items()):
+                    number = self._shards[key]["number"] if key in self._shards else 0
+                    file.seek(task_id * LOCATOR_WIDTH)
+                    file.write(number.to_bytes(LOCATOR_WIDTH, "little"))
+                file.flush()
+                os.fsync(file.fileno())
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "partition": self.partition,
+            "next_id": self.next_id,
+            "shards": self._shards
+        }
+        temp_manifest = f"{self.manifest_filename}.tmp"
+        with open(temp_manifest, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=2, ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_manifest, self.manifest_filename)
+        self._manifest_stamp = self.stamp()
+
+
+def migrate_json_to_shards(json_filename="tasks.json", shard_dir="tasks.shards", partition="month"):
+    """
+    Copy every task from a JSON task file into a shard directory
+
+    Args:
+        json_filename (str, optional): Source JSON file (its journal is
+            applied if present)
+        shard_dir (str, optional): Target shard directory
+        partition (str, optional): "month" or "tag", as for ShardedStorage
+
+    Returns:
+        int: Number of tasks migrated
+    """
+    from storage import Storage
+
+    source = Storage(json_filename, journal=True)
+    tasks = source.load_tasks()
+
+    target = ShardedStorage(shard_dir, partition)
+    target.partition = partition
+    target.next_id = source.next_id or max((task["id"] for task in tasks), default=0) + 1
+    target.save_tasks(tasks)
+
+    return len(tasks)
+
+
+if __name__ == "__main__":
+    # Usage: python sharded_storage.py [tasks.json] [tasks.shards] [month|tag]
+    count = migrate_json_to_shards(*sys.argv[1:4])
+    print(f"Migrated {count} tasks")
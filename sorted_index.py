@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Sorted Index Module - Task IDs kept in order of a sort key for ordered views and range queries
+
+One index per sort key answers the views ordered by priority, due date or
+creation time, due date ranges and "created before" filters, and the
+keyset pages over them. Unordered status filters and counts are answered
+by the task table in task_table.py instead.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+
+class SortedIndex:
+    """
+    Task IDs sorted by an integer key (due date, priority, creation time)
+
+    The keys and IDs are kept in two parallel arrays sorted by (key, ID);
+    IDs are handed out in order, so ties keep the order tasks were added
+    in. Finding a task or a key range is a binary search; adding or
+    removing one shifts the arrays in a single memmove, which stays fast
+    even for millions of tasks.
+    """
+
+    def __init__(self, key, keys=None, ids=None):
+        """
+        Initialize the index
+
+        Args:
+            key (callable): Function giving the integer sort key of a task
+            keys (array, optional): Sorted keys
+            ids (array, optional): Task ID of each key
+        """
+        self.key = key
+        self.keys = keys if keys is not None else array('q')
+        self.ids = ids if ids is not None else array('q')
+
+    @classmethod
+    def build(cls, key, tasks):
+        """
+        Build an index over a list of tasks
+
+        Args:
+            key (callable): Function giving the integer sort key of a task
+            tasks (iterable): Tasks to index
+
+        Returns:
+            SortedIndex: The new index
+        """
+        entries = sorted((key(task), task["id"]) for task in tasks)
+        return cls(key, array('q', [entry[0] for entry in entries]), array('q', [entry[1] for entry in entries]))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def between(self, low=None, high=None):
+        """
+        Get the IDs of tasks whose key is in a range, in key order
+
+        Args:
+            low (int, optional): Smallest key to include
+            high (int, optional): Key to stop before
+
+        Returns:
+            array: Matching task IDs
+        """
+        start = 0 if low is None else bisect_left(self.keys, low)
+        end = len(self.keys) if high is None else bisect_left(self.keys, high, start)
+        return self.ids[start:end]
+
+    def walk(self, cursor=None, reverse=False, low=None, high=None):
+        """
+        Go through the index in key order, starting next to a cursor
+
+        Args:
+            cursor (tuple, optional): (key, task ID) to start just after, or
+                just before when walking in reverse; an end of the index if
+                omitted
+            reverse (bool, optional): Walk towards smaller keys
+            low (int, optional): Smallest key to include
+            high (int, optional): Key to stop before
+
+        Yields:
+            tuple: (key, task ID) of each entry
+        """
+        start = 0 if low is None else bisect_left(self.keys, low)
+        end = len(self.keys) if high is None else bisect_left(self.keys, high, start)
+
+        if cursor is not None:
+            key, task_id = cursor
+            if reverse:
+                end = min(end, self._position(key, task_id))
+            else:
+                start = max(start, self._position(key, task_id + 1))
+
+        positions = range(end - 1, start - 1, -1) if reverse else range(start, end)
+        for position in positions:
+            yield self.keys[position], self.ids[position]
+
+    def add(self, task):
+        """Insert a new task"""
+        key = self.key(task)
+        position = self._position(key, task["id"])
+        self.keys.insert(position, key)
+        self.ids.insert(position, task["id"])
+
+    def remove(self, task):
+        """Remove a deleted task"""
+        key = self.key(task)
+        position = self._position(key, task["id"])
+        if position < len(self.ids) and self.ids[position] == task["id"] and self.keys[position] == key:
+            del self.keys[position]
+            del self.ids[position]
+
+    def update(self, old_task, new_task):
+        """Move a changed task to its new place"""
+        if self.key(old_task) != self.key(new_task):
+            self.remove(old_task)
+            self.add(new_task)
+
+    def _position(self, key, task_id):
+        """Where (key, task_id) is or would go"""
+        start = bisect_left(self.keys, key)
+        end = bisect_right(self.keys, key, start)
+        return bisect_left(self.ids, task_id, start, end)
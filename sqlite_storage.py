@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+SQLite Storage Module - Stores tasks in an indexed SQLite database
+"""
+import os
+import sys
+import json
+import sqlite3
+from datetime import datetime
+
+from storage import StorageError
+
+# Columns stored directly on the tasks table; any other task field is kept
+# in the "extra" JSON column so nothing is lost on a round trip
+TASK_COLUMNS = ("id", "title", "description", "completed", "due_date", "priority", "created_at", "updated_at")
+
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    completed INTEGER NOT NULL DEFAULT 0,
+    due_date TEXT,
+    priority TEXT,
+    priority_rank INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT,
+    updated_at TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS task_tags (
+    task_id INTEGER NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (task_id, position)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks(completed);
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date);
+CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority_rank);
+CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+CREATE INDEX IF NOT EXISTS idx_task_tags_tag ON task_tags(tag);
+"""
+
+# ORDER BY clauses for the sort orders supported by query_tasks
+ORDER_BY = {
+    None: "id",
+    "id": "id",
+    "priority": "priority_rank, id",
+    "due_date": "NULLIF(due_date, '') IS NULL, NULLIF(due_date, ''), id",
+    "created_at": "created_at, id",
+}
+
+# Sort key columns of each sort order, used as keyset cursors by page_tasks.
+# They order rows the same way as ORDER_BY, with NULLs made comparable.
+KEYSET = {
+    None: ("id",),
+    "id": ("id",),
+    "priority": ("priority_rank", "id"),
+    "due_date": ("NULLIF(due_date, '') IS NULL", "COALESCE(due_date, '')", "id"),
+    "created_at": ("COALESCE(created_at, '')", "id"),
+}
+
+class SQLiteStorage:
+    """Class to manage task storage in a SQLite database"""
+
+    # Every mutation is written as its own statement, so like the JSON
+    # journal there is no need to rewrite all tasks on each change
+    journal = True
+
+    def __init__(self, filename):
+        """
+        Initialize the storage with a database filename
+
+        Args:
+            filename (str): SQLite database file to store tasks
+        """
+        self.filename = filename
+
+        dir_name = os.path.dirname(self.filename)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+
+        self.connection = sqlite3.connect(self.filename)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+
+        # Next task ID as of the last time it was read; new IDs always come
+        # from allocate_ids(), as other processes may have taken some since
+        self.next_id = self._read_next_id()
+
+    def load_tasks(self):
+        """
+        Load all tasks from the database
+
+        Returns:
+            list: List of tasks
+        """
+        return self.query_tasks()
+
+    def get_task(self, task_id):
+        """
+        Load a single task by its ID
+
+        Args:
+            task_id (int): ID of the task
+
+        Returns:
+            dict: The task, or None if it does not exist
+        """
+        tasks = self._fetch("SELECT * FROM tasks WHERE id = ?", (task_id,))
+        return tasks[0] if tasks else None
+
+    def query_tasks(self, completed=None, order_by=None, created_before=None, due_from=None, due_before=None):
+        """
+        Load the tasks matching a filter, sorted in the database
+
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+            order_by (str, optional): "priority", "due_date" or "created_at";
+                insertion order if omitted
+            created_before (str, optional): Only tasks created before this
+                ISO date
+            due_from (str, optional): Only tasks due on or after this ISO date
+            due_before (str, optional): Only tasks due before this ISO date
+
+        Returns:
+            list: List of matching tasks
+        """
+        where, params = self._where(completed, created_before, due_from, due_before)
+        return self._fetch(f"SELECT * FROM tasks{where} ORDER BY {ORDER_BY[order_by]}", params)
+
+    def page_tasks(self, completed=None, order_by=None, due_from=None, due_before=None, cursor=None, limit=20):
+        """
+        Load the tasks next to a keyset cursor, in the order of a view
+
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+            order_by (str, optional): Sort order, as for query_tasks()
+            due_from (str, optional): Only tasks due on or after this ISO date
+            due_before (str, optional): Only tasks due before this ISO date
+            cursor (tuple, optional): ("after", key) or ("before", key), with
+                a key returned by an earlier call; the start if omitted
+            limit (int, optional): Maximum number of tasks
+
+        Returns:
+            list: (key, task) pairs walking away from the cursor, so in
+                reverse order for a "before" cursor
+        """
+        columns = KEYSET[order_by]
+        where, params = self._where(completed, None, due_from, due_before)
+
+        reverse = cursor is not None and cursor[0] == "before"
+        if cursor is not None:
+            condition = f"({', '.join(columns)}) {'<' if reverse else '>'} ({', '.join('?' * len(columns))})"
+            where = f"{where} AND {condition}" if where else f" WHERE {condition}"
+            params = params + list(cursor[1])
+
+        direction = " DESC" if reverse else ""
+        order = ", ".join(column + direction for column in columns)
+        keys = ", ".join(f"{column} AS key_{position}" for position, column in enumerate(columns))
+
+        rows = self.connection.execute(
+            f"SELECT id, {keys} FROM tasks{where} ORDER BY {order} LIMIT ?", params + [limit]
+        ).fetchall()
+        if not rows:
+            return []
+
+        # Load the full tasks of the page in one go
+        placeholders = ",".join("?" * len(rows))
+        tasks = {
+            task["id"]: task
+            for task in self._iter_fetch(f"SELECT * FROM tasks WHERE id IN ({placeholders})", [row[0] for row in rows])
+        }
+        return [(tuple(row[1:]), tasks[row[0]]) for row in rows]
+
+    def iter_tasks(self, completed=None):
+        """
+        Stream tasks from the database without loading them all at once
+
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+
+        Yields:
+            dict: Each matching task, in insertion order
+        """
+        where, params = self._where(completed, None)
+        yield from self._iter_fetch(f"SELECT * FROM tasks{where} ORDER BY id", params)
+
+    def count_tasks(self, completed=None):
+        """
+        Count tasks without loading them
+
+        Args:
+            completed (bool, optional): Only count completed or pending tasks
+
+        Returns:
+            int: Number of matching tasks
+        """
+        where, params = self._where(completed, None)
+        return self.connection.execute(f"SELECT COUNT(*) FROM tasks{where}", params).fetchone()[0]
+
+    def search_tasks(self, keyword):
+        """
+        Find tasks whose title, description or tags contain a keyword
+
+        Args:
+            keyword (str): Case-insensitive substring to look for
+
+        Returns:
+            list: List of matching tasks
+        """
+        keyword = keyword.lower()
+        return self._fetch(
+            "SELECT * FROM tasks WHERE instr(lower(title), ?) OR instr(lower(description), ?) "
+            "OR id IN (SELECT task_id FROM task_tags WHERE instr(lower(tag), ?)) ORDER BY id",
+            (keyword, keyword, keyword)
+        )
+
+    def allocate_ids(self, count=1):
+        """
+        Reserve IDs for new tasks
+
+        The counter is read and moved on in one write transaction, so
+        processes adding tasks at the same time never get the same IDs.
+
+        Args:
+            count (int, optional): Number of consecutive IDs to reserve
+
+        Returns:
+            int: The first reserved ID
+
+        Raises:
+            StorageError: If the counter cannot be updated
+        """
+        try:
+            with self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                first_id = self._read_next_id()
+                self.next_id = first_id + count
+                self._save_next_id()
+        except sqlite3.Error as e:
+            raise StorageError(f"Cannot allocate a task ID: {e}") from None
+
+        return first_id
+
+    def record(self, op, task_id, fields=None):
+        """
+        Apply a single mutation to the database
+
+        Args:
+            op (str): One of "add", "update", "set" or "delete"
+            task_id (int): ID of the task the mutation applies to
+            fields (dict, optional): Whole task for add/update, changed
+                fields for set
+
+        Returns:
+            bool: True if the mutation was written, False otherwise
+        """
+        return self.record_many([(op, task_id, fields)])
+
+    def record_many(self, records):
+        """
+        Apply several mutations in a single database transaction
+
+        Args:
+            records (list): (op, task_id, fields) tuples, as for record()
+
+        Returns:
+            bool: True if the mutations were written, False otherwise
+        """
+        try:
+            with self.connection:
+                for op, task_id, fields in records:
+                    if op == "add":
+                        # A clash fails rather than replacing another task
+                        self._insert(fields)
+                    elif op == "update":
+                        self.connection.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+                        self._insert(fields)
+                    elif op == "set":
+                        self._set_fields(task_id, fields)
+                    elif op == "delete":
+                        self.connection.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+            return True
+        except sqlite3.Error as e:
+            print(f"Error saving tasks: {e}")
+            return False
+
+    def needs_compaction(self):
+        """The database never needs compacting by the task manager"""
+        return False
+
+    def prefers_snapshot(self, changes, task_count):
+        """Changes are always applied row by row"""
+        return False
+
+    def save_tasks(self, tasks):
+        """
+        Replace every task in the database
+
+        Args:
+            tasks (list): List of tasks to save
+        """
+        try:
+            with self.connection:
+                self.connection.execute("DELETE FROM task_tags")
+                self.connection.execute("DELETE FROM tasks")
+                for task in tasks:
+                    self._insert(task)
+
+                self._save_next_id()
+
+            return True
+        except sqlite3.Error as e:
+            print(f"Error saving tasks: {e}")
+            return False
+
+    def backup_tasks(self):
+        """
+        Create a backup of the database
+
+        Returns:
+            str: Backup filename or None if backup failed
+        """
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_filename = f"{os.path.splitext(self.filename)[0]}_backup_{timestamp}.db"
+
+            target = sqlite3.connect(backup_filename)
+            with target:
+                self.connection.backup(target)
+            target.close()
+
+            return backup_filename
+        except sqlite3.Error as e:
+            print(f"Error creating backup: {e}")
+            return None
+
+    def _where(self, completed, created_before, due_from=None, due_before=None):
+        """Build a WHERE clause for the common task filters"""
+        conditions = []
+        params = []
+
+        if completed is not None:
+            conditions.append("completed = ?")
+            params.append(int(completed))
+
+        if created_before is not None:
+            conditions.append("created_at < ?")
+            params.append(created_before)
+
+        if due_from is not None:
+            conditions.append("due_date >= ?")
+            params.append(due_from)
+
+        if due_before is not None:
+            conditions.append("due_date < ? AND due_date <> ''")
+            params.append(due_before)
+
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return where, params
+
+    def _fetch(self, sql, params):
+        """Run a task query and return the matching tasks as a list"""
+        return list(self._iter_fetch(sql, params))
+
+    def _iter_fetch(self, sql, params, batch_size=500):
+        """Run a task query and turn each row back into a task dict, in batches"""
+        cursor = self.connection.execute(sql, params)
+        names = [column[0] for column in cursor.description]
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+
+            tasks_by_id = {}
+            for row in rows:
+                row = dict(zip(names, row))
+                task = {
+                    "id": row["id"],
+                    "title": row["title"],
+                    "description": row["description"],
+                    "completed": bool(row["completed"]),
+                    "created_at": row["created_at"],
+                    "updated_at": row["updated_at"]
+                }
+                if row["due_date"] is not None:
+                    task["due_date"] = row["due_date"]
+                if row["priority"] is not None:
+                    task["priority"] = row["priority"]
+                task["tags"] = []
+                if row["extra"]:
+                    task.update(json.loads(row["extra"]))
+
+                tasks_by_id[task["id"]] = task
+
+            # Fetch the tags of the whole batch with one query
+            placeholders = ",".join("?" * len(tasks_by_id))
+            tag_rows = self.connection.execute(
+                f"SELECT task_id, tag FROM task_tags WHERE task_id IN ({placeholders}) ORDER BY task_id, position",
+                list(tasks_by_id)
+            )
+            for task_id, tag in tag_rows:
+                tasks_by_id[task_id]["tags"].append(tag)
+
+            yield from tasks_by_id.values()
+
+    def _insert(self, task):
+        """Insert one task and its tags"""
+        extra = {key: value for key, value in task.items() if key not in TASK_COLUMNS and key != "tags"}
+        priority = task.get("priority")
+
+        self.connection.execute(
+            "INSERT INTO tasks (id, title, description, completed, due_date, priority, priority_rank, "
+            "created_at, updated_at, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                task["id"],
+                task["title"],
+                task.get("description", ""),
+                int(bool(task.get("completed"))),
+                task.get("due_date"),
+                priority,
+                PRIORITY_RANK.get(priority or "medium", 1),
+                task.get("created_at"),
+                task.get("updated_at"),
+                json.dumps(extra) if extra else None
+            )
+        )
+        self.connection.executemany(
+            "INSERT INTO task_tags (task_id, position, tag) VALUES (?, ?, ?)",
+            [(task["id"], position, tag) for position, tag in enumerate(task.get("tags", []))]
+        )
+
+    def _set_fields(self, task_id, fields):
+        """Update some fields of one task in place"""
+        if all(key in TASK_COLUMNS and key not in ("id", "priority") for key in fields):
+            assignments = ", ".join(f"{key} = ?" for key in fields)
+            values = [int(value) if key == "completed" else value for key, value in fields.items()]
+            self.connection.execute(f"UPDATE tasks SET {assignments} WHERE id = ?", values + [task_id])
+            return
+
+        task = self.get_task(task_id)
+        if task is None:
+            return
+
+        task.update(fields)
+        self.connection.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        self._insert(task)
+
+    def _read_next_id(self):
+        """Read the ID counter, falling back to the highest ID for older databases"""
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        if row:
+            return int(row[0])
+        return self.connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM tasks").fetchone()[0]
+
+    def _save_next_id(self):
+        """Persist the ID counter, which only ever moves forward"""
+        if self.next_id is not None:
+            self.connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('next_id', ?) ON CONFLICT (key) DO UPDATE "
+                "SET value = excluded.value WHERE CAST(value AS INTEGER) < CAST(excluded.value AS INTEGER)",
+                (str(self.next_id),)
+            )
+
+
+def migrate_json_to_sqlite(json_filename="tasks.json", db_filename="tasks.db"):
+    """
+    Copy every task from a JSON task file into a SQLite database
+
+    Args:
+        json_filename (str, optional): Source JSON file (its journal is
+            applied if present)
+        db_filename (str, optional): Target SQLite database
+
+    Returns:
+        int: Number of tasks migrated
+    """
+    from storage import Storage
+
+    source = Storage(json_filename, journal=True)
+    tasks = source.load_tasks()
+
+    target = SQLiteStorage(db_filename)
+    target.next_id = source.next_id or max((task["id"] for task in tasks), default=0) + 1
+    target.save_tasks(tasks)
+
+    return len(tasks)
+
+
+if __name__ == "__main__":
+    # Usage: python sqlite_storage.py [tasks.json] [tasks.db]
+    count = migrate_json_to_sqlite(*sys.argv[1:3])
+    print(f"Migrated {count} tasks")
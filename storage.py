@@ -3,61 +3,756 @@
 Storage Module - Handles reading and writing task data to JSON file
 """
 import os
+import gc
 import json
+import re
+import time
+import atexit
+import marshal
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
+import instrumentation
+from task_model import Task, json_default
+
+# Advisory file locks keep several processes from clobbering each other's
+# writes. Without fcntl (Windows) one process at a time is assumed.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# The journal is folded back into a fresh snapshot once it is larger than
+# JOURNAL_MIN_BYTES and larger than JOURNAL_RATIO times the snapshot itself
+JOURNAL_MIN_BYTES = 256 * 1024
+JOURNAL_RATIO = 0.5
+
+WHITESPACE = re.compile(r"\s*")
+
+# Bump when the layout of the binary snapshot cache changes
+CACHE_VERSION = 1
+
+# With write-behind on, buffered journal records are written once no change
+# has come in for WRITE_DELAY seconds, and never later than WRITE_MAX_DELAY
+# seconds after the first of them
+WRITE_DELAY = 0.5
+WRITE_MAX_DELAY = 2.0
+
+def iter_json_array(file, chunk_size=1024 * 1024):
+    """
+    Parse the top-level JSON array of an open file one element at a time
+
+    Args:
+        file (file): Text file to read
+        chunk_size (int, optional): Characters to read at a time
+
+    Yields:
+        object: Each element of the array, decoded
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    # Where we are in the array: before "[", before the first element,
+    # before a later element, or after an element
+    state = "open"
+
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+
+        if position == len(buffer):
+            if eof:
+                # An empty file has no elements
+                if state == "open":
+                    return
+                raise json.JSONDecodeError("Unterminated array", buffer, position)
+
+            more = file.read(chunk_size)
+            eof = not more
+            buffer = buffer[position:] + more
+            position = 0
+            continue
+
+        char = buffer[position]
+
+        if state == "open":
+            if char != "[":
+                raise json.JSONDecodeError("Expecting '['", buffer, position)
+            position += 1
+            state = "first"
+        elif state == "first" and char == "]":
+            return
+        elif state in ("first", "value"):
+            try:
+                value, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The element runs past the end of the buffer
+                if eof:
+                    raise
+                more = file.read(max(chunk_size, len(buffer) - position))
+                eof = not more
+                buffer = buffer[position:] + more
+                position = 0
+                continue
+
+            state = "separator"
+            yield value
+        elif char == "]":
+            return
+        elif char == ",":
+            position += 1
+            state = "value"
+        else:
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, position)
+
+class StorageError(Exception):
+    """The stored tasks cannot be read, so nothing may be written over them"""
+
+def fold_records(records):
+    """
+    Fold journal records into the net change for each task
+
+    Args:
+        records (iterable): Journal records, oldest first
+
+    Returns:
+        dict: Task ID -> ("replace", task), ("patch", fields) or
+            ("delete", None), in the order tasks were first changed
+    """
+    changes = {}
+    for record in records:
+        op = record.get("op")
+        task_id = record.get("id")
+
+        if op in ("add", "update"):
+            changes[task_id] = ("replace", record["fields"])
+        elif op == "set":
+            change = changes.get(task_id)
+            if change is None:
+                changes[task_id] = ("patch", dict(record["fields"]))
+            elif change[0] != "delete":
+                change[1].update(record["fields"])
+        elif op == "delete":
+            changes[task_id] = ("delete", None)
+
+    return changes
+
 class Storage:
     """Class to manage task storage operations"""
     
-    def __init__(self, filename):
+    def __init__(self, filename, journal=False):
         """
         Initialize the storage with a filename
         
         Args:
             filename (str): JSON file to store tasks
+            journal (bool, optional): Append each mutation to a journal file
+                instead of rewriting the whole JSON file
         """
         self.filename = filename
+        self.journal = journal
+        self.journal_filename = f"{filename}.journal"
+        self.meta_filename = f"{filename}.meta"
+        self.lock_filename = f"{filename}.lock"
+        self.cache_filename = f"{filename}.cache"
+        
+        # Next task ID to allocate, or None if the data predates the counter
+        self.next_id = None
+        
+        # Stamp of the files as of the last time the tasks were read
+        self.read_stamp = None
+        
+        # Open lock file and how many nested lock() blocks hold it. The
+        # thread lock keeps the write-behind thread out at the same time.
+        self._lock_file = None
+        self._lock_depth = 0
+        self._thread_lock = threading.RLock()
+        
+        # Journal byte ranges (inode, start, end) appended by this object,
+        # so changes_since() only returns what other processes wrote
+        self._own_writes = []
+        
+        # Write-behind state: buffered journal lines, how many record_many()
+        # calls they came from, and when the first and last of those were
+        self._write_thread = None
+        self._pending = []
+        self._pending_changes = 0
+        self._first_change = None
+        self._last_change = None
+        self._pending_ready = threading.Condition()
+        
+        # Counts reported by write_metrics()
+        self._changes_written = 0
+        self._writes = 0
+        self._max_wait = 0.0
     
     def load_tasks(self):
         """
         Load tasks from JSON file
         
+        The parsed snapshot is kept in a binary cache next to it, which is
+        read instead of the JSON for as long as the snapshot is unchanged.
+        
         Returns:
             list: List of tasks
+
+        Raises:
+            StorageError: If the snapshot is truncated or corrupt
+        """
+        changes, file = self._open_snapshot()
+        return list(self._apply_journal(self._load_snapshot(file), changes))
+
+    def iter_tasks(self, completed=None):
+        """
+        Stream tasks from the JSON file one at a time
+
+        The file is parsed incrementally, so only one task at a time (plus
+        the journaled changes) is held in memory. The journal is read and
+        the snapshot opened under a shared lock, so both are from the same
+        moment even if another process compacts them while streaming.
+
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+
+        Yields:
+            dict: Each task, with the journal applied
+
+        Raises:
+            StorageError: If the snapshot is truncated or corrupt
+        """
+        changes, file = self._open_snapshot()
+        yield from self._apply_journal(self._iter_snapshot(file), changes, completed)
+
+    def _open_snapshot(self):
+        """
+        Read the journal and open the snapshot it applies to
+
+        Returns:
+            tuple: (changes from _read_journal(), open snapshot file or None)
+        """
+        with self.lock(exclusive=False):
+            self.read_stamp = self.stamp()
+            self.next_id = self._load_meta().get("next_id")
+            changes = self._read_journal() if self.journal else {}
+
+            # The open file keeps reading this snapshot even once it is replaced
+            try:
+                file = open(self.filename, 'r')
+            except FileNotFoundError:
+                file = None
+
+        return changes, file
+
+    def _apply_journal(self, tasks, changes, completed=None):
+        """Apply the journaled changes to the snapshot's tasks as they go by"""
+        replaced = set()
+        for task in tasks:
+            change = changes.get(task["id"])
+            if change is not None:
+                kind, fields = change
+                if kind == "delete":
+                    continue
+                if kind == "replace":
+                    task = fields
+                    replaced.add(task["id"])
+                else:
+                    task.update(fields)
+
+            if completed is None or task["completed"] == completed:
+                yield task
+
+        # Tasks added since the snapshot was written
+        for task_id, (kind, fields) in changes.items():
+            if kind == "replace" and task_id not in replaced:
+                if completed is None or fields["completed"] == completed:
+                    yield fields
+
+    def _iter_snapshot(self, file, chunk_size=1024 * 1024):
+        """Parse the top-level array of an open JSON snapshot one task at a time"""
+        if file is None:
+            return
+
+        with file:
+            try:
+                for task in iter_json_array(file, chunk_size):
+                    yield self._backfill(task)
+            except json.JSONDecodeError as e:
+                # Carrying on with no tasks would let the next save
+                # overwrite every one of them
+                raise StorageError(f"Cannot read {self.filename}: {e}") from None
+
+    def _load_snapshot(self, file):
         """
-        if not os.path.exists(self.filename):
+        Get every task of an open snapshot, from the binary cache if it is up to date
+
+        Args:
+            file (file): Open snapshot, or None if there is none
+
+        Returns:
+            list: Task objects
+        """
+        if file is None:
             return []
+
+        with file:
+            stat = os.fstat(file.fileno())
+            tasks = self._read_cache(file, stat)
+            if tasks is not None:
+                instrumentation.count("Storage cache hits")
+                return tasks
+
+            instrumentation.count("Storage cache misses")
+
+            digest = self._hash(file)
+            file.seek(0)
+            tasks = [Task(task) for task in self._iter_snapshot(file)]
+            self._write_cache([task.to_row() for task in tasks], stat, digest)
+
+        return tasks
+
+    def _read_cache(self, file, stat):
+        """
+        Read the tasks from the binary cache
+
+        The cache is valid when it was made from a snapshot of the same size
+        and modification time, or failing that, the same content hash.
+
+        Args:
+            file (file): Open snapshot
+            stat (os.stat_result): Its stat
+
+        Returns:
+            list: Task objects, or None if the cache is missing or stale
+        """
+        try:
+            with open(self.cache_filename, 'rb') as cache:
+                header = marshal.load(cache)
+                if header.get("version") != CACHE_VERSION or header.get("size") != stat.st_size:
+                    return None
+
+                digest = None
+                if header.get("mtime") != stat.st_mtime_ns:
+                    digest = self._hash(file)
+                    if digest != header.get("hash"):
+                        return None
+
+                data = cache.read()
+
+            # Only new objects without cycles are made, so the cycle
+            # collector would go through them again and again for nothing
+            collecting = gc.isenabled()
+            gc.disable()
+            try:
+                # loads() on the whole file is far quicker than load() on the stream
+                rows = marshal.loads(data)
+                tasks = [Task.from_row(row) for row in rows]
+            finally:
+                if collecting:
+                    gc.enable()
+        except (OSError, EOFError, ValueError, TypeError, AttributeError):
+            return None
+
+        # Same content with a new modification time (copied or touched)
+        if digest is not None:
+            self._write_cache(rows, stat, digest)
+
+        return tasks
+
+    def _write_cache(self, rows, stat, digest):
+        """Save the rows of a snapshot to the binary cache"""
+        temp_filename = f"{self.cache_filename}.{os.getpid()}.tmp"
+        try:
+            with open(temp_filename, 'wb') as cache:
+                marshal.dump({
+                    "version": CACHE_VERSION,
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
+                    "hash": digest
+                }, cache)
+                marshal.dump(rows, cache)
+            os.replace(temp_filename, self.cache_filename)
+        except (OSError, ValueError) as e:
+            print(f"Error saving task cache: {e}")
+
+    def _hash(self, file):
+        """Content hash of an open snapshot"""
+        import hashlib
+
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file.fileno(), 'rb', closefd=False) as raw:
+            raw.seek(0)
+            for chunk in iter(lambda: raw.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _backfill(self, task):
+        """Handle backwards compatibility with older versions"""
+        # Ensure all tasks have an ID
+        if "id" not in task:
+            task["id"] = hash(task["title"] + datetime.now().isoformat())
+        
+        # Ensure all tasks have timestamps
+        if "created_at" not in task:
+            task["created_at"] = datetime.now().isoformat()
+        
+        if "updated_at" not in task:
+            task["updated_at"] = datetime.now().isoformat()
         
+        # Ensure all tasks have a tags field
+        if "tags" not in task:
+            task["tags"] = []
+        
+        return task
+
+    def _load_meta(self):
+        """Load the metadata saved next to the snapshot"""
         try:
-            with open(self.filename, 'r') as file:
-                tasks = json.load(file)
-                
-                # Handle backwards compatibility with older versions
-                for task in tasks:
-                    # Ensure all tasks have an ID
-                    if "id" not in task:
-                        task["id"] = hash(task["title"] + datetime.now().isoformat())
-                    
-                    # Ensure all tasks have timestamps
-                    if "created_at" not in task:
-                        task["created_at"] = datetime.now().isoformat()
-                    
-                    if "updated_at" not in task:
-                        task["updated_at"] = datetime.now().isoformat()
-                    
-                    # Ensure all tasks have a tags field
-                    if "tags" not in task:
-                        task["tags"] = []
-                
-                return tasks
-        except (json.JSONDecodeError, FileNotFoundError):
-            # If the file is empty or invalid, return an empty list
-            return []
+            with open(self.meta_filename, 'r') as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _read_journal(self):
+        """
+        Fold the journal into the net change for each task
+
+        Returns:
+            dict: Task ID -> change, as for fold_records()
+        """
+        if not os.path.exists(self.journal_filename):
+            return {}
+
+        with open(self.journal_filename, 'r') as file:
+            return fold_records(self._journal_records(file))
+
+    def _journal_records(self, file):
+        """Decode journal lines, advancing next_id past every added task"""
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn last line from an interrupted write
+                break
+
+            if record.get("op") == "add" and (self.next_id is None or record["id"] >= self.next_id):
+                self.next_id = record["id"] + 1
+            yield record
+
+    def changes_since(self, stamp, own=False):
+        """
+        Read the journal records other writers appended since a stamp
+
+        Args:
+            stamp (tuple): Stamp the caller's copy of the tasks is from
+            own (bool, optional): Include the records this object wrote too
+
+        Returns:
+            tuple: (records, current stamp), records being the journal
+                entries as written by record_many(); None if the snapshot
+                was rewritten since, so every task has to be read again
+        """
+        with self.lock(exclusive=False):
+            current = self.stamp()
+
+            # The snapshot must be the same file and the journal only longer
+            same_journal = stamp[3] is None or stamp[3] == current[3]
+            if current[:3] != stamp[:3] or not same_journal or (current[4] or 0) < (stamp[4] or 0):
+                return None
+
+            offset = stamp[4] or 0
+            if current[4] is None or current[4] == offset:
+                return [], current
+
+            with open(self.journal_filename, 'rb') as file:
+                file.seek(offset)
+                data = file.read(current[4] - offset)
+
+            skip = []
+            if not own:
+                # Our own writes before the stamp are no longer needed
+                self._own_writes = [
+                    (inode, start, end) for inode, start, end in self._own_writes
+                    if inode == current[3] and end > offset
+                ]
+                skip = [(start, end) for _, start, end in self._own_writes]
+
+        records = []
+        position = offset
+        for line in data.splitlines(keepends=True):
+            start = position
+            position += len(line)
+            if any(skip_start <= start < skip_end for skip_start, skip_end in skip):
+                continue
+
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Torn last line from an interrupted write
+                break
+
+        return records, current
+
+    def record(self, op, task_id, fields=None):
+        """
+        Append a single mutation to the journal
+
+        Args:
+            op (str): One of "add", "update", "set" or "delete"
+            task_id (int): ID of the task the mutation applies to
+            fields (dict, optional): Whole task for add/update, changed
+                fields for set
+
+        Returns:
+            bool: True if the record was written, False otherwise
+        """
+        return self.record_many([(op, task_id, fields)])
+
+    def record_many(self, records):
+        """
+        Append several mutations to the journal in a single write
+
+        With write-behind on, the records are only buffered here and the
+        background thread writes them shortly after.
+
+        Args:
+            records (list): (op, task_id, fields) tuples, as for record()
+
+        Returns:
+            bool: True if the records were written (or buffered), False otherwise
+        """
+        # Records are turned into text straight away, as the tasks they
+        # hold may change again before they are written
+        lines = []
+        for op, task_id, fields in records:
+            entry = {"op": op, "id": task_id}
+            if fields is not None:
+                entry["fields"] = fields
+            lines.append(json.dumps(entry, separators=(",", ":"), default=json_default) + "\n")
+
+        if self._write_thread is not None:
+            with self._pending_ready:
+                now = time.monotonic()
+                if self._first_change is None:
+                    self._first_change = now
+                self._last_change = now
+                self._pending.extend(lines)
+                self._pending_changes += 1
+                self._pending_ready.notify()
+            return True
+
+        with self.lock():
+            if not self._append(lines):
+                return False
+
+            self._changes_written += 1
+            self._writes += 1
+            return True
+
+    def _append(self, lines):
+        """Append lines to the journal; the caller holds the lock"""
+        try:
+            dir_name = os.path.dirname(self.journal_filename)
+            if dir_name:
+                os.makedirs(dir_name, exist_ok=True)
+
+            with open(self.journal_filename, 'a') as file:
+                start = os.fstat(file.fileno()).st_size
+                file.write("".join(lines))
+                file.flush()
+                stat = os.fstat(file.fileno())
+
+            # Ranges in an earlier journal are gone with it
+            self._own_writes = [write for write in self._own_writes if write[0] == stat.st_ino]
+            self._own_writes.append((stat.st_ino, start, stat.st_size))
+            instrumentation.count("Journal records written", len(lines))
+            instrumentation.count("Journal bytes written", stat.st_size - start)
+            return True
+        except Exception as e:
+            print(f"Error writing journal: {e}")
+            return False
+
+    def start_write_behind(self):
+        """
+        Buffer journal writes and make them from a background thread
+
+        Bursts of changes are then written together, WRITE_DELAY seconds
+        after the last one and at most WRITE_MAX_DELAY seconds after the
+        first, instead of one write each. Call flush() to write everything
+        at once; it also runs at exit. Only journal mode has writes to buffer.
+        """
+        if self._write_thread is not None or not self.journal:
+            return
+
+        self._write_thread = threading.Thread(target=self._write_behind, name="storage-write-behind", daemon=True)
+        self._write_thread.start()
+        atexit.register(self.flush)
+
+    def flush(self):
+        """
+        Write out every buffered journal record now
+
+        Returns:
+            bool: True if nothing is left unwritten, False otherwise
+        """
+        with self.lock():
+            with self._pending_ready:
+                lines, changes, first_change = self._pending, self._pending_changes, self._first_change
+                self._pending, self._pending_changes, self._first_change = [], 0, None
+
+            if not lines:
+                return True
+
+            if not self._append(lines):
+                # Keep them for the next attempt
+                with self._pending_ready:
+                    self._pending[:0] = lines
+                    self._pending_changes += changes
+                    if self._first_change is None or first_change < self._first_change:
+                        self._first_change = first_change
+                return False
+
+            self._changes_written += changes
+            self._writes += 1
+            self._max_wait = max(self._max_wait, time.monotonic() - first_change)
+            return True
+
+    def write_metrics(self):
+        """
+        Get counts of the journal writes made so far
+
+        Returns:
+            dict: changes written, writes it took, writes saved by
+                write-behind, changes still buffered and the longest a
+                change waited to be written (seconds)
+        """
+        with self._pending_ready:
+            pending = self._pending_changes
+
+        return {
+            "changes": self._changes_written,
+            "writes": self._writes,
+            "saved": self._changes_written - self._writes,
+            "pending": pending,
+            "max_wait": self._max_wait
+        }
+
+    def _write_behind(self):
+        """Background thread: write buffered records once changes settle"""
+        while True:
+            with self._pending_ready:
+                while not self._pending:
+                    self._pending_ready.wait()
+
+                # Wait for a quiet spell, but not past the staleness bound
+                due = min(self._last_change + WRITE_DELAY, self._first_change + WRITE_MAX_DELAY)
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._pending_ready.wait(delay)
+                    continue
+
+            self.flush()
+
+    def stamp(self):
+        """
+        Get a stamp that changes whenever the stored tasks change
+
+        Returns:
+            tuple: Inode, size and modification time of the snapshot and
+                journal. Snapshots are always written to a new file, so the
+                inode changes with every rewrite, like a generation number.
+        """
+        stamp = []
+        for filename in (self.filename, self.journal_filename):
+            try:
+                stat = os.stat(filename)
+                stamp.extend((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                stamp.extend((None, None, None))
+        return tuple(stamp)
+
+    @contextmanager
+    def lock(self, exclusive=True):
+        """
+        Hold the advisory lock shared by every process using these files
+
+        Writers take the lock exclusively; readers share it, and only while
+        they read the journal and open the snapshot. Nested calls join the
+        lock already held; other threads of this process wait for it.
+
+        Args:
+            exclusive (bool, optional): Lock out every other process, for
+                writing; shared with other readers otherwise
+
+        Usage:
+            with storage.lock():
+                ... read the latest tasks, then change them ...
+        """
+        with self._thread_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                if self._lock_file is None:
+                    dir_name = os.path.dirname(self.lock_filename)
+                    if dir_name:
+                        os.makedirs(dir_name, exist_ok=True)
+                    self._lock_file = open(self.lock_filename, 'a')
+
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def needs_compaction(self):
+        """
+        Check whether the journal has grown enough to fold into a snapshot
+
+        Returns:
+            bool: True if save_tasks should be called to compact the journal
+        """
+        try:
+            journal_size = os.path.getsize(self.journal_filename)
+        except OSError:
+            return False
+
+        try:
+            snapshot_size = os.path.getsize(self.filename)
+        except OSError:
+            snapshot_size = 0
+
+        return journal_size > JOURNAL_MIN_BYTES and journal_size > snapshot_size * JOURNAL_RATIO
+
+    def prefers_snapshot(self, changes, task_count):
+        """
+        Check whether a batch of changes is better written as a fresh snapshot
+
+        Journaling changes to a large share of the tasks (a bulk import, say)
+        would only be compacted again straight after.
+
+        Args:
+            changes (int): Number of mutations in the batch
+            task_count (int): Number of tasks once they are applied
+
+        Returns:
+            bool: True if save_tasks should be called instead of record_many
+        """
+        return changes > task_count * JOURNAL_RATIO
     
     def save_tasks(self, tasks):
         """
         Save tasks to JSON file
 
+        In journal mode this is also the compaction step: the full list is
+        written as a fresh snapshot and the journal is emptied.
+
+        The snapshot is written to a temporary file and renamed over the old
+        one, so readers only ever see a complete file.
+
         Args:
             tasks (list): List of tasks to save
         """
@@ -66,39 +761,99 @@ class Storage:
             if dir_name:
                 os.makedirs(dir_name, exist_ok=True)
 
-            with open(self.filename, 'w') as file:
-                json.dump(tasks, file, indent=2)
+            with self.lock():
+                self._discard_pending()
+
+                temp_filename = f"{self.filename}.tmp"
+                with open(temp_filename, 'w') as file:
+                    # Task objects are written out as plain JSON objects
+                    with instrumentation.timer("Storage.save_tasks: serialize"):
+                        json.dump(tasks, file, indent=2, default=json_default)
+                        file.flush()
+                    with instrumentation.timer("Storage.save_tasks: fsync"):
+                        os.fsync(file.fileno())
+
+                self._install_snapshot(temp_filename)
 
             return True
         except Exception as e:
             print(f"Error saving tasks: {e}")
             return False
 
+    def write_snapshot(self, chunks):
+        """
+        Replace the tasks with a JSON array given as text
+
+        Like save_tasks, but for a snapshot that already exists as JSON (a
+        backup being restored), which is streamed to disk as it comes
+        instead of being parsed and serialized again. The journal is emptied.
+
+        Args:
+            chunks (iterable): Pieces of text that together make up the array
+
+        Returns:
+            bool: True if the tasks were replaced, False otherwise
+        """
+        try:
+            dir_name = os.path.dirname(self.filename)
+            if dir_name:
+                os.makedirs(dir_name, exist_ok=True)
+
+            with self.lock():
+                self._discard_pending()
+
+                temp_filename = f"{self.filename}.tmp"
+                with open(temp_filename, 'w') as file:
+                    file.writelines(chunks)
+                    file.flush()
+                    os.fsync(file.fileno())
+
+                self._install_snapshot(temp_filename)
+
+            return True
+        except Exception as e:
+            print(f"Error saving tasks: {e}")
+            return False
+
+    def _discard_pending(self):
+        """Drop buffered journal records that a new snapshot already has"""
+        with self._pending_ready:
+            self._changes_written += self._pending_changes
+            self._pending, self._pending_changes, self._first_change = [], 0, None
+
+    def _install_snapshot(self, temp_filename):
+        """Rename a fully written snapshot into place and empty the journal (lock held)"""
+        if self.next_id is not None:
+            temp_meta = f"{self.meta_filename}.tmp"
+            with open(temp_meta, 'w') as file:
+                json.dump({"next_id": self.next_id}, file)
+            os.replace(temp_meta, self.meta_filename)
+
+        os.replace(temp_filename, self.filename)
+
+        # A crash before this only replays changes the snapshot already has
+        if self.journal and os.path.exists(self.journal_filename):
+            os.remove(self.journal_filename)
     
     def backup_tasks(self):
         """
-        Create a backup of the current tasks file
+        Create a backup of the current tasks
+        
+        Backups are incremental: only the chunks of tasks that changed since
+        an earlier backup are stored (see the backups module), and old
+        backups are pruned by its retention policy.
         
         Returns:
-            str: Backup filename or None if backup failed
+            str: ID of the backup or None if backup failed
         """
-        if not os.path.exists(self.filename):
+        if not os.path.exists(self.filename) and not os.path.exists(self.journal_filename):
             return None
         
         try:
-            # Generate backup filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_filename = f"{os.path.splitext(self.filename)[0]}_backup_{timestamp}.json"
-            
-            # Read current file
-            with open(self.filename, 'r') as source:
-                data = source.read()
-            
-            # Write to backup file
-            with open(backup_filename, 'w') as target:
-                target.write(data)
-            
-            return backup_filename
+            import backups
+            manifest = backups.create_backup(self)
+            backups.prune(backups.backup_directory(self.filename))
+            return manifest["id"]
         except Exception as e:
             print(f"Error creating backup: {e}")
             return None
\ No newline at end of file
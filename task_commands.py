@@ -1,3 +1,4 @@
+import os
 import random
 from datetime import datetime, timedelta
 from rich.table import Table
@@ -7,7 +8,10 @@ from rich import box
 from rich.text import Text
 from rich.layout import Layout
 from rich.align import Align
-from task_ui import simulate_loading
+from task_ui import WorkProgress, track_progress
+import archive
+import exporters
+import instrumentation
 from context import console,task_manager
 
 def add_task():
@@ -57,58 +61,142 @@ def add_task():
     tags_input = Prompt.ask("[bold]Tags[/bold] (comma-separated, optional)", default="")
     tags = [tag.strip() for tag in tags_input.split(",")] if tags_input else []
     
-    simulate_loading("Adding task")
-    
-    task_id = task_manager.add_task(
-        title=title, 
-        description=description, 
-        due_date=due_date, 
-        priority=priority,
-        tags=tags
-    )
+    with WorkProgress("Adding task"):
+        task_id = task_manager.add_task(
+            title=title, 
+            description=description, 
+            due_date=due_date, 
+            priority=priority,
+            tags=tags
+        )
     
     console.print(f"\n[bold green]✅ Task added successfully with ID: {task_id}[/bold green]")
 
-def list_tasks():
-    """Display tasks in a beautiful table"""
-    tasks = task_manager.get_tasks()
-    
-    # Show different views
-    view_options = ["all", "pending", "completed", "priority", "due date"]
-    console.print("\n[bold cyan]📋 Task List Views[/bold cyan]")
-    for i, option in enumerate(view_options, 1):
-        console.print(f"{i}. {option.title()}")
-    
-    view_choice = Prompt.ask("[bold]Choose a view[/bold]", choices=[str(i) for i in range(1, len(view_options) + 1)], default="1")
-    view = view_options[int(view_choice) - 1]
+# Rows shown per page of the task list
+PAGE_SIZE = 20
+
+# Views offered by list_tasks
+LIST_VIEWS = ["all", "pending", "completed", "priority", "due date", "due this week"]
+
+def view_query(view):
+    """
+    Get the page_tasks arguments of a list view
     
-    filtered_tasks = tasks
+    Args:
+        view (str): One of LIST_VIEWS
     
-    # Filter tasks based on view
+    Returns:
+        dict: Filter and sort arguments for task_manager.page_tasks
+    """
     if view == "pending":
-        filtered_tasks = [task for task in tasks if not task["completed"]]
+        return {"completed": False}
     elif view == "completed":
-        filtered_tasks = [task for task in tasks if task["completed"]]
-    
-    # Sort tasks
-    if view == "priority":
-        priority_rank = {"high": 0, "medium": 1, "low": 2}
-        filtered_tasks = sorted(filtered_tasks, key=lambda x: priority_rank.get(x.get("priority", "medium"), 1))
+        return {"completed": True}
+    elif view == "priority":
+        return {"order_by": "priority"}
     elif view == "due date":
         # Sort by due date, putting None values at the end
-        filtered_tasks = sorted(
-            filtered_tasks,
-            key=lambda x: datetime.fromisoformat(x["due_date"]) if x.get("due_date") else datetime.max.date()
-        )
+        return {"order_by": "due_date"}
+    elif view == "due this week":
+        # Pending tasks due in the next 7 days, soonest first
+        today = datetime.now().date()
+        return {
+            "completed": False,
+            "order_by": "due_date",
+            "due_from": today.isoformat(),
+            "due_before": (today + timedelta(days=7)).isoformat()
+        }
     
-    if not filtered_tasks:
+    return {}
+
+def list_tasks(page=None, page_size=PAGE_SIZE):
+    """
+    Display tasks in a beautiful table, one page at a time
+    
+    Args:
+        page (int, optional): Show only this page (starting at 1) of all
+            tasks and return, without asking anything; otherwise ask for a
+            view, start at its first page and let the user move between
+            pages
+        page_size (int, optional): Number of tasks per page
+    """
+    if page is not None:
+        # A single page is asked for from scripts, with no one to choose a view
+        view = LIST_VIEWS[0]
+    else:
+        # Show different views
+        console.print("\n[bold cyan]📋 Task List Views[/bold cyan]")
+        for i, option in enumerate(LIST_VIEWS, 1):
+            console.print(f"{i}. {option.title()}")
+        
+        view_choice = Prompt.ask("[bold]Choose a view[/bold]", choices=[str(i) for i in range(1, len(LIST_VIEWS) + 1)], default="1")
+        view = LIST_VIEWS[int(view_choice) - 1]
+    
+    # Filter and sort tasks based on view
+    query = view_query(view)
+    
+    # Only the tasks of the page on screen are fetched and formatted; pages
+    # are found from the edge of the previous one, so skipping ahead to a
+    # page only walks the cursors
+    page_number = 1
+    cursor = None
+    with WorkProgress("Fetching tasks"), instrumentation.timer("list_tasks: fetch"):
+        while True:
+            tasks, previous_cursor, next_cursor = task_manager.page_tasks(cursor=cursor, page_size=page_size, **query)
+            if page is None or page_number >= page or next_cursor is None:
+                break
+            cursor = next_cursor
+            page_number += 1
+    
+    if not tasks:
         console.print("\n[bold yellow]No tasks found in this view![/bold yellow]")
         return
     
-    simulate_loading("Fetching tasks")
+    if page is not None and page_number < page:
+        console.print(f"\n[bold yellow]There are only {page_number} pages in this view![/bold yellow]")
+        return
     
-    # Create a beautiful table
-    table = Table(show_header=True, header_style="bold magenta", box=box.ROUNDED)
+    while True:
+        with instrumentation.timer("list_tasks: render"):
+            console.print("\n")
+            console.print(_page_table(tasks, f"Page {page_number}"))
+            _show_statistics()
+        
+        if page is not None or (previous_cursor is None and next_cursor is None):
+            return
+        
+        choices = []
+        if next_cursor is not None:
+            choices.append("N")
+        if previous_cursor is not None:
+            choices.append("P")
+        choices.append("B")
+        
+        action = Prompt.ask(
+            "[bold][N]ext page | [P]revious page | [B]ack to menu[/bold]",
+            choices=choices + [choice.lower() for choice in choices],
+            default=choices[0]
+        ).upper()
+        
+        if action == "N":
+            cursor = next_cursor
+            page_number += 1
+        elif action == "P":
+            cursor = previous_cursor
+            page_number -= 1
+        else:
+            return
+        
+        with WorkProgress("Fetching tasks"), instrumentation.timer("list_tasks: fetch"):
+            tasks, previous_cursor, next_cursor = task_manager.page_tasks(cursor=cursor, page_size=page_size, **query)
+        
+        if not tasks:
+            console.print("\n[bold yellow]No more tasks in this direction![/bold yellow]")
+            return
+
+def _page_table(tasks, caption):
+    """Build the table of one page of tasks"""
+    table = Table(show_header=True, header_style="bold magenta", box=box.ROUNDED, caption=caption)
     
     # Add columns to the table
     table.add_column("#", style="dim", width=6)
@@ -120,7 +208,7 @@ def list_tasks():
     table.add_column("Tags", width=15)
     
     # Add rows to the table
-    for task in filtered_tasks:
+    for task in tasks:
         # Style status
         status_style = "green" if task["completed"] else "yellow"
         status = "✅ Done" if task["completed"] else "⏳ Pending"
@@ -170,25 +258,24 @@ def list_tasks():
             tags
         )
     
-    console.print("\n")
-    console.print(table)
-    
-    # Display statistics
-    total = len(tasks)
-    completed = len([t for t in tasks if t["completed"]])
-    pending = total - completed
+    return table
+
+def _show_statistics():
+    """Display the task statistics panel"""
+    summary = task_manager.stats()
     
     stats = Table.grid(padding=1)
     stats.add_column(style="green", justify="right")
     stats.add_column(style="cyan")
     
-    stats.add_row("Total tasks:", str(total))
-    stats.add_row("Completed:", str(completed))
-    stats.add_row("Pending:", str(pending))
+    stats.add_row("Total tasks:", str(summary["total"]))
+    stats.add_row("Completed:", str(summary["completed"]))
+    stats.add_row("Pending:", str(summary["pending"]))
     stats.add_row(
         "Completion rate:", 
-        f"[progress.percentage]{(completed/total)*100 if total else 0:.1f}%[/progress.percentage]"
+        f"[progress.percentage]{summary['completion_rate']:.1f}%[/progress.percentage]"
     )
+    stats.add_row("Overdue:", str(summary["overdue"]))
     
     console.print(Panel(stats, title="[bold]📊 Statistics[/bold]", border_style="blue"))
 
@@ -210,13 +297,13 @@ def mark_complete():
     if task["completed"]:
         undo = Confirm.ask(f"[yellow]Task '{task['title']}' is already completed. Do you want to mark it as pending?[/yellow]")
         if undo:
-            simulate_loading("Updating task")
-            task_manager.toggle_task_status(task_id, False)
+            with WorkProgress("Updating task"):
+                task_manager.toggle_task_status(task_id, False)
             console.print(f"[bold yellow]⟲ Task '{task['title']}' marked as pending[/bold yellow]")
         return
     
-    simulate_loading("Updating task")
-    task_manager.toggle_task_status(task_id)
+    with WorkProgress("Updating task"):
+        task_manager.toggle_task_status(task_id)
     
     # Celebration animation
     console.print("\n[bold green]✅ Task completed! Great job![/bold green]")
@@ -244,59 +331,73 @@ def delete_task():
     )
     
     if confirm:
-        simulate_loading("Deleting task")
-        task_manager.delete_task(task_id)
+        with WorkProgress("Deleting task"):
+            task_manager.delete_task(task_id)
         console.print(f"[bold green]🗑️ Task '{task['title']}' deleted successfully[/bold green]")
     else:
         console.print("[yellow]Deletion cancelled[/yellow]")
 
-def search_tasks():
-    """Search for tasks by keyword"""
-    keyword = Prompt.ask("\n[bold]Enter search keyword[/bold]")
-    
-    simulate_loading("Searching tasks")
-    
-    tasks = task_manager.get_tasks()
-    
-    # Search in title, description, and tags
+def search_tasks(keyword=None, archived=False):
+    """
+    Search for tasks by keyword
+    
+    Args:
+        keyword (str, optional): Text to look for; asked for if omitted
+        archived (bool, optional): Search the archive instead of the tasks
+    """
+    if keyword is None:
+        keyword = Prompt.ask("\n[bold]Enter search keyword[/bold]")
+    
+    # Search in title, description, and tags, by word first and then as a
+    # plain substring if no word matches
     results = []
-    for task in tasks:
-        if (keyword.lower() in task["title"].lower() or 
-            keyword.lower() in task["description"].lower() or
-            any(keyword.lower() in tag.lower() for tag in task.get("tags", []))):
-            results.append(task)
+    if not archived:
+        with WorkProgress("Searching tasks"), instrumentation.timer("search_tasks: scan"):
+            results = task_manager.search_tasks(keyword)
+            if not results:
+                results = task_manager.search_tasks(keyword, substring=True)
+    
+    # Archived tasks are only searched when the current ones have no match
+    filename = archive.archive_filename(task_manager.storage.filename)
+    if not results and (archived or os.path.exists(filename)):
+        archived = True
+        with WorkProgress("Searching archived tasks"), instrumentation.timer("search_tasks: archive"):
+            results = archive.search_archive(filename, keyword)
+            if not results:
+                results = archive.search_archive(filename, keyword, substring=True)
     
     if not results:
         console.print(f"\n[yellow]No tasks found matching '{keyword}'[/yellow]")
         return
     
-    # Create a beautiful table for search results
-    table = Table(show_header=True, header_style="bold magenta", box=box.ROUNDED)
-    
-    # Add columns to the table
-    table.add_column("#", style="dim", width=6)
-    table.add_column("Title", style="cyan", width=20)
-    table.add_column("Description", style="green", width=30)
-    table.add_column("Status", width=10)
-    
-    # Add rows to the table
-    for task in results:
-        status_style = "green" if task["completed"] else "yellow"
-        status = "✅ Done" if task["completed"] else "⏳ Pending"
+    with instrumentation.timer("search_tasks: render"):
+        # Create a beautiful table for search results
+        table = Table(show_header=True, header_style="bold magenta", box=box.ROUNDED)
         
-        table.add_row(
-            str(task["id"]),
-            task["title"],
-            (task["description"][:27] + "...") if len(task["description"]) > 30 else task["description"],
-            f"[{status_style}]{status}[/{status_style}]"
-        )
-    
-    console.print("\n")
-    console.print(Panel(
-        table,
-        title=f"[bold]🔍 Search Results for '{keyword}' ({len(results)} found)[/bold]",
-        border_style="blue"
-    ))
+        # Add columns to the table
+        table.add_column("#", style="dim", width=6)
+        table.add_column("Title", style="cyan", width=20)
+        table.add_column("Description", style="green", width=30)
+        table.add_column("Status", width=10)
+        
+        # Add rows to the table
+        for task in results:
+            status_style = "green" if task["completed"] else "yellow"
+            status = "✅ Done" if task["completed"] else "⏳ Pending"
+            
+            table.add_row(
+                str(task["id"]),
+                task["title"],
+                (task["description"][:27] + "...") if len(task["description"]) > 30 else task["description"],
+                f"[{status_style}]{status}[/{status_style}]"
+            )
+        
+        console.print("\n")
+        console.print(Panel(
+            table,
+            title=f"[bold]🔍 {'Archived ' if archived else ''}Search Results for '{keyword}' ({len(results)} found)[/bold]",
+            border_style="blue"
+        ))
 
 def view_task_details():
     """View detailed information about a specific task"""
@@ -308,13 +409,12 @@ def view_task_details():
         console.print("[bold red]❌ Error: Task ID must be a number[/bold red]")
         return
     
-    task = task_manager.get_task_by_id(task_id)
+    with WorkProgress("Loading task details"):
+        task = task_manager.get_task_by_id(task_id)
     if not task:
         console.print(f"[bold red]❌ Error: No task found with ID {task_id}[/bold red]")
         return
     
-    simulate_loading("Loading task details")
-    
     # Create a layout for task details
     layout = Layout()
     layout.split_column(
@@ -489,9 +589,8 @@ def edit_task(task_id):
         tags_input = Prompt.ask("[bold]Tags[/bold] (comma-separated)", default=current_tags)
         updated_task["tags"] = [tag.strip() for tag in tags_input.split(",")] if tags_input else []
     
-    simulate_loading("Updating task")
-    
-    task_manager.update_task(task_id, updated_task)
+    with WorkProgress("Updating task"):
+        task_manager.update_task(task_id, updated_task)
     console.print(f"\n[bold green]✅ Task updated successfully![/bold green]")
 
 def bulk_actions():
@@ -503,33 +602,31 @@ def bulk_actions():
     console.print("3. Delete completed tasks")
     console.print("4. Delete all tasks")
     console.print("5. Delete tasks older than a specific date")
+    console.print("6. Archive completed tasks")
     
-    action_choice = Prompt.ask("[bold]Choose an action[/bold]", choices=["1", "2", "3", "4", "5"], default="1")
+    action_choice = Prompt.ask("[bold]Choose an action[/bold]", choices=["1", "2", "3", "4", "5", "6"], default="1")
     
-    tasks = task_manager.get_tasks()
     affected_count = 0
     
     if action_choice == "1":
         # Mark all as completed
-        for task in tasks:
-            if not task["completed"]:
-                task_manager.toggle_task_status(task["id"], True)
-                affected_count += 1
+        pending_ids = [task["id"] for task in task_manager.query_tasks(completed=False)]
+        with task_manager.transaction():
+            affected_count = task_manager.set_status(track_progress(pending_ids, "Completing tasks"), True)
         
         console.print(f"[bold green]✅ {affected_count} tasks marked as completed[/bold green]")
     
     elif action_choice == "2":
         # Mark all as pending
-        for task in tasks:
-            if task["completed"]:
-                task_manager.toggle_task_status(task["id"], False)
-                affected_count += 1
+        completed_ids = [task["id"] for task in task_manager.query_tasks(completed=True)]
+        with task_manager.transaction():
+            affected_count = task_manager.set_status(track_progress(completed_ids, "Reopening tasks"), False)
         
         console.print(f"[bold yellow]⟲ {affected_count} tasks marked as pending[/bold yellow]")
     
     elif action_choice == "3":
         # Delete completed tasks
-        completed_tasks = [task for task in tasks if task["completed"]]
+        completed_tasks = task_manager.query_tasks(completed=True)
         
         if not completed_tasks:
             console.print("[yellow]No completed tasks to delete[/yellow]")
@@ -540,9 +637,10 @@ def bulk_actions():
         )
         
         if confirm:
-            for task in completed_tasks:
-                task_manager.delete_task(task["id"])
-                affected_count += 1
+            with task_manager.transaction():
+                affected_count = task_manager.delete_tasks(
+                    task["id"] for task in track_progress(completed_tasks, "Deleting tasks")
+                )
             
             console.print(f"[bold green]🗑️ {affected_count} completed tasks deleted[/bold green]")
         else:
@@ -550,6 +648,7 @@ def bulk_actions():
     
     elif action_choice == "4":
         # Delete all tasks
+        tasks = task_manager.query_tasks()
         if not tasks:
             console.print("[yellow]No tasks to delete[/yellow]")
             return
@@ -564,9 +663,10 @@ def bulk_actions():
             )
             
             if double_confirm:
-                for task in tasks:
-                    task_manager.delete_task(task["id"])
-                    affected_count += 1
+                with task_manager.transaction():
+                    affected_count = task_manager.delete_tasks(
+                        task["id"] for task in track_progress(tasks, "Deleting tasks")
+                    )
                 
                 console.print(f"[bold green]🗑️ {affected_count} tasks deleted[/bold green]")
             else:
@@ -603,11 +703,7 @@ def bulk_actions():
                 except ValueError:
                     console.print("[bold red]Invalid date format! Please use YYYY-MM-DD.[/bold red]")
         
-        old_tasks = []
-        for task in tasks:
-            created_date = datetime.fromisoformat(task.get("created_at", "")).date()
-            if created_date < cutoff_date:
-                old_tasks.append(task)
+        old_tasks = task_manager.query_tasks(created_before=cutoff_date.isoformat())
         
         if not old_tasks:
             console.print(f"[yellow]No tasks found created before {cutoff_date.isoformat()}[/yellow]")
@@ -618,13 +714,29 @@ def bulk_actions():
         )
         
         if confirm:
-            for task in old_tasks:
-                task_manager.delete_task(task["id"])
-                affected_count += 1
+            with task_manager.transaction():
+                affected_count = task_manager.delete_tasks(
+                    task["id"] for task in track_progress(old_tasks, "Deleting tasks")
+                )
             
             console.print(f"[bold green]🗑️ {affected_count} old tasks deleted[/bold green]")
         else:
             console.print("[yellow]Deletion cancelled[/yellow]")
+    
+    elif action_choice == "6":
+        # Move completed tasks to the archive, where they can still be searched and exported
+        completed_count = task_manager.count_tasks(True)
+        if not completed_count:
+            console.print("[yellow]No completed tasks to archive[/yellow]")
+            return
+        
+        if Confirm.ask(f"[bold]Archive all {completed_count} completed tasks?[/bold]"):
+            with WorkProgress("Archiving tasks"):
+                affected_count = archive.archive_tasks(task_manager)
+            
+            console.print(f"[bold green]📦 {affected_count} completed tasks archived[/bold green]")
+        else:
+            console.print("[yellow]Archiving cancelled[/yellow]")
 
 def export_tasks():
     """Export tasks to different formats"""
@@ -641,77 +753,33 @@ def export_tasks():
     console.print("1. All tasks")
     console.print("2. Pending tasks only")
     console.print("3. Completed tasks only")
+    console.print("4. Archived tasks")
     
-    tasks_choice = Prompt.ask("[bold]Choose an option[/bold]", choices=["1", "2", "3"], default="1")
-    
-    tasks = task_manager.get_tasks()
+    tasks_choice = Prompt.ask("[bold]Choose an option[/bold]", choices=["1", "2", "3", "4"], default="1")
     
-    # Filter tasks based on choice
-    if tasks_choice == "2":
-        tasks = [task for task in tasks if not task["completed"]]
-    elif tasks_choice == "3":
-        tasks = [task for task in tasks if task["completed"]]
+    formats = {"1": "csv", "2": "markdown", "3": "json"}
     
-    if not tasks:
-        console.print("[yellow]No tasks to export[/yellow]")
-        return
+    if tasks_choice == "4":
+        filename = archive.archive_filename(task_manager.storage.filename)
+        if not archive.read_index(filename):
+            console.print("[yellow]No archived tasks to export[/yellow]")
+            return
+        tasks = archive.iter_archive(filename)
+    else:
+        statuses = {"1": "all", "2": "pending", "3": "completed"}
+        completed = exporters.STATUSES[statuses[tasks_choice]]
+        
+        if not task_manager.count_tasks(completed):
+            console.print("[yellow]No tasks to export[/yellow]")
+            return
+        tasks = task_manager.iter_tasks(completed)
     
     # Generate filename with timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    fmt = formats[format_choice]
+    filename = exporters.default_filename(fmt)
     
-    if format_choice == "1":
-        # Export to CSV
-        filename = f"tasks_export_{timestamp}.csv"
-        
-        import csv
-        
-        with open(filename, 'w', newline='') as csvfile:
-            fieldnames = ['id', 'title', 'description', 'completed', 'due_date', 'priority', 'tags', 'created_at', 'updated_at']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            writer.writeheader()
-            for task in tasks:
-                # Convert tags list to string
-                task_copy = task.copy()
-                task_copy['tags'] = ', '.join(task_copy.get('tags', []))
-                writer.writerow(task_copy)
-    
-    elif format_choice == "2":
-        # Export to Markdown
-        filename = f"tasks_export_{timestamp}.md"
-        
-        with open(filename, 'w',encoding='utf-8') as mdfile:
-            mdfile.write("# Task List Export\n\n")
-            mdfile.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            
-            for task in tasks:
-                status = "✅ COMPLETED" if task["completed"] else "⏳ PENDING"
-                mdfile.write(f"## [{task['id']}] {task['title']}\n\n")
-                mdfile.write(f"**Status:** {status}\n\n")
-                
-                if task["description"]:
-                    mdfile.write(f"**Description:** {task['description']}\n\n")
-                
-                if task.get("due_date"):
-                    mdfile.write(f"**Due Date:** {task['due_date']}\n\n")
-                
-                if task.get("priority"):
-                    mdfile.write(f"**Priority:** {task['priority'].upper()}\n\n")
-                
-                if task.get("tags"):
-                    mdfile.write(f"**Tags:** {', '.join(task['tags'])}\n\n")
-                
-                mdfile.write(f"**Created:** {task.get('created_at', '')}\n\n")
-                mdfile.write(f"**Updated:** {task.get('updated_at', '')}\n\n")
-                mdfile.write("---\n\n")
-    
-    elif format_choice == "3":
-        # Export to JSON
-        filename = f"tasks_export_{timestamp}.json"
-        
-        import json
-        
-        with open(filename, 'w') as jsonfile:
-            json.dump(tasks, jsonfile, indent=2)
+    # Stream the tasks straight to the file
+    with WorkProgress("Exporting tasks", unit="chars") as progress:
+        exporters.export_tasks(tasks, fmt, filename, progress.advance)
     
     console.print(f"[bold green]✅ Tasks exported successfully to {filename}[/bold green]")
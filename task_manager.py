@@ -2,28 +2,309 @@
 """
 Task Manager Module - Handles task operations like add, delete, complete, etc.
 """
-import uuid
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
-from storage import Storage
+from storage import Storage, StorageError
+from task_model import Task, SORT_KEYS, BAD_DUE_DATE, due_key, timestamp_key
+
+# Most stored tasks to read through for one page before loading every task
+# and paging from the ID index instead
+STREAM_PAGE_SCAN = 2000
 
 class TaskManager:
     """Class to manage task operations"""
     
-    def __init__(self):
-        """Initialize the task manager with storage"""
-        self.storage = Storage("tasks.json")
-        self.tasks = self.storage.load_tasks()
+    def __init__(self, backend="json", storage=None):
+        """
+        Initialize the task manager with storage
+        
+        Args:
+            backend (str, optional): "json" (default) for tasks.json,
+                "sqlite" for tasks.db, "sharded" for tasks.shards/ or
+                "records" for tasks.records
+            storage (object, optional): Storage object to use instead of
+                creating one for the backend
+        """
+        if storage is None:
+            if backend == "sqlite":
+                from sqlite_storage import SQLiteStorage
+                storage = SQLiteStorage("tasks.db")
+            elif backend == "sharded":
+                from sharded_storage import ShardedStorage
+                storage = ShardedStorage("tasks.shards")
+            elif backend == "records":
+                from record_storage import RecordStorage
+                storage = RecordStorage("tasks.records")
+            else:
+                storage = Storage("tasks.json", journal=True)
+        
+        self.storage = storage
+        
+        # Tasks keyed by ID. Dicts keep insertion order, so this is both the
+        # id -> task index and the id -> position index of the task list.
+        # Loaded on first use; storages that can read and write single
+        # tasks (like SQLite) never need to load everything.
+        self._tasks_by_id = None
+        self._task_list = None
+        
+        # State of the open transaction, if any
+        self._transaction = None
+        
+        # Monotonic ID counter, persisted alongside the tasks
+        self._next_id = None
+        
+        # Indexes derived from the loaded tasks, keyed by name. Each is built
+        # on first use and then kept up to date by every mutation.
+        self._indexes = {}
+        
+        # Storage stamp the tasks and indexes in memory were read at, used
+        # to catch up with changes made by other processes
+        self._stamp = None
+    
+    @property
+    def tasks(self):
+        """List of all tasks in insertion order"""
+        self._load()
+        if self._task_list is None:
+            self._task_list = list(self._tasks_by_id.values())
+        return self._task_list
     
     def get_tasks(self):
         """Get all tasks"""
+        self._refresh()
         return self.tasks
     
     def get_task_by_id(self, task_id):
         """Get a task by its ID"""
-        for task in self.tasks:
-            if task["id"] == task_id:
-                return task
-        return None
+        self._refresh()
+        self._ensure_loaded()
+        
+        if self._tasks_by_id is None:
+            return self._get_unloaded_task(task_id)
+        
+        return self._tasks_by_id.get(task_id)
+    
+    def query_tasks(self, completed=None, order_by=None, created_before=None, due_from=None, due_before=None):
+        """
+        Get the tasks matching a filter, in a given order
+        
+        The filter and sort are pushed down to the storage when it supports
+        queries and the tasks have not been loaded into memory. Otherwise
+        plain status filters are read off the task table, and ordered views
+        and date ranges off sorted indexes, so they cost O(log n + k) for k
+        matching tasks.
+        
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+            order_by (str, optional): "priority", "due_date" or "created_at";
+                insertion order if omitted
+            created_before (str, optional): Only tasks created before this
+                ISO date
+            due_from (str, optional): Only tasks due on or after this ISO date
+            due_before (str, optional): Only tasks due before this ISO date
+        
+        Returns:
+            list: List of matching tasks
+        """
+        self._refresh()
+        
+        if self._can_query_storage():
+            return self.storage.query_tasks(completed, order_by, created_before, due_from, due_before)
+        
+        if order_by is None and created_before is None and due_from is None and due_before is None:
+            # Plain filters run on the columns of the task table
+            task_ids = self._task_table().query(completed)
+            return [self._tasks_by_id[task_id] for task_id in task_ids]
+        
+        # Take the matching slice of one sorted index, then check any other
+        # conditions on just those tasks
+        if due_from is not None or due_before is not None:
+            index_name = "due_date"
+            task_ids = self._sorted_index(index_name).between(*self._due_range(due_from, due_before))
+        elif created_before is not None:
+            index_name = "created_at"
+            task_ids = self._sorted_index(index_name).between(None, timestamp_key(created_before))
+        else:
+            index_name = order_by
+            task_ids = self._sorted_index(index_name).ids
+        
+        tasks = [self._tasks_by_id[task_id] for task_id in task_ids]
+        
+        if completed is not None:
+            tasks = [task for task in tasks if task["completed"] == completed]
+        
+        if created_before is not None and index_name != "created_at":
+            cutoff = timestamp_key(created_before)
+            tasks = [task for task in tasks if SORT_KEYS["created_at"](task) < cutoff]
+        
+        if order_by != index_name:
+            if order_by is None:
+                tasks.sort(key=lambda task: task["id"])
+            else:
+                sort_key = SORT_KEYS[order_by]
+                tasks.sort(key=lambda task: (sort_key(task), task["id"]))
+        
+        return tasks
+    
+    def page_tasks(self, completed=None, order_by=None, due_from=None, due_before=None, cursor=None, page_size=20):
+        """
+        Get one page of a task view
+        
+        Pages are found with keyset cursors (the sort key of the task at the
+        edge of the page) rather than offsets, so fetching any page costs
+        O(log n + page size), and tasks added or deleted elsewhere in the
+        view do not shift the page. Views are as for query_tasks(), except
+        that the default order is by ID.
+        
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+            order_by (str, optional): "priority", "due_date" or "created_at";
+                ID order if omitted
+            due_from (str, optional): Only tasks due on or after this ISO date
+            due_before (str, optional): Only tasks due before this ISO date
+            cursor (tuple, optional): Previous or next cursor returned with
+                another page of the same view; the first page if omitted
+            page_size (int, optional): Number of tasks per page
+        
+        Returns:
+            tuple: (tasks, previous cursor, next cursor); a cursor is None
+                when there is no page in that direction
+        """
+        self._refresh()
+        
+        entries = None
+        if self._can_query_storage() and hasattr(self.storage, "page_tasks"):
+            entries = self.storage.page_tasks(completed, order_by, due_from, due_before, cursor, page_size + 1)
+        elif order_by in (None, "id") and self._can_stream_storage():
+            entries = self._stream_page_entries(completed, due_from, due_before, cursor, page_size + 1)
+        
+        if entries is None:
+            entries = self._page_entries(completed, order_by, due_from, due_before, cursor, page_size + 1)
+        
+        # One extra task was fetched to tell whether there is another page
+        reverse = cursor is not None and cursor[0] == "before"
+        more = len(entries) > page_size
+        entries = entries[:page_size]
+        if reverse:
+            entries.reverse()
+        
+        if not entries:
+            return [], None, None
+        
+        previous_cursor = ("before", entries[0][0])
+        next_cursor = ("after", entries[-1][0])
+        if reverse:
+            previous_cursor = previous_cursor if more else None
+        else:
+            previous_cursor = previous_cursor if cursor is not None else None
+            next_cursor = next_cursor if more else None
+        
+        return [task for _, task in entries], previous_cursor, next_cursor
+    
+    def iter_tasks(self, completed=None):
+        """
+        Iterate over tasks without building a new list
+        
+        Tasks that have not been loaded into memory are streamed from the
+        storage one at a time instead.
+        
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+        
+        Returns:
+            iterator: Matching tasks in insertion order
+        """
+        self._refresh()
+        
+        if self._can_stream_storage():
+            return self.storage.iter_tasks(completed)
+        
+        if completed is None:
+            return iter(self.tasks)
+        
+        return (task for task in self.tasks if task["completed"] == completed)
+    
+    def count_tasks(self, completed=None):
+        """
+        Count tasks, optionally only completed or pending ones
+        
+        Args:
+            completed (bool, optional): Only count completed or pending tasks
+        
+        Returns:
+            int: Number of matching tasks
+        """
+        self._refresh()
+        
+        if self._can_query_storage():
+            return self.storage.count_tasks(completed)
+        
+        if self._can_stream_storage():
+            return sum(1 for _ in self.storage.iter_tasks(completed))
+        
+        if completed is None:
+            self._load()
+            return len(self._tasks_by_id)
+        
+        return self._task_table().count(completed)
+    
+    def search_tasks(self, keyword, substring=False):
+        """
+        Find tasks whose title, description or tags match a keyword
+        
+        By default every word of the keyword must be the start of a word in
+        the task, which is answered from the search index. With substring
+        set, the keyword may appear anywhere, which needs a full scan.
+        
+        Args:
+            keyword (str): Case-insensitive text to look for
+            substring (bool, optional): Match the keyword as a plain substring
+        
+        Returns:
+            list: List of matching tasks
+        """
+        self._refresh()
+        
+        if self._can_query_storage():
+            return self.storage.search_tasks(keyword)
+        
+        if not substring:
+            task_ids = self._search_index().search(keyword)
+            if task_ids is not None:
+                tasks_by_id = self._tasks_by_id
+                if tasks_by_id is None:
+                    # Pick the matches out of a stream of the stored tasks
+                    wanted = set(task_ids)
+                    tasks_by_id = {task["id"]: task for task in self.iter_tasks() if task["id"] in wanted}
+                return [tasks_by_id[task_id] for task_id in task_ids if task_id in tasks_by_id]
+        
+        keyword = keyword.lower()
+        
+        return [
+            task for task in self.iter_tasks()
+            if (keyword in task["title"].lower() or
+                keyword in task["description"].lower() or
+                any(keyword in tag.lower() for tag in task.get("tags", [])))
+        ]
+    
+    def stats(self):
+        """
+        Get task statistics without going through the tasks
+        
+        The counts are kept up to date by every change and saved alongside
+        the tasks, so this is cheap even for very large task lists.
+        
+        Returns:
+            dict: total, completed, pending, completion_rate (percent),
+                by_priority, by_tag, and the pending tasks that are overdue,
+                due_today, due_later or have no_due_date
+        """
+        self._refresh()
+        return self._task_stats().summary()
     
     def add_task(self, title, description="", due_date=None, priority="medium", tags=None):
         """
@@ -35,45 +316,54 @@ class TaskManager:
             due_date (str, optional): Due date in ISO format
             priority (str, optional): Task priority (low, medium, high)
             tags (list, optional): List of tags
-            
+        
         Returns:
             int: The ID of the new task
         """
-        # Generate a new task ID
-        task_id = self._generate_task_id()
-        
-        # Create timestamp
-        timestamp = datetime.now().isoformat()
-        
-        # Create new task
-        task = {
-            "id": task_id,
-            "title": title,
-            "description": description,
-            "completed": False,
-            "created_at": timestamp,
-            "updated_at": timestamp
-        }
-        
-        # Add optional fields
-        if due_date:
-            task["due_date"] = due_date
-        
-        if priority:
-            task["priority"] = priority
-            
-        if tags:
-            task["tags"] = tags
-        else:
-            task["tags"] = []
-        
-        # Add task to list
-        self.tasks.append(task)
-        
-        # Save tasks
-        self.storage.save_tasks(self.tasks)
-        
-        return task_id
+        with self._writing():
+            self._ensure_loaded()
+            
+            # Generate a new task ID
+            task_id = self._generate_task_id()
+            
+            # Create timestamp
+            timestamp = datetime.now().isoformat()
+            
+            # Create new task
+            task = Task({
+                "id": task_id,
+                "title": title,
+                "description": description,
+                "completed": False,
+                "created_at": timestamp,
+                "updated_at": timestamp
+            })
+            
+            # Add optional fields
+            if due_date:
+                task["due_date"] = due_date
+            
+            if priority:
+                task["priority"] = priority
+            
+            if tags:
+                task["tags"] = tags
+            else:
+                task["tags"] = []
+            
+            # Add task to list
+            if self._tasks_by_id is not None:
+                self._tasks_by_id[task_id] = task
+                if self._task_list is not None:
+                    self._task_list.append(task)
+                self._update_indexes(None, task)
+            elif self._transaction is not None:
+                self._transaction["staged"][task_id] = task
+            
+            # Save tasks
+            self._persist("add", task_id, task)
+            
+            return task_id
     
     def update_task(self, task_id, updated_task):
         """
@@ -82,30 +372,36 @@ class TaskManager:
         Args:
             task_id (int): ID of the task to update
             updated_task (dict): Dictionary containing updated task data
-            
+        
         Returns:
             bool: True if task was updated, False otherwise
         """
-        for i, task in enumerate(self.tasks):
-            if task["id"] == task_id:
-                # Keep the original ID and completion status
-                updated_task["id"] = task_id
-                
-                # Update timestamp
-                updated_task["updated_at"] = datetime.now().isoformat()
-                
-                # Keep creation timestamp
-                updated_task["created_at"] = task.get("created_at", updated_task.get("created_at", datetime.now().isoformat()))
-                
-                # Update task
-                self.tasks[i] = updated_task
-                
-                # Save tasks
-                self.storage.save_tasks(self.tasks)
-                
-                return True
-        
-        return False
+        with self._writing():
+            task = self.get_task_by_id(task_id)
+            if task is None:
+                return False
+            
+            # Keep the original ID and completion status
+            updated_task["id"] = task_id
+            
+            # Update timestamp
+            updated_task["updated_at"] = datetime.now().isoformat()
+            
+            # Keep creation timestamp
+            updated_task["created_at"] = task.get("created_at", updated_task.get("created_at", datetime.now().isoformat()))
+            
+            # Update task in place so its position in the list is unchanged
+            self._remember(task)
+            old_task = task.copy() if self._indexes else None
+            if updated_task is not task:
+                task.clear()
+                task.update(updated_task)
+            self._update_indexes(old_task, task)
+            
+            # Save tasks
+            self._persist("update", task_id, task)
+            
+            return True
     
     def toggle_task_status(self, task_id, completed=True):
         """
@@ -114,24 +410,31 @@ class TaskManager:
         Args:
             task_id (int): ID of the task to toggle
             completed (bool, optional): New completion status
-            
+        
         Returns:
             bool: True if task was updated, False otherwise
         """
-        for i, task in enumerate(self.tasks):
-            if task["id"] == task_id:
-                # Update completion status
-                self.tasks[i]["completed"] = completed
-                
-                # Update timestamp
-                self.tasks[i]["updated_at"] = datetime.now().isoformat()
-                
-                # Save tasks
-                self.storage.save_tasks(self.tasks)
-                
-                return True
-        
-        return False
+        with self._writing():
+            task = self.get_task_by_id(task_id)
+            if task is None:
+                return False
+            
+            # Update completion status
+            self._remember(task)
+            old_task = task.copy() if self._indexes else None
+            task["completed"] = completed
+            
+            # Update timestamp
+            task["updated_at"] = datetime.now().isoformat()
+            self._update_indexes(old_task, task)
+            
+            # Save tasks
+            self._persist("set", task_id, {
+                "completed": completed,
+                "updated_at": task["updated_at"]
+            })
+            
+            return True
     
     def delete_task(self, task_id):
         """
@@ -139,29 +442,714 @@ class TaskManager:
         
         Args:
             task_id (int): ID of the task to delete
-            
+        
         Returns:
             bool: True if task was deleted, False otherwise
         """
-        for i, task in enumerate(self.tasks):
-            if task["id"] == task_id:
-                # Delete task
-                del self.tasks[i]
+        with self._writing():
+            if not self._remove(task_id):
+                return False
+            
+            # Save tasks
+            self._persist("delete", task_id)
+            
+            return True
+    
+    def add_tasks(self, tasks):
+        """
+        Add many tasks at once
+        
+        The IDs are handed out as one block and all the tasks are written in
+        a single step.
+        
+        Args:
+            tasks (iterable): Fields of each task: a title, and optionally a
+                description, completed, due_date, priority, tags, created_at
+                and updated_at (already validated)
+        
+        Returns:
+            list: IDs of the new tasks, in order
+        """
+        tasks = list(tasks)
+        if not tasks:
+            return []
+        
+        timestamp = datetime.now().isoformat()
+        
+        with self.transaction():
+            self._ensure_loaded()
+            first_id = self._generate_task_id(len(tasks))
+            
+            for task_id, fields in enumerate(tasks, first_id):
+                task = Task({
+                    "id": task_id,
+                    "title": fields["title"],
+                    "description": fields.get("description", ""),
+                    "completed": fields.get("completed", False),
+                    "created_at": fields.get("created_at") or timestamp,
+                    "updated_at": fields.get("updated_at") or timestamp
+                })
+                
+                if fields.get("due_date"):
+                    task["due_date"] = fields["due_date"]
+                task["priority"] = fields.get("priority") or "medium"
+                task["tags"] = fields.get("tags") or []
+                
+                if self._tasks_by_id is not None:
+                    self._tasks_by_id[task_id] = task
+                    if self._task_list is not None:
+                        self._task_list.append(task)
+                    self._update_indexes(None, task)
+                else:
+                    self._transaction["staged"][task_id] = task
+                self._persist("add", task_id, task)
+        
+        return list(range(first_id, first_id + len(tasks)))
+    
+    def set_status(self, task_ids, completed=True):
+        """
+        Set the completion status of many tasks at once
+        
+        Args:
+            task_ids (iterable): IDs of the tasks to update
+            completed (bool, optional): New completion status
+        
+        Returns:
+            int: Number of tasks updated
+        """
+        timestamp = datetime.now().isoformat()
+        count = 0
+        
+        with self.transaction():
+            for task_id in task_ids:
+                task = self.get_task_by_id(task_id)
+                if task is None:
+                    continue
+                
+                self._remember(task)
+                old_task = task.copy() if self._indexes else None
+                task["completed"] = completed
+                task["updated_at"] = timestamp
+                self._update_indexes(old_task, task)
+                self._persist("set", task_id, {
+                    "completed": completed,
+                    "updated_at": timestamp
+                })
+                count += 1
+        
+        return count
+    
+    def delete_tasks(self, task_ids):
+        """
+        Delete many tasks at once
+        
+        Args:
+            task_ids (iterable): IDs of the tasks to delete
+        
+        Returns:
+            int: Number of tasks deleted
+        """
+        count = 0
+        
+        with self.transaction():
+            for task_id in set(task_ids):
+                if not self._remove(task_id):
+                    continue
                 
-                # Save tasks
-                self.storage.save_tasks(self.tasks)
+                self._persist("delete", task_id)
+                count += 1
+        
+        return count
+    
+    def save(self):
+        """
+        Make sure every change is on disk
+        
+        Storages that persist each mutation as it happens only need their
+        journal compacted when it has grown too large. Journal writes held
+        back by write-behind are written out first.
+        
+        Returns:
+            bool: True if the tasks were saved, False otherwise
+        """
+        with self._writing(load=False):
+            saved = True
+            if hasattr(self.storage, "flush"):
+                saved = self.storage.flush()
+            
+            # Nothing can have changed if the tasks were never loaded
+            if self._tasks_by_id is not None:
+                if self._next_id is not None:
+                    self.storage.next_id = self._next_id
+                
+                if not self.storage.journal or self.storage.needs_compaction():
+                    saved = self.storage.save_tasks(self.tasks)
+            
+            # Keep the search index and statistics for the next run if they changed
+            for name in ("search", "stats"):
+                index = self._indexes.get(name)
+                if saved and index is not None and index.dirty and hasattr(self.storage, "stamp"):
+                    index.save(self._index_filename(name), self.storage.stamp())
+            
+            return saved
+    
+    def compact(self):
+        """
+        Fold the journal into a fresh snapshot now, rather than once it has
+        grown large, so a file that just lost many tasks shrinks straight away
+        
+        Returns:
+            bool: True if the tasks were saved, False otherwise
+        """
+        # Storages without a journal have nothing to fold, and neither do
+        # those that change single tasks in place (SQLite, shards, records)
+        if not getattr(self.storage, "journal", False) or hasattr(self.storage, "get_task"):
+            return True
+        
+        with self._writing():
+            if self._next_id is not None:
+                self.storage.next_id = self._next_id
+            
+            return self.storage.save_tasks(self.tasks)
+    
+    def start_write_behind(self):
+        """
+        Write changes from a background thread instead of as they are made
+        
+        Bursts of changes (such as a bulk action, or edits made in quick
+        succession in interactive mode) are then written together a moment
+        later. save() writes out anything still waiting.
+        
+        Returns:
+            bool: True if the storage supports write-behind, False otherwise
+        """
+        if not hasattr(self.storage, "start_write_behind"):
+            return False
+        
+        self.storage.start_write_behind()
+        return True
+    
+    def write_metrics(self):
+        """
+        Get counts of the storage writes made so far
+        
+        Returns:
+            dict: As for Storage.write_metrics(), or None if the storage
+                does not keep them
+        """
+        if not hasattr(self.storage, "write_metrics"):
+            return None
+        
+        return self.storage.write_metrics()
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Group several mutations into a single save
+        
+        Mutations made inside the block are applied in memory straight away
+        but only written to storage once, when the block exits. If the block
+        raises, every change made inside it is rolled back. Nested
+        transactions join the outermost one. Other processes are locked out
+        of the storage until the block exits. If the changes cannot be
+        written, they are rolled back and StorageError is raised.
+        
+        Usage:
+            with task_manager.transaction():
+                task_manager.toggle_task_status(1)
+                task_manager.delete_task(2)
+        """
+        if self._transaction is not None:
+            yield self
+            return
+        
+        with self._writing():
+            self._transaction = {
+                "records": [],
+                # Tasks read or changed in the transaction while the tasks
+                # are not loaded, by ID (None once deleted), so later
+                # lookups see changes not yet written to storage
+                "staged": {},
+                "originals": {},
+                "tasks_by_id": dict(self._tasks_by_id) if self._tasks_by_id is not None else None,
+                "next_id": self._next_id
+            }
+            
+            try:
+                yield self
+            except BaseException:
+                self._rollback()
+                raise
+            else:
+                if not self._commit():
+                    # Nothing was written, so nothing may stay changed in memory
+                    self._rollback()
+                    raise StorageError("The changes could not be saved")
+            finally:
+                self._transaction = None
+    
+    def _load(self):
+        """Load every task from storage, if not done already"""
+        if self._tasks_by_id is not None:
+            return
+        
+        # Only kept once every task is read, so a storage that cannot be
+        # read is not taken to have no tasks
+        tasks_by_id = {}
+        for task in self.storage.load_tasks():
+            tasks_by_id[task["id"]] = task if type(task) is Task else Task(task)
+        
+        self._tasks_by_id = tasks_by_id
+        self._task_list = None
+        
+        # Indexes kept from a stream of an older version are out of date
+        read_stamp = getattr(self.storage, "read_stamp", None)
+        if self._stamp is not None and self._stamp != read_stamp:
+            self._indexes = {}
+        self._stamp = read_stamp
+        
+        # Older data files have no counter, so fall back to the highest ID
+        if self._next_id is None:
+            self._next_id = self.storage.next_id
+        if self._next_id is None:
+            self._next_id = max(self._tasks_by_id, default=0) + 1
+    
+    def _ensure_loaded(self):
+        """Load every task unless the storage can work on single tasks"""
+        if not hasattr(self.storage, "get_task"):
+            self._load()
+    
+    def _search_index(self):
+        """Get the search index, loading or building it on first use"""
+        index = self._indexes.get("search")
+        if index is not None:
+            return index
+        
+        from search_index import SearchIndex
+        
+        return self._saved_index("search", SearchIndex)
+    
+    def _task_table(self):
+        """Get the columnar task table, building it on first use"""
+        table = self._indexes.get("table")
+        if table is None:
+            from task_table import TaskTable
+            
+            table = self._indexes["table"] = TaskTable.build(self.tasks)
+        
+        return table
+    
+    def _due_range(self, due_from, due_before):
+        """Due-date sort key range of a due_from / due_before filter"""
+        return (
+            due_key(due_from) if due_from else None,
+            due_key(due_before) if due_before else BAD_DUE_DATE
+        )
+    
+    def _page_entries(self, completed, order_by, due_from, due_before, cursor, limit):
+        """page_tasks() over the loaded tasks, walking a sorted index"""
+        index = self._sorted_index(order_by or "id")
+        
+        # A due-date range either bounds the walk or is checked per task
+        low = high = None
+        due_range = None
+        if due_from is not None or due_before is not None:
+            if order_by == "due_date":
+                low, high = self._due_range(due_from, due_before)
+            else:
+                due_range = self._due_range(due_from, due_before)
+        
+        entries = []
+        reverse = cursor is not None and cursor[0] == "before"
+        for key, task_id in index.walk(cursor[1] if cursor else None, reverse, low, high):
+            task = self._tasks_by_id[task_id]
+            
+            if completed is not None and task["completed"] != completed:
+                continue
+            
+            if due_range is not None and not self._in_due_range(task, due_range):
+                continue
+            
+            entries.append(((key, task_id), task))
+            if len(entries) == limit:
+                break
+        
+        return entries
+    
+    def _stream_page_entries(self, completed, due_from, due_before, cursor, limit):
+        """
+        page_tasks() in ID order, read off a stream of the stored tasks
+        
+        Tasks are stored in the order they were added, which is ID order, so
+        the first pages come straight off the start of the stream without
+        loading every task. Pages further in give up after STREAM_PAGE_SCAN
+        tasks, since loading once is cheaper than rescanning for every page.
+        Keys match the in-memory ID index, so cursors stay valid either way.
+        
+        Returns:
+            list: (key, task) entries as for _page_entries(), or None if the
+                page was too far into the stream
+        """
+        due_range = None
+        if due_from is not None or due_before is not None:
+            due_range = self._due_range(due_from, due_before)
+        
+        reverse = cursor is not None and cursor[0] == "before"
+        cursor_id = cursor[1][1] if cursor is not None else None
+        
+        # Walking backwards keeps the last matches before the cursor
+        entries = deque(maxlen=limit) if reverse else []
+        for scanned, task in enumerate(self.storage.iter_tasks(completed)):
+            if scanned == STREAM_PAGE_SCAN:
+                return None
+            
+            task_id = task["id"]
+            
+            if cursor_id is not None:
+                if reverse and task_id >= cursor_id:
+                    break
+                if not reverse and task_id <= cursor_id:
+                    continue
+            
+            if due_range is not None and not self._in_due_range(task, due_range):
+                continue
+            
+            entries.append(((0, task_id), task))
+            if not reverse and len(entries) == limit:
+                break
+        
+        entries = list(entries)
+        if reverse:
+            entries.reverse()
+        
+        return entries
+    
+    def _in_due_range(self, task, due_range):
+        """Check a task against a range from _due_range()"""
+        due = SORT_KEYS["due_date"](task)
+        low, high = due_range
+        return (low is None or due >= low) and due < high
+    
+    def _sorted_index(self, name):
+        """Get the tasks sorted by "priority", "due_date" or "created_at", building the index on first use"""
+        index = self._indexes.get(f"by_{name}")
+        if index is None:
+            from sorted_index import SortedIndex
+            
+            index = self._indexes[f"by_{name}"] = SortedIndex.build(SORT_KEYS[name], self.tasks)
+        
+        return index
+    
+    def _task_stats(self):
+        """Get the running task statistics, loading or counting them on first use"""
+        stats = self._indexes.get("stats")
+        if stats is not None:
+            return stats
+        
+        from task_stats import TaskStats
+        
+        # Storages that change single tasks without loading them all (SQLite)
+        # would leave kept counts behind, so they are counted afresh, unless
+        # the storage keeps counts of its own (shards)
+        if self._can_query_storage():
+            if hasattr(self.storage, "task_stats"):
+                return self.storage.task_stats()
+            return TaskStats.build(self.iter_tasks())
+        
+        return self._saved_index("stats", TaskStats)
+    
+    def _load_saved_stats(self):
+        """
+        Load the statistics saved for the current tasks before a change, so
+        the change keeps them up to date and save() writes them back instead
+        of the next --stats counting every task again
+        """
+        if "stats" in self._indexes or self._tasks_by_id is None or not hasattr(self.storage, "stamp"):
+            return
+        
+        from task_stats import TaskStats
+        
+        stats = TaskStats.load(self._index_filename("stats"), self.storage.stamp())
+        if stats is not None:
+            self._indexes["stats"] = stats
+    
+    def _saved_index(self, name, cls):
+        """
+        Load an index saved for the current tasks, or build it from them
+        
+        Args:
+            name (str): Index name, also used for its file
+            cls (type): Index class, with load() and build()
+        
+        Returns:
+            object: The index, now kept up to date with every mutation
+        """
+        index = None
+        stamp = None
+        if hasattr(self.storage, "stamp"):
+            stamp = self.storage.stamp()
+            index = cls.load(self._index_filename(name), stamp)
+        if index is None:
+            index = cls.build(self.iter_tasks())
+            if self._tasks_by_id is None:
+                stamp = getattr(self.storage, "read_stamp", None)
+        
+        # Indexes built without loading the tasks still need to notice
+        # changes from other processes
+        if self._stamp is None:
+            self._stamp = stamp
+        
+        self._indexes[name] = index
+        return index
+    
+    def _index_filename(self, name):
+        """File a derived index is saved to, next to the task storage"""
+        return f"{self.storage.filename}.{name}"
+    
+    def _update_indexes(self, old_task, new_task):
+        """
+        Keep the derived indexes in step with a mutation
+        
+        Args:
+            old_task (dict): Task before the change, None if it was added
+            new_task (dict): Task after the change, None if it was deleted
+        """
+        for index in self._indexes.values():
+            if old_task is None:
+                index.add(new_task)
+            elif new_task is None:
+                index.remove(old_task)
+            else:
+                index.update(old_task, new_task)
+    
+    @contextmanager
+    def _writing(self, load=True):
+        """
+        Hold the storage lock for a mutation
+        
+        Changes other processes made are read in first, so the mutation is
+        applied on top of the latest tasks instead of overwriting them.
+        Mutations inside a transaction already hold the lock.
+        
+        Args:
+            load (bool, optional): Load the tasks before taking the lock, so
+                that other processes only wait while the changes made in the
+                meantime are read
+        """
+        if self._transaction is not None or not hasattr(self.storage, "lock"):
+            yield
+            return
+        
+        if load:
+            self._refresh()
+            self._ensure_loaded()
+        
+        with self.storage.lock():
+            self._refresh()
+            self._load_saved_stats()
+            try:
+                yield
+            finally:
+                # Everything on disk is now also in memory
+                self._stamp = self.storage.stamp()
+    
+    def _refresh(self):
+        """
+        Catch up with changes other processes made to the storage
+        
+        Journal records appended since the tasks were read are replayed
+        onto them; if the snapshot was rewritten, everything in memory is
+        dropped and read again on next use.
+        """
+        if self._stamp is None or self._transaction is not None:
+            return
+        
+        if self.storage.stamp() == self._stamp:
+            return
+        
+        changes = None
+        if self._tasks_by_id is not None:
+            changes = self.storage.changes_since(self._stamp)
+        
+        if changes is None:
+            self._tasks_by_id = None
+            self._task_list = None
+            self._next_id = None
+            self._indexes = {}
+            self._stamp = None
+            return
+        
+        records, self._stamp = changes
+        self._replay(records)
+    
+    def _replay(self, records):
+        """Apply journal records written by another process to the loaded tasks"""
+        for record in records:
+            op = record.get("op")
+            task_id = record.get("id")
+            task = self._tasks_by_id.get(task_id)
+            
+            if op in ("add", "update"):
+                new_task = Task(record["fields"])
+                self._tasks_by_id[task_id] = new_task
+                self._update_indexes(task, new_task)
                 
-                return True
+                if self._next_id is not None and task_id >= self._next_id:
+                    self._next_id = task_id + 1
+            elif op == "set" and task is not None:
+                old_task = task.copy() if self._indexes else None
+                task.update(record["fields"])
+                self._update_indexes(old_task, task)
+            elif op == "delete" and task is not None:
+                del self._tasks_by_id[task_id]
+                self._update_indexes(task, None)
+        
+        self._task_list = None
+    
+    def _can_query_storage(self):
+        """Check whether a query can be answered by the storage directly"""
+        return (self._tasks_by_id is None and self._transaction is None and
+                hasattr(self.storage, "query_tasks"))
+    
+    def _can_stream_storage(self):
+        """Check whether tasks can be streamed from the storage directly"""
+        return (self._tasks_by_id is None and self._transaction is None and
+                hasattr(self.storage, "iter_tasks"))
+    
+    def _remove(self, task_id):
+        """Remove a task from memory, checking that it exists"""
+        self._ensure_loaded()
+        
+        if self._tasks_by_id is None:
+            exists = self._get_unloaded_task(task_id) is not None
+            if self._transaction is not None:
+                self._transaction["staged"][task_id] = None
+            return exists
+        
+        task = self._tasks_by_id.pop(task_id, None)
+        if task is None:
+            return False
+        
+        # The task list is rebuilt lazily the next time it is needed
+        self._task_list = None
+        self._update_indexes(task, None)
         
-        return False
+        return True
     
-    def _generate_task_id(self):
-        """Generate a unique task ID"""
-        if not self.tasks:
-            return 1
+    def _get_unloaded_task(self, task_id):
+        """
+        Get a task from a storage that reads single tasks
+
+        Inside a transaction the task is kept and handed out again on later
+        lookups, so changes made to it earlier in the transaction are seen
+        before they are written.
+        """
+        if self._transaction is None:
+            return self.storage.get_task(task_id)
+        
+        staged = self._transaction["staged"]
+        if task_id not in staged:
+            staged[task_id] = self.storage.get_task(task_id)
+        
+        return staged[task_id]
+    
+    def _remember(self, task):
+        """Keep a copy of a task before it is first changed in a transaction"""
+        if self._transaction is None or self._transaction["tasks_by_id"] is None:
+            return
+        
+        originals = self._transaction["originals"]
+        if task["id"] in self._transaction["tasks_by_id"] and task["id"] not in originals:
+            originals[task["id"]] = task.copy()
+    
+    def _commit(self):
+        """
+        Write every mutation staged by the open transaction
+        
+        Returns:
+            bool: True if the mutations were written, False otherwise
+        """
+        records = self._transaction["records"]
+        if not records:
+            return True
+        
+        if self._next_id is not None:
+            self.storage.next_id = self._next_id
+        
+        if not self.storage.journal:
+            return self.storage.save_tasks(self.tasks)
+        
+        if self._tasks_by_id is not None and self.storage.prefers_snapshot(len(records), len(self._tasks_by_id)):
+            return self.storage.save_tasks(self.tasks)
         
-        # Find the highest ID
-        max_id = max(task["id"] for task in self.tasks)
+        if not self.storage.record_many(records):
+            return False
         
-        # Return the next ID
-        return max_id + 1
\ No newline at end of file
+        if self._tasks_by_id is not None and self.storage.needs_compaction():
+            self.storage.save_tasks(self.tasks)
+        
+        return True
+    
+    def _rollback(self):
+        """Undo every mutation made in the open transaction"""
+        self._tasks_by_id = self._transaction["tasks_by_id"]
+        self._task_list = None
+        self._next_id = self._transaction["next_id"]
+        
+        # Derived indexes are rebuilt from the restored tasks when next used
+        self._indexes = {}
+        
+        for task_id, original in self._transaction["originals"].items():
+            task = self._tasks_by_id[task_id]
+            task.clear()
+            task.update(original)
+    
+    def _persist(self, op, task_id, fields=None):
+        """
+        Persist a single mutation
+        
+        In journal mode only the mutation itself is appended to disk, and the
+        journal is compacted into a fresh snapshot once it grows too large.
+        Otherwise the whole task list is rewritten.
+        
+        Args:
+            op (str): Journal operation ("add", "update", "set" or "delete")
+            task_id (int): ID of the affected task
+            fields (dict, optional): Task data recorded with the operation
+        """
+        if self._transaction is not None:
+            self._transaction["records"].append((op, task_id, fields))
+            return
+        
+        if self._next_id is not None:
+            self.storage.next_id = self._next_id
+        
+        if not self.storage.journal:
+            self.storage.save_tasks(self.tasks)
+            return
+        
+        self.storage.record(op, task_id, fields)
+        
+        if self._tasks_by_id is not None and self.storage.needs_compaction():
+            self.storage.save_tasks(self.tasks)
+    
+    def _generate_task_id(self, count=1):
+        """Generate a unique task ID, or the first of count consecutive ones"""
+        if hasattr(self.storage, "allocate_ids"):
+            # The storage hands out IDs itself, so that processes adding
+            # tasks at the same time never get the same one
+            task_id = self.storage.allocate_ids(count)
+            self._next_id = self.storage.next_id
+            return task_id
+        
+        if self._next_id is None:
+            self._next_id = self.storage.next_id
+        if self._next_id is None:
+            self._load()
+        
+        task_id = self._next_id
+        
+        # IDs are never reused, even after the highest task is deleted
+        self._next_id += count
+        
+        return task_id
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Task Model Module - Compact in-memory representation of a task
+"""
+import sys
+from collections.abc import MutableMapping
+from datetime import date, datetime, timedelta
+
+# Known task fields, in the order they are written out
+FIELDS = ("id", "title", "description", "completed", "created_at", "updated_at", "due_date", "priority", "tags")
+FIELD_SET = frozenset(FIELDS)
+
+# Marks an unset field in the tuples made by Task.to_row()
+ABSENT = ...
+
+# Sort order of the priorities, most urgent first
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+# Timestamps are kept as whole microseconds since this (naive) epoch
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+def pack_timestamp(value):
+    """
+    Turn an ISO timestamp into microseconds since EPOCH
+
+    Args:
+        value (str): Timestamp as written by datetime.isoformat()
+
+    Returns:
+        int: Microseconds since EPOCH, or the value unchanged if it would
+            not be written back exactly the same (time zones, other formats)
+    """
+    if type(value) is str and len(value) in (19, 26) and value[10:11] == "T" and value[19:20] in ("", "."):
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+
+        # isoformat() drops the fraction when it is zero
+        if moment.tzinfo is None and (len(value) == 26) == bool(moment.microsecond):
+            return (moment - EPOCH) // MICROSECOND
+
+    return value
+
+def unpack_timestamp(value):
+    """Turn a value stored by pack_timestamp() back into an ISO timestamp"""
+    if type(value) is int:
+        return (EPOCH + timedelta(microseconds=value)).isoformat()
+    return value
+
+def intern_value(value):
+    """Share one copy of a frequently repeated string"""
+    return sys.intern(value) if type(value) is str else value
+
+def pack_tags(tags):
+    """Store tags as a tuple of shared strings"""
+    return tuple(intern_value(tag) for tag in tags) if tags else ()
+
+# How each field is converted on the way in and out of a Task; fields not
+# listed are stored as they are
+PACKERS = {
+    "created_at": pack_timestamp,
+    "updated_at": pack_timestamp,
+    "due_date": intern_value,
+    "priority": intern_value,
+    "tags": pack_tags
+}
+UNPACKERS = {
+    "created_at": unpack_timestamp,
+    "updated_at": unpack_timestamp,
+    "tags": list
+}
+
+# Sort keys for tasks without a due date (last) or with an unreadable one
+NO_DUE_DATE = 2 ** 62
+BAD_DUE_DATE = NO_DUE_DATE - 1
+
+# Sort key for tasks without a creation time (first, like an empty string)
+NO_TIMESTAMP = -2 ** 62
+
+def due_key(value):
+    """Turn a due date into its day number, for sorting"""
+    if not value:
+        return NO_DUE_DATE
+
+    try:
+        return date.fromisoformat(value[:10]).toordinal()
+    except (TypeError, ValueError):
+        return BAD_DUE_DATE
+
+def timestamp_key(value):
+    """Turn an ISO timestamp or date into microseconds since EPOCH, for filtering and sorting"""
+    if not value:
+        return NO_TIMESTAMP
+
+    packed = pack_timestamp(value)
+    if type(packed) is int:
+        return packed
+
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return NO_TIMESTAMP
+
+    return (moment.replace(tzinfo=None) - EPOCH) // MICROSECOND
+
+def priority_sort_key(task):
+    """Integer sort key of a task's priority, most urgent first"""
+    return PRIORITY_RANK.get(task.get("priority", "medium"), 1)
+
+def due_date_sort_key(task):
+    """Integer sort key of a task's due date, tasks without one last"""
+    return due_key(task.get("due_date"))
+
+def created_at_sort_key(task):
+    """Integer sort key of a task's creation time"""
+    # Task objects already hold the creation time packed as an integer
+    created = getattr(task, "created_at", None)
+    if type(created) is int:
+        return created
+    return timestamp_key(task.get("created_at"))
+
+def id_sort_key(task):
+    """Sort key for ID order: every task ties, so ties fall back to the ID"""
+    return 0
+
+# Sort key function for each order_by choice of TaskManager.query_tasks
+SORT_KEYS = {
+    "id": id_sort_key,
+    "priority": priority_sort_key,
+    "due_date": due_date_sort_key,
+    "created_at": created_at_sort_key
+}
+
+class Task(MutableMapping):
+    """
+    A task, stored in slots instead of a per-task dict
+
+    Tasks behave like the dicts they replace (task["title"], task.get(...),
+    "due_date" in task, copy(), update(), ...), so the rest of the code does
+    not change. Internally timestamps are packed into integers and repeated
+    values such as priorities, due dates and tags are interned, so large
+    task lists take far less memory. Convert with dict(task) or to_dict()
+    where plain data is needed, such as when writing JSON.
+
+    Optional fields that are absent are simply left unset, so they raise
+    KeyError like a missing dict key. Unknown fields go to a small dict.
+    """
+
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, fields=None):
+        """
+        Initialize the task
+
+        Args:
+            fields (dict, optional): Task fields to copy in
+        """
+        self._extra = None
+        if fields:
+            for key, value in fields.items():
+                self[key] = value
+
+    def __getitem__(self, key):
+        if key in FIELD_SET:
+            try:
+                value = getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+
+            unpack = UNPACKERS.get(key)
+            return value if unpack is None else unpack(value)
+
+        if self._extra is None or key not in self._extra:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in FIELD_SET:
+            pack = PACKERS.get(key)
+            setattr(self, key, value if pack is None else pack(value))
+            return
+
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+            return
+
+        if self._extra is None or key not in self._extra:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __iter__(self):
+        for key in FIELDS:
+            if hasattr(self, key):
+                yield key
+
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        if key in FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __repr__(self):
+        return f"Task({self.to_dict()!r})"
+
+    def get(self, key, default=None):
+        """Get a field, or default if the task does not have it"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def clear(self):
+        """Remove every field"""
+        for key in FIELDS:
+            if hasattr(self, key):
+                delattr(self, key)
+        self._extra = None
+
+    def copy(self):
+        """
+        Copy the task without unpacking its fields
+
+        Returns:
+            Task: A new task with the same fields
+        """
+        task = Task()
+        for key in FIELDS:
+            try:
+                setattr(task, key, getattr(self, key))
+            except AttributeError:
+                pass
+
+        if self._extra:
+            task._extra = dict(self._extra)
+
+        return task
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Rebuild a task from a tuple made by to_row()
+        
+        Args:
+            row (tuple): Stored field values in FIELDS order, then the extra fields
+        
+        Returns:
+            Task: The task
+        """
+        task = cls.__new__(cls)
+        
+        # One unpacking assignment is much quicker than setting slots one by one
+        (task.id, task.title, task.description, task.completed, task.created_at,
+         task.updated_at, task.due_date, task.priority, task.tags, task._extra) = row
+        
+        if ABSENT in row:
+            for key, value in zip(FIELDS, row):
+                if value is ABSENT:
+                    delattr(task, key)
+        
+        return task
+
+    def to_row(self):
+        """
+        Get the stored (packed) field values as a plain tuple
+        
+        Returns:
+            tuple: Values in FIELDS order, ABSENT for unset fields, then the
+                extra fields (or None)
+        """
+        return tuple(getattr(self, key, ABSENT) for key in FIELDS) + (self._extra,)
+
+    def to_dict(self):
+        """
+        Convert the task into a plain dict
+
+        Returns:
+            dict: Task fields, as stored in tasks.json
+        """
+        task = {}
+        for key in FIELDS:
+            try:
+                value = getattr(self, key)
+            except AttributeError:
+                continue
+            unpack = UNPACKERS.get(key)
+            task[key] = value if unpack is None else unpack(value)
+
+        if self._extra:
+            task.update(self._extra)
+
+        return task
+
+def json_default(value):
+    """json.dump() fallback that writes Task objects out as plain JSON objects"""
+    if isinstance(value, Task):
+        return value.to_dict()
+    return dict(value)
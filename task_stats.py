@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Task Stats Module - Running totals of the tasks, kept up to date by every change
+"""
+import os
+import json
+from collections import Counter
+from datetime import date
+
+# Bump when the on-disk layout changes so old stats files are rebuilt
+STATS_VERSION = 1
+
+class TaskStats:
+    """
+    Aggregate counts of the tasks: by status, priority, tag and due date
+
+    Every add, update and delete adjusts the counts directly, so reading
+    them never needs a pass over the tasks. Pending tasks are counted per
+    due date; the overdue / due today buckets are worked out from those
+    counts when asked for, since they depend on the current date.
+    """
+
+    def __init__(self, counts=None):
+        """
+        Initialize the counts
+
+        Args:
+            counts (dict, optional): Counts saved by save()
+        """
+        counts = counts or {}
+        self.total = counts.get("total", 0)
+        self.completed = counts.get("completed", 0)
+        self.by_priority = Counter(counts.get("by_priority", {}))
+        self.by_tag = Counter(counts.get("by_tag", {}))
+
+        # Pending tasks per due date (ISO date, "" for no due date)
+        self.pending_by_due = Counter(counts.get("pending_by_due", {}))
+
+        # Whether the counts changed since they were loaded or saved
+        self.dirty = False
+
+    @classmethod
+    def build(cls, tasks):
+        """
+        Count a list of tasks
+
+        Args:
+            tasks (iterable): Tasks to count
+
+        Returns:
+            TaskStats: The counts
+        """
+        stats = cls()
+        for task in tasks:
+            stats.add(task)
+        return stats
+
+    @classmethod
+    def load(cls, filename, stamp):
+        """
+        Load saved counts if they were saved for the same version of the tasks
+
+        Args:
+            filename (str): Stats file
+            stamp (tuple): Current version stamp of the task storage
+
+        Returns:
+            TaskStats: The saved counts, or None if missing or stale
+        """
+        try:
+            with open(filename, 'r') as file:
+                data = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if data.get("version") != STATS_VERSION or tuple(data.get("stamp") or ()) != stamp:
+            return None
+
+        return cls(data["counts"])
+
+    def save(self, filename, stamp):
+        """
+        Save the counts next to the task storage
+
+        Args:
+            filename (str): Stats file
+            stamp (tuple): Version stamp of the tasks the counts are for
+
+        Returns:
+            bool: True if the counts were saved, False otherwise
+        """
+        try:
+            temp_filename = f"{filename}.tmp"
+            with open(temp_filename, 'w') as file:
+                json.dump({
+                    "version": STATS_VERSION,
+                    "stamp": list(stamp),
+                    "counts": self.counts()
+                }, file)
+            os.replace(temp_filename, filename)
+
+            self.dirty = False
+            return True
+        except OSError as e:
+            print(f"Error saving task statistics: {e}")
+            return False
+
+    def counts(self):
+        """
+        Get the raw counts, as saved by save()
+
+        Returns:
+            dict: Counts that TaskStats(counts) or merge() read back
+        """
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "by_priority": dict(self.by_priority),
+            "by_tag": dict(self.by_tag),
+            "pending_by_due": dict(self.pending_by_due)
+        }
+
+    def merge(self, counts):
+        """
+        Add in the counts of another set of tasks
+
+        Args:
+            counts (dict): Counts returned by counts()
+        """
+        self.total += counts["total"]
+        self.completed += counts["completed"]
+        self.by_priority.update(counts["by_priority"])
+        self.by_tag.update(counts["by_tag"])
+        self.pending_by_due.update(counts["pending_by_due"])
+
+    def add(self, task):
+        """Count a new task"""
+        self._count(task, 1)
+
+    def remove(self, task):
+        """Stop counting a deleted task"""
+        self._count(task, -1)
+
+    def update(self, old_task, new_task):
+        """Move a changed task to its new buckets"""
+        self._count(old_task, -1)
+        self._count(new_task, 1)
+
+    def summary(self, today=None):
+        """
+        Get the counts as a plain dict
+
+        Args:
+            today (date, optional): Date to work out overdue tasks against;
+                today if omitted
+
+        Returns:
+            dict: total, completed, pending, completion_rate (percent),
+                by_priority, by_tag, and the pending tasks that are overdue,
+                due_today, due_later or have no_due_date
+        """
+        today = (today or date.today()).isoformat()
+
+        buckets = {"overdue": 0, "due_today": 0, "due_later": 0, "no_due_date": 0}
+        for due_date, count in self.pending_by_due.items():
+            if not due_date:
+                buckets["no_due_date"] += count
+            elif due_date < today:
+                buckets["overdue"] += count
+            elif due_date == today:
+                buckets["due_today"] += count
+            else:
+                buckets["due_later"] += count
+
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "pending": self.total - self.completed,
+            "completion_rate": self.completed / self.total * 100 if self.total else 0.0,
+            "by_priority": dict(self.by_priority.most_common()),
+            "by_tag": dict(self.by_tag.most_common()),
+            **buckets
+        }
+
+    def _count(self, task, change):
+        """Add change (1 or -1) to every bucket a task falls in"""
+        self.total += change
+
+        completed = bool(task["completed"])
+        if completed:
+            self.completed += change
+
+        self._bump(self.by_priority, task.get("priority") or "medium", change)
+
+        for tag in set(task.get("tags", ())):
+            self._bump(self.by_tag, tag, change)
+
+        if not completed:
+            self._bump(self.pending_by_due, (task.get("due_date") or "")[:10], change)
+
+        self.dirty = True
+
+    @staticmethod
+    def _bump(counter, key, change):
+        """Change one count, dropping it once it reaches zero"""
+        count = counter[key] + change
+        if count:
+            counter[key] = count
+        else:
+            del counter[key]
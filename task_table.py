@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Task Table Module - Column-oriented copy of the completed flag, for status filters and counts
+
+The table answers the unordered views (all, pending, completed) and the
+task counts. Ordered views, date ranges and "created before" filters are
+answered by the sorted indexes in sorted_index.py instead.
+"""
+from array import array
+from bisect import bisect_left
+from itertools import compress
+
+# NumPy is optional: with it, filters and counts run as vectorized operations
+# over the columns; without it the same columns are scanned in Python
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class TaskTable:
+    """
+    Parallel arrays of the task IDs and completed flags, in list order
+
+    Each task is one row across the columns, in the same order as the task
+    list. Deleted rows are only marked dead and are squeezed out once they
+    make up half of the table, so every mutation is O(1) (O(log n) to find
+    the row). The table is kept in step with the tasks through the task
+    manager's index hooks.
+    """
+
+    def __init__(self):
+        """Initialize an empty table"""
+        self.ids = array('q')
+        self.alive = array('b')
+        self.completed = array('b')
+
+        # Task ID -> row, only needed once IDs stop being in ascending order
+        # (IDs are allocated in order, so normally the row is found by bisection)
+        self._rows = None
+        self._dead = 0
+
+    @classmethod
+    def build(cls, tasks):
+        """
+        Build a table over a list of tasks
+
+        Args:
+            tasks (iterable): Tasks in list order
+
+        Returns:
+            TaskTable: The new table
+        """
+        table = cls()
+        for task in tasks:
+            table.add(task)
+        return table
+
+    def __len__(self):
+        return len(self.ids) - self._dead
+
+    def add(self, task):
+        """Append a row for a new task"""
+        task_id = task["id"]
+        if self._rows is None and self.ids and task_id <= self.ids[-1]:
+            self._rows = {row_id: row for row, row_id in enumerate(self.ids) if self.alive[row]}
+        if self._rows is not None:
+            self._rows[task_id] = len(self.ids)
+
+        self.ids.append(task_id)
+        self.alive.append(1)
+        self.completed.append(int(bool(task["completed"])))
+
+    def remove(self, task):
+        """Mark the row of a deleted task as dead"""
+        row = self._row(task["id"])
+        if row is None:
+            return
+
+        self.alive[row] = 0
+        self._dead += 1
+        if self._rows is not None:
+            del self._rows[task["id"]]
+
+        if self._dead > 1024 and self._dead * 2 > len(self.ids):
+            self._compact()
+
+    def update(self, old_task, new_task):
+        """Refresh the row of a changed task"""
+        row = self._row(new_task["id"])
+        if row is None:
+            return
+
+        self.completed[row] = int(bool(new_task["completed"]))
+
+    def count(self, completed=None):
+        """
+        Count tasks, optionally only completed or pending ones
+
+        Args:
+            completed (bool, optional): Only count completed or pending tasks
+
+        Returns:
+            int: Number of matching tasks
+        """
+        if completed is None:
+            return len(self)
+
+        if numpy is not None:
+            alive = numpy.frombuffer(self.alive, dtype=numpy.int8)
+            done = numpy.frombuffer(self.completed, dtype=numpy.int8)
+            return int(numpy.count_nonzero(alive & (done == int(completed))))
+
+        return sum(1 for row in self._live_rows() if self.completed[row] == completed)
+
+    def query(self, completed=None):
+        """
+        Find the tasks with a given status
+
+        Args:
+            completed (bool, optional): Only completed (True) or pending
+                (False) tasks
+
+        Returns:
+            list: IDs of the matching tasks, in list order
+        """
+        if numpy is not None:
+            mask = numpy.frombuffer(self.alive, dtype=numpy.int8).astype(bool)
+            if completed is not None:
+                mask &= numpy.frombuffer(self.completed, dtype=numpy.int8) == int(completed)
+            return numpy.frombuffer(self.ids, dtype=numpy.int64)[mask].tolist()
+
+        rows = self._live_rows()
+        if completed is not None:
+            rows = [row for row in rows if self.completed[row] == completed]
+
+        ids = self.ids
+        return [ids[row] for row in rows]
+
+    def _live_rows(self):
+        """Rows of tasks that have not been deleted"""
+        return list(compress(range(len(self.ids)), self.alive))
+
+    def _row(self, task_id):
+        """Find the row of a task"""
+        if self._rows is not None:
+            return self._rows.get(task_id)
+
+        row = bisect_left(self.ids, task_id)
+        if row < len(self.ids) and self.ids[row] == task_id and self.alive[row]:
+            return row
+
+        return None
+
+    def _compact(self):
+        """Squeeze the dead rows out of every column"""
+        for name in ("ids", "completed"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, compress(column, self.alive)))
+
+        self.alive = array('b', [1]) * len(self.ids)
+        self._dead = 0
+
+        if self._rows is not None:
+            self._rows = {task_id: row for row, task_id in enumerate(self.ids)}
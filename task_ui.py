@@ -1,8 +1,9 @@
 
 import time
 import random
+import threading
 from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
 from rich import box
 from rich.text import Text
 from rich.align import Align
@@ -51,17 +52,129 @@ def display_banner():
     )
 
 
-def simulate_loading(message="Loading"):
-    """Display a fancy loading spinner"""
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[bold green]{task.description}"),
-        transient=True,
-    ) as progress:
-        task = progress.add_task(f"[bold green]{message}...", total=100)
-        for _ in range(10):
-            progress.update(task, advance=10)
-            time.sleep(0.1)
+# Operations quicker than this (in seconds) never show a progress display
+PROGRESS_THRESHOLD = 0.3
+
+# Minimum time between progress display updates, in seconds
+PROGRESS_REFRESH = 0.1
+
+
+class WorkProgress:
+    """
+    Progress display driven by the work actually done
+
+    Nothing is shown unless the operation is still running after
+    PROGRESS_THRESHOLD seconds, so quick operations stay instant. Long ones
+    show a spinner, a bar when the total is known, and the real throughput.
+
+    Usage:
+        with WorkProgress("Exporting tasks", total=len(tasks)) as progress:
+            for task in tasks:
+                write(task)
+                progress.advance()
+    """
+
+    def __init__(self, message, total=None, unit="tasks", threshold=PROGRESS_THRESHOLD):
+        """
+        Initialize the progress display
+
+        Args:
+            message (str): What is being done
+            total (int, optional): Amount of work expected, if known
+            unit (str, optional): Unit of work, used for the rate
+            threshold (float, optional): Seconds before the display appears
+        """
+        self.message = message
+        self.total = total
+        self.unit = unit
+        self.threshold = threshold
+        self.completed = 0
+
+        self._progress = None
+        self._task = None
+        self._timer = None
+        self._lock = threading.Lock()
+        self._finished = False
+        self._started_at = None
+        self._last_refresh = 0
+
+    def __enter__(self):
+        self._started_at = time.perf_counter()
+        self._timer = threading.Timer(self.threshold, self._show)
+        self._timer.daemon = True
+        self._timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._timer.cancel()
+        with self._lock:
+            self._finished = True
+            if self._progress is not None:
+                self._progress.stop()
+        return False
+
+    def advance(self, amount=1):
+        """
+        Record completed work
+
+        Args:
+            amount (int, optional): Units of work completed
+        """
+        self.completed += amount
+
+        if self._progress is not None:
+            now = time.perf_counter()
+            if now - self._last_refresh >= PROGRESS_REFRESH:
+                self._last_refresh = now
+                self._refresh(now)
+
+    def _show(self):
+        """Start the display once the threshold has passed"""
+        columns = [SpinnerColumn(), TextColumn("[bold green]{task.description}")]
+        if self.total:
+            columns.append(BarColumn())
+        columns.append(TextColumn("[cyan]{task.fields[rate]}"))
+
+        with self._lock:
+            if self._finished:
+                return
+
+            progress = Progress(*columns, transient=True)
+            self._task = progress.add_task(f"[bold green]{self.message}...", total=self.total, rate="")
+            progress.start()
+            self._progress = progress
+            self._refresh(time.perf_counter())
+
+    def _refresh(self, now):
+        """Push the amount of work done and the rate to the display"""
+        elapsed = now - self._started_at
+        if self.completed:
+            rate = f"{self.completed:,} {self.unit} ({self.completed / elapsed:,.0f}/s)"
+        else:
+            rate = ""
+        self._progress.update(self._task, completed=self.completed, rate=rate)
+
+
+def track_progress(iterable, message, total=None, unit="tasks"):
+    """
+    Iterate while reporting progress for slow loops
+
+    Args:
+        iterable (iterable): Items to go through
+        message (str): What is being done
+        total (int, optional): Number of items, if known
+        unit (str, optional): Unit of work, used for the rate
+
+    Yields:
+        Each item of the iterable
+    """
+    if total is None and hasattr(iterable, "__len__"):
+        total = len(iterable)
+
+    with WorkProgress(message, total=total, unit=unit) as progress:
+        for item in iterable:
+            yield item
+            progress.advance()
 
 
 def show_help():
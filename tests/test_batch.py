@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Batch Tests - Operations on the same task within one batch, on every backend
+
+Run with:
+    python -m unittest discover tests
+"""
+import io
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch
+from storage import Storage
+from task_manager import TaskManager
+
+def json_storage(directory):
+    return Storage(os.path.join(directory, "tasks.json"), journal=True)
+
+def sqlite_storage(directory):
+    from sqlite_storage import SQLiteStorage
+    return SQLiteStorage(os.path.join(directory, "tasks.db"))
+
+def sharded_storage(directory):
+    from sharded_storage import ShardedStorage
+    return ShardedStorage(os.path.join(directory, "tasks.shards"))
+
+def record_storage(directory):
+    from record_storage import RecordStorage
+    return RecordStorage(os.path.join(directory, "tasks.records"))
+
+BACKENDS = {
+    "json": json_storage,
+    "sqlite": sqlite_storage,
+    "sharded": sharded_storage,
+    "records": record_storage,
+}
+
+class BatchTest(unittest.TestCase):
+    """Each test runs once per backend, against a store that already has tasks"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def seed(self, make_storage):
+        task_manager = TaskManager(storage=make_storage(self.directory))
+        task_manager.add_task("First")
+        task_manager.add_task("Second")
+
+    def run_batch(self, make_storage, operations):
+        """Apply operations with a fresh task manager, returning the result lines"""
+        task_manager = TaskManager(storage=make_storage(self.directory))
+        source = io.StringIO("".join(json.dumps(operation) + "\n" for operation in operations))
+        out = io.StringIO()
+        batch.run_batch(task_manager, source, out)
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def stored_task(self, make_storage, task_id):
+        """Read a task back as a new process would"""
+        return TaskManager(storage=make_storage(self.directory)).get_task_by_id(task_id)
+
+    def test_add_complete_update(self):
+        for name, make_storage in BACKENDS.items():
+            with self.subTest(backend=name):
+                self.seed(make_storage)
+                results = self.run_batch(make_storage, [
+                    {"op": "add", "title": "Third"},
+                    {"op": "complete", "id": 3},
+                    {"op": "update", "id": 3, "description": "Done"},
+                ])
+
+                self.assertEqual([result["ok"] for result in results], [True, True, True])
+                task = self.stored_task(make_storage, 3)
+                self.assertEqual(task["title"], "Third")
+                self.assertTrue(task["completed"])
+                self.assertEqual(task["description"], "Done")
+
+    def test_update_update(self):
+        for name, make_storage in BACKENDS.items():
+            with self.subTest(backend=name):
+                self.seed(make_storage)
+                results = self.run_batch(make_storage, [
+                    {"op": "complete", "id": 1},
+                    {"op": "update", "id": 1, "title": "First, renamed"},
+                    {"op": "update", "id": 1, "description": "Both changes kept"},
+                ])
+
+                self.assertEqual([result["ok"] for result in results], [True, True, True])
+                task = self.stored_task(make_storage, 1)
+                self.assertEqual(task["title"], "First, renamed")
+                self.assertEqual(task["description"], "Both changes kept")
+                self.assertTrue(task["completed"])
+
+    def test_add_completed(self):
+        for name, make_storage in BACKENDS.items():
+            with self.subTest(backend=name):
+                self.seed(make_storage)
+                results = self.run_batch(make_storage, [
+                    {"op": "add", "title": "Already done", "completed": True},
+                ])
+
+                self.assertTrue(results[0]["ok"])
+                self.assertTrue(self.stored_task(make_storage, results[0]["id"])["completed"])
+
+    def test_deleted_task(self):
+        for name, make_storage in BACKENDS.items():
+            with self.subTest(backend=name):
+                self.seed(make_storage)
+                results = self.run_batch(make_storage, [
+                    {"op": "delete", "id": 2},
+                    {"op": "update", "id": 2, "title": "Gone"},
+                    {"op": "complete", "id": 2},
+                ])
+
+                self.assertEqual([result["ok"] for result in results], [True, False, False])
+                self.assertIsNone(self.stored_task(make_storage, 2))
+
+    def test_update_without_fields(self):
+        for name, make_storage in BACKENDS.items():
+            with self.subTest(backend=name):
+                self.seed(make_storage)
+                results = self.run_batch(make_storage, [
+                    {"op": "update", "id": 1},
+                    {"op": "update", "id": 1, "titel": "Misspelt"},
+                    {"op": "update", "id": 1, "title": ""},
+                    {"op": "update", "id": 1, "title": "   "},
+                ])
+
+                self.assertEqual([result["ok"] for result in results], [False, False, False, False])
+                self.assertEqual(self.stored_task(make_storage, 1)["title"], "First")
+
+if __name__ == "__main__":
+    unittest.main()
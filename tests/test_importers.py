@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Importer Tests - Importing into new and existing stores, on every backend
+
+Run with:
+    python -m unittest discover tests
+"""
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import importers
+from task_manager import TaskManager
+from test_batch import BACKENDS
+
+CSV = """title,description,completed,due_date,priority,tags
+Pay rent,,no,2024-05-01,high,home
+Write report,First draft,yes,,medium,"work, writing"
+"""
+
+class ImportTest(unittest.TestCase):
+    """Each test runs once per backend"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def import_csv(self, make_storage, text, dedupe=False):
+        """Import CSV text with a fresh task manager, returning the counts"""
+        task_manager = TaskManager(storage=make_storage(self.directory))
+        rows = importers.csv_rows(io.StringIO(text))
+        counts = importers.import_tasks(task_manager, rows, dedupe=dedupe)
+        task_manager.save()
+        return counts
+
+    def stored_tasks(self, make_storage):
+        """Read every task back as a new process would"""
+        return TaskManager(storage=make_storage(self.directory)).get_tasks()
+
+    def test_import_into_new_store(self):
+        for name, make_storage in BACKENDS.items():
+            with self.subTest(backend=name):
+                counts = self.import_csv(make_storage, CSV)
+
+                self.assertEqual(counts["imported"], 2)
+                tasks = self.stored_tasks(make_storage)
+                self.assertEqual([task["id"] for task in tasks], [1, 2])
+                self.assertEqual(tasks[0]["title"], "Pay rent")
+                self.assertEqual(tasks[0]["due_date"], "2024-05-01")
+                self.assertTrue(tasks[1]["completed"])
+                self.assertEqual(tasks[1]["tags"], ["work", "writing"])
+
+    def test_import_into_existing_store(self):
+        for name, make_storage in BACKENDS.items():
+            with self.subTest(backend=name):
+                TaskManager(storage=make_storage(self.directory)).add_task("Already there")
+                self.import_csv(make_storage, CSV)
+                counts = self.import_csv(make_storage, CSV + "Call plumber,,,,,\n", dedupe=True)
+
+                self.assertEqual(counts, {"imported": 1, "duplicates": 2, "invalid": 0})
+                tasks = self.stored_tasks(make_storage)
+                self.assertEqual([task["id"] for task in tasks], [1, 2, 3, 4])
+                self.assertEqual([task["title"] for task in tasks],
+                                 ["Already there", "Pay rent", "Write report", "Call plumber"])
+
+if __name__ == "__main__":
+    unittest.main()